@@ -0,0 +1,171 @@
+"""
+AI Context
+The compact summary of a user's recent footprint that every AI prompt uses.
+
+Built with a fixed number of queries whatever the user has logged:
+
+    1. user name + activity count in the window
+    2. the window's DailySummary rows (<= `days` rows): per-category totals,
+       daily and weekly totals
+    3. top emission sources, aggregated and limited in SQL
+
+so memory and latency stay flat as the emission history grows.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+from models import db, User, Emission, Activity, DailySummary
+
+# DailySummary column -> category name used in prompts and tips
+CATEGORY_COLUMNS = {
+    'electricity': DailySummary.electricity_emissions,
+    'transport': DailySummary.transport_emissions,
+    'food': DailySummary.food_emissions,
+    'other': DailySummary.other_emissions,
+}
+
+TOP_SOURCES = 3
+
+
+class AIContext:
+    """
+    Recent footprint of one user
+
+    Attributes:
+        by_category (dict): category -> kg CO₂ over the window
+        daily (list): (date, kg CO₂) for every day of the window, oldest first
+        weekly (list): (week_start, kg CO₂) 7-day buckets ending today, newest first
+        top_sources (list): (source, kg CO₂), largest first
+    """
+
+    def __init__(self, user_id, user_name, days, today, by_category, daily, top_sources, activity_count):
+        self.user_id = user_id
+        self.user_name = user_name
+        self.days = days
+        self.today = today
+        self.by_category = by_category
+        self.daily = daily
+        self.top_sources = top_sources
+        self.activity_count = activity_count
+        self.weekly = self._weekly(daily, today)
+
+    @staticmethod
+    def _weekly(daily, today):
+        buckets = {}
+        for day, amount in daily:
+            week_start = today - timedelta(days=((today - day).days // 7) * 7 + 6)
+            buckets[week_start] = buckets.get(week_start, 0.0) + amount
+        return sorted(buckets.items(), reverse=True)
+
+    @property
+    def total(self):
+        return sum(self.by_category.values())
+
+    @property
+    def top_category(self):
+        """Category with the highest emissions, or 'general' without data"""
+        if self.total <= 0:
+            return 'general'
+        return max(self.by_category.items(), key=lambda item: item[1])[0]
+
+    def summary(self):
+        """Prompt-ready text: totals, category split, weekly trend, top sources"""
+        lines = []
+        if self.total > 0:
+            lines.append(f"Total emissions (last {self.days} days): {self.total:.2f} kg CO₂")
+            categories = sorted(((c, a) for c, a in self.by_category.items() if a > 0), key=lambda x: x[1], reverse=True)
+            lines.append("By category: " + ", ".join(f"{c} {a:.2f} kg" for c, a in categories))
+            top = categories[0]
+            lines.append(f"Top emission source: {top[0]} ({top[1]:.2f} kg CO₂)")
+            lines.append("Weekly totals (newest first): " + ", ".join(f"{a:.2f}" for _, a in self.weekly))
+            if self.top_sources:
+                lines.append("Largest sources: " + ", ".join(f"{s} ({a:.2f} kg)" for s, a in self.top_sources))
+        if self.activity_count:
+            lines.append(f"Recent activities logged: {self.activity_count}")
+        return "\n".join(lines) if lines else "No recent data available"
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'days': self.days,
+            'total': round(self.total, 2),
+            'by_category': {c: round(a, 2) for c, a in self.by_category.items()},
+            'weekly': [{'week_start': w.isoformat(), 'total': round(a, 2)} for w, a in self.weekly],
+            'top_sources': [{'source': s, 'total': round(a, 2)} for s, a in self.top_sources],
+            'activity_count': self.activity_count,
+        }
+
+
+def build_ai_context(user_id, days=30, today=None):
+    """
+    Summarize a user's last `days` days (today included) for the AI coach
+
+    Args:
+        user_id (int): User to summarize
+        days (int): Window length in whole days
+        today (date): Last day of the window (default: today, UTC)
+
+    Returns:
+        AIContext, or None if the user doesn't exist
+    """
+    today = today or datetime.utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+    since = datetime.combine(first_day, datetime.min.time())
+
+    user = db.session.execute(
+        select(
+            User.name,
+            select(func.count(Activity.id))
+            .where(Activity.user_id == user_id, Activity.date >= since)
+            .scalar_subquery()
+        ).where(User.id == user_id)
+    ).first()
+    if user is None:
+        return None
+    user_name, activity_count = user
+
+    rows = db.session.execute(
+        select(DailySummary.day, DailySummary.total_emissions, *CATEGORY_COLUMNS.values())
+        .where(DailySummary.user_id == user_id, DailySummary.day >= first_day, DailySummary.day <= today)
+    ).all()
+
+    by_category = dict.fromkeys(CATEGORY_COLUMNS, 0.0)
+    per_day = {}
+    for day, total, *categories in rows:
+        per_day[day] = float(total or 0)
+        for name, amount in zip(CATEGORY_COLUMNS, categories):
+            by_category[name] += float(amount or 0)
+    daily = [(day, per_day.get(day, 0.0)) for day in (first_day + timedelta(days=n) for n in range(days))]
+
+    amount = func.sum(Emission.amount)
+    top_sources = [
+        (source, float(total))
+        for source, total in db.session.execute(
+            select(Emission.source, amount)
+            .where(Emission.user_id == user_id, Emission.date >= since)
+            .group_by(Emission.source)
+            .order_by(amount.desc())
+            .limit(TOP_SOURCES)
+        )
+    ]
+
+    return AIContext(user_id, user_name, days, today, by_category, daily, top_sources, activity_count)
+
+
+def category_emissions(user_id, category, days=30, today=None):
+    """
+    kg CO₂ a user logged under one emission_type in the last `days` days
+
+    Tip categories (energy, waste, ...) are the emission types activities
+    are stored under, not the DailySummary buckets, so this sums the
+    emissions themselves in one query.
+    """
+    today = today or datetime.utcnow().date()
+    since = datetime.combine(today - timedelta(days=days - 1), datetime.min.time())
+    total = db.session.execute(
+        select(func.sum(Emission.amount))
+        .where(Emission.user_id == user_id, Emission.emission_type == category, Emission.date >= since)
+    ).scalar()
+    return float(total or 0)
@@ -1,7 +1,11 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from flask import Flask, jsonify
+# Before the route modules import, so their import-time messages are captured too
+from utils.logging_setup import configure_logging
+configure_logging()
+
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 
 from extensions import bcrypt, jwt
@@ -12,6 +16,13 @@ from routes.asset_routes import asset_bp
 from routes.activity_routes import activity_bp
 from routes.ai_routes import ai_bp
 from routes.goal_routes import goal_bp
+from routes.emission_routes import emission_bp
+import rollups  # noqa: F401  Registers the MonthlySummary maintenance hooks
+import data_versions  # noqa: F401  Registers the per-user data version hooks
+from utils.cache import response_cache
+from utils.ai_helper import prompt_cache, llm_guard
+from insights import insight_worker
+from utils.metrics import request_metrics
 import os
 
 # Initialize Flask app
@@ -36,6 +47,8 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 bcrypt.init_app(app)
 jwt.init_app(app)
+insight_worker.init_app(app)  # Background AI insight generation
+request_metrics.init_app(app)  # Per-endpoint timing and SQL counts for /metrics
 
 # Register API routes
 app.register_blueprint(api)
@@ -44,6 +57,7 @@ app.register_blueprint(asset_bp, url_prefix='/api/assets')
 app.register_blueprint(activity_bp)  # Activities routes
 app.register_blueprint(ai_bp)  # AI EcoCoach routes
 app.register_blueprint(goal_bp)  # Goals routes
+app.register_blueprint(emission_bp)  # Emission export
 
 # Registers new auth routes
 from routes.auth_routes import auth_bp
@@ -79,6 +93,7 @@ def home():
                 "Activity Stats": "/api/activities/stats/<user_id>",
                 "Categories": "/api/activities/categories",
                 "Create Activity": "POST /api/activities",
+                "Bulk Create Activities": "POST /api/activities/bulk",
                 "Update Activity": "PUT /api/activities/<activity_id>",
                 "Delete Activity": "DELETE /api/activities/<activity_id>"
             },
@@ -97,8 +112,15 @@ def home():
                 "Update Goal": "PUT /api/goals/<goal_id>",
                 "Delete Goal": "DELETE /api/goals/<goal_id>"
             },
+            "Emissions": {
+                "Export History": "/api/emissions/export/<user_id>?format=csv|ndjson&start=<date>&end=<date>&type=<type>",
+                "Import History": "POST /api/emissions/import?user_id=<user_id>"
+            },
             "Utilities": {
-                "Health Check": "/health"
+                "Health Check": "/health",
+                "Response Cache Stats": "/health/cache",
+                "LLM Guard Stats": "/health/llm",
+                "Prometheus Metrics": "/metrics"
             }
         }
     })
@@ -111,6 +133,26 @@ def health_check():
     })
 
 
+@app.route('/health/cache')
+def cache_stats():
+    stats = response_cache.stats()
+    stats['ai_prompts'] = prompt_cache.stats()
+    stats['ai_insights'] = insight_worker.stats()
+    return jsonify(stats)
+
+
+@app.route('/health/llm')
+def llm_stats():
+    # Circuit breaker state, queue depth and upstream call counters
+    return jsonify(llm_guard.stats())
+
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape target: per-endpoint request, latency and SQL metrics
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.errorhandler(404)
 def not_found(e):
     return jsonify({"error": "Not Found", "message": "That route does not exist."}), 404
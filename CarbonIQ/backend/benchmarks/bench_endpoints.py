@@ -0,0 +1,258 @@
+"""
+Endpoint benchmark: query plans and latency with and without the
+secondary indexes declared in models.py.
+
+Builds a throwaway SQLite database (or uses --database-url), fills it with
+synthetic emissions/activities, rebuilds the summary rollups from them,
+then for every endpoint below prints the SQL it ran, the database's plan
+for each statement and the median latency. The response cache is cleared
+before every call, so each timing is a full computation rather than a hit.
+The run is repeated after creating the indexes so the two can be compared.
+
+Usage:
+    python benchmarks/bench_endpoints.py --rows 500000
+    python benchmarks/bench_endpoints.py --database-url postgresql+psycopg://... --keep-data
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000, help='number of emission rows to generate')
+    parser.add_argument('--users', type=int, default=50, help='number of users the rows are spread over')
+    parser.add_argument('--repeat', type=int, default=5, help='timed calls per endpoint')
+    parser.add_argument('--database-url', help='benchmark against this database instead of a temporary SQLite file')
+    parser.add_argument('--keep-data', action='store_true', help='reuse existing rows instead of regenerating')
+    return parser.parse_args()
+
+
+args = parse_args()
+
+if args.database_url:
+    os.environ['DATABASE_URL'] = args.database_url
+else:
+    db_file = os.path.join(tempfile.mkdtemp(prefix='carboniq-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from app import app  # noqa: E402
+from models import db, User, Asset, Emission, Activity, Goal  # noqa: E402
+from rollups import rebuild_monthly_summaries, rebuild_daily_summaries, rebuild_asset_impacts  # noqa: E402
+from routes import routes as legacy_routes  # noqa: E402
+from utils.cache import response_cache  # noqa: E402
+
+# Every non-unique index in models.py; unique ones back constraints and upserts
+BENCH_INDEXES = [
+    index
+    for table in db.metadata.sorted_tables
+    for index in sorted(table.indexes, key=lambda index: index.name)
+    if not index.unique
+]
+
+EMISSION_TYPES = ['transport', 'electricity', 'food', 'machine', 'energy']
+
+
+def populate():
+    """Generate users, assets, goals, emissions and activities in bulk."""
+    db.drop_all()
+    db.create_all()
+
+    users = [
+        {'name': f'Bench User {i}', 'email': f'bench{i}@example.com', 'password_hash': 'x'}
+        for i in range(args.users)
+    ]
+    db.session.execute(insert(User), users)
+    user_ids = [u.id for u in User.query.order_by(User.id).all()]
+
+    db.session.execute(insert(Asset), [
+        {'user_id': uid, 'name': f'Asset {uid}-{n}', 'type': 'vehicle'}
+        for uid in user_ids for n in range(3)
+    ])
+    asset_ids = {}
+    for asset in Asset.query.all():
+        asset_ids.setdefault(asset.user_id, []).append(asset.id)
+
+    db.session.execute(insert(Goal), [
+        {
+            'user_id': uid,
+            'title': f'Goal {n}',
+            'target_reduction_percentage': 10 + n * 5,
+            'start_date': datetime.utcnow() - timedelta(days=20 * n),
+            'end_date': datetime.utcnow() + timedelta(days=90),
+            'status': 'active',
+        }
+        for uid in user_ids for n in range(5)
+    ])
+
+    now = datetime.utcnow()
+    chunk = []
+    for i in range(args.rows):
+        uid = random.choice(user_ids)
+        chunk.append({
+            'user_id': uid,
+            'asset_id': random.choice(asset_ids[uid]) if random.random() < 0.5 else None,
+            'emission_type': random.choice(EMISSION_TYPES),
+            'activity': 'bench',
+            'source': f'Source {random.randint(1, 20)}',
+            'original_value': 1.0,
+            'amount': round(random.uniform(0.5, 40), 2),
+            'date': now - timedelta(minutes=random.randint(0, 2 * 365 * 24 * 60)),
+        })
+        if len(chunk) == 10_000:
+            db.session.execute(insert(Emission), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(insert(Emission), chunk)
+
+    db.session.execute(insert(Activity), [
+        {
+            'user_id': random.choice(user_ids),
+            'title': 'Bench activity',
+            'amount': round(random.uniform(0.5, 40), 2),
+            'badge': random.choice(['transport', 'energy', 'food']),
+            'date': now - timedelta(minutes=random.randint(0, 365 * 24 * 60)),
+        }
+        for _ in range(args.rows // 4)
+    ])
+    db.session.commit()
+
+    # Core inserts skip the rollup hooks, so build the summaries in one pass
+    rebuild_monthly_summaries()
+    rebuild_daily_summaries()
+    rebuild_asset_impacts()
+    return user_ids[0]
+
+
+def legacy_view(view, *view_args, query_string=None):
+    """Call one of the routes.py handlers directly inside a request context."""
+    def call(client):
+        with app.test_request_context(query_string=query_string):
+            return view(*view_args)
+    return call
+
+
+def url(path):
+    def call(client):
+        return client.get(path)
+    return call
+
+
+def uncached(call, client):
+    """Run one endpoint call with an empty response cache, so it does the real work"""
+    response_cache.clear()
+    return call(client)
+
+
+def endpoints(user_id):
+    return [
+        ('dashboard stats', url(f'/api/dashboard/stats/{user_id}')),
+        ('emissions trend (30d)', url(f'/api/dashboard/emissions-trend/{user_id}')),
+        ('emissions trend (365d)', url(f'/api/dashboard/emissions-trend/{user_id}?days=365')),
+        ('top emitters', url(f'/api/dashboard/top-emitters/{user_id}')),
+        ('recent activities', url(f'/api/dashboard/recent-activities/{user_id}')),
+        ('activities list', url(f'/api/activities/{user_id}')),
+        ('goals', url(f'/api/goals/{user_id}')),
+        ('goal stats', url(f'/api/goals/stats/{user_id}')),
+        ('user metrics', legacy_view(legacy_routes.get_user_metrics, user_id)),
+        ('monthly metrics', legacy_view(legacy_routes.get_monthly_metrics, query_string={'user_id': user_id})),
+        ('dashboard metrics', legacy_view(legacy_routes.get_dashboard_metrics, user_id)),
+    ]
+
+
+class StatementRecorder:
+    """Collects the statements an endpoint executes."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith('EXPLAIN'):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+
+def explain(engine, statement, parameters):
+    prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+    if engine.dialect.name == 'sqlite':
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def run_pass(label, client, user_id):
+    engine = db.engine
+    print(f"\n{'=' * 70}\n{label}\n{'=' * 70}")
+    results = {}
+    for name, call in endpoints(user_id):
+        uncached(call, client)  # warm up
+
+        with StatementRecorder(engine) as recorder:
+            uncached(call, client)
+
+        timings = []
+        for _ in range(args.repeat):
+            response_cache.clear()
+            started = time.perf_counter()
+            call(client)
+            timings.append((time.perf_counter() - started) * 1000)
+        median = statistics.median(timings)
+        results[name] = median
+
+        print(f"\n--- {name}: {median:.1f} ms median, {len(recorder.statements)} statement(s)")
+        for statement, parameters in recorder.statements:
+            if not statement.lstrip().upper().startswith('SELECT'):
+                continue
+            print('  SQL: ' + ' '.join(statement.split())[:160])
+            for line in explain(engine, statement, parameters):
+                print(f'    {line}')
+    return results
+
+
+def main():
+    with app.app_context():
+        if args.keep_data and User.query.first():
+            user_id = User.query.order_by(User.id).first().id
+        else:
+            print(f"📦 Generating {args.rows} emissions for {args.users} users...")
+            user_id = populate()
+
+        client = app.test_client()
+
+        for index in BENCH_INDEXES:
+            index.drop(bind=db.engine, checkfirst=True)
+        before = run_pass('WITHOUT secondary indexes', client, user_id)
+
+        for index in BENCH_INDEXES:
+            index.create(bind=db.engine, checkfirst=True)
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(db.text('ANALYZE'))
+        after = run_pass('WITH secondary indexes', client, user_id)
+
+        print(f"\n{'endpoint':<26}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+        for name in before:
+            speedup = before[name] / after[name] if after[name] else float('inf')
+            print(f"{name:<26}{before[name]:>14.1f}{after[name]:>14.1f}{speedup:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Per-user Data Versions
+A write counter on each user, bumped whenever one of their emissions,
+activities, assets or goals is written.
+
+Anything derived from a user's data (cached responses, ETags) can be keyed
+by the version and is invalidated simply by the next write. The bump runs
+in the same transaction as the write, so a rolled-back write never
+invalidates anything and every process sees the same version.
+
+Bulk writes that bypass the ORM session must call bump_data_versions()
+(or bump_session_data_versions() inside a session) themselves.
+
+Users whose data changed in a committed transaction are recorded on the
+request (changed_user_ids()), so work derived from their data, such as
+AI insights, can be refreshed once the response is on its way.
+"""
+
+from itertools import chain
+
+from flask import request, has_request_context
+from sqlalchemy import event, inspect, select, update, func
+from sqlalchemy.orm import Session
+
+from models import db, User, Emission, Activity, Asset, Goal
+
+# Models whose writes change what a user's dashboards show
+TRACKED_MODELS = (Emission, Activity, Asset, Goal)
+
+
+def bump_data_versions(connection, user_ids):
+    """
+    Increment the data version of every user in `user_ids`
+
+    Args:
+        connection: Connection inside the current transaction
+        user_ids: Iterable of user ids, or None for every user
+    """
+    table = User.__table__
+    stmt = update(table).values(data_version=func.coalesce(table.c.data_version, 0) + 1)
+    if user_ids is not None:
+        user_ids = sorted({uid for uid in user_ids if uid is not None})
+        if not user_ids:
+            return
+        stmt = stmt.where(table.c.id.in_(user_ids))
+    connection.execute(stmt)
+
+
+def bump_session_data_versions(session, user_ids):
+    """
+    bump_data_versions() inside `session`'s transaction, for Core writes
+
+    Unlike a bare bump, the users are also reported to changed_user_ids()
+    once the session commits, exactly like ORM writes.
+    """
+    user_ids = {uid for uid in user_ids if uid is not None}
+    if not user_ids:
+        return
+    bump_data_versions(session.connection(), user_ids)
+    session.info.setdefault('data_version_changed', set()).update(user_ids)
+
+
+def get_data_version(user_id):
+    """
+    Get a user's current data version
+
+    Returns:
+        int: The version, or None if the user doesn't exist
+    """
+    return db.session.execute(
+        select(func.coalesce(User.data_version, 0)).where(User.id == user_id)
+    ).scalar()
+
+
+def request_data_version(user_id):
+    """get_data_version(), looked up at most once per user per request"""
+    if not has_request_context():
+        return get_data_version(user_id)
+    seen = request.environ.setdefault('carboniq.data_versions', {})
+    if user_id not in seen:
+        seen[user_id] = get_data_version(user_id)
+    return seen[user_id]
+
+
+def changed_user_ids():
+    """Users whose tracked data was committed during the current request"""
+    if not has_request_context():
+        return set()
+    return request.environ.get('carboniq.changed_users', set())
+
+
+def _changed_user_ids(session):
+    """Owners of the tracked rows this flush will change or delete"""
+    user_ids = set()
+    for obj in chain(session.dirty, session.deleted):
+        if not isinstance(obj, TRACKED_MODELS):
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        user_ids.add(obj.user_id)
+        user_ids.update(inspect(obj).attrs.user_id.history.deleted or [])  # rows moved to another user
+    return user_ids
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_written_users(session, flush_context, instances):
+    # Read before the flush, while deleted rows can still be loaded
+    session.info['data_version_users'] = _changed_user_ids(session)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_written_users(session, flush_context):
+    user_ids = session.info.pop('data_version_users', set())
+    # New rows only have user_id once the flush has resolved relationships
+    user_ids.update(obj.user_id for obj in session.new if isinstance(obj, TRACKED_MODELS))
+    # Versions of users deleted in this flush don't matter any more
+    user_ids -= {obj.id for obj in session.deleted if isinstance(obj, User)}
+    bump_session_data_versions(session, user_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _record_changed_users(session):
+    user_ids = session.info.pop('data_version_changed', set())
+    if not user_ids or not has_request_context():
+        return
+    request.environ.setdefault('carboniq.changed_users', set()).update(user_ids)
+    # The memoized versions are stale now
+    seen = request.environ.get('carboniq.data_versions', {})
+    for user_id in user_ids:
+        seen.pop(user_id, None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('data_version_changed', None)
@@ -1,6 +1,10 @@
+import logging
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract
+from sqlalchemy import func
 from models import db, Emission, MonthlySummary
+from utils.periods import month_window, previous_month
+
+logger = logging.getLogger(__name__)
 
 class EmissionService:
     
@@ -44,7 +48,7 @@ class EmissionService:
                 return original_value  # Assume value is already in kg CO2
                 
         except Exception as e:
-            print(f"Calculation error: {e}")
+            logger.warning("Calculation error: %s", e)
             return 0.0
     
     @staticmethod
@@ -104,12 +108,11 @@ class EmissionService:
                 date=emission_data.get('date', datetime.now().date())
             )
             
+            # The monthly summary is updated by a delta in the same
+            # transaction (see rollups.py)
             db.session.add(emission)
             db.session.commit()
             
-            # Update monthly summary
-            EmissionService.update_monthly_summary(user_id, emission.date)
-            
             return emission
             
         except Exception as e:
@@ -118,17 +121,18 @@ class EmissionService:
     
     @staticmethod
     def update_monthly_summary(user_id, date):
-        """Update or create monthly summary for faster queries"""
+        """
+        Recompute one monthly summary from the raw emissions.
+        Writes keep summaries current incrementally; this is only needed
+        to reconcile a single bucket (see rollups.rebuild_monthly_summaries
+        for a full rebuild).
+        """
         try:
             year = date.year
             month = date.month
             
             # Calculate current month totals
-            month_start = date.replace(day=1)
-            if month == 12:
-                next_month = month_start.replace(year=year+1, month=1)
-            else:
-                next_month = month_start.replace(month=month+1)
+            month_start, next_month = month_window(year, month)
             
             # Get emissions for current month grouped by type
             monthly_emissions = db.session.query(
@@ -143,8 +147,7 @@ class EmissionService:
             total_emissions = sum(total for _, total in monthly_emissions) or 0.0
             
             # Calculate previous month totals for comparison
-            prev_month = month_start - timedelta(days=1)
-            prev_month_start = prev_month.replace(day=1)
+            prev_month_start, _ = month_window(*previous_month(year, month))
             
             previous_totals = db.session.query(
                 func.sum(Emission.amount)
@@ -245,7 +248,7 @@ class EmissionService:
             }
             
         except Exception as e:
-            print(f"Error getting dashboard stats: {e}")
+            logger.warning("Error getting dashboard stats: %s", e)
             raise e
 
 
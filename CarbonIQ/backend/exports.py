@@ -0,0 +1,130 @@
+"""
+Emission Export
+Stream a user's full emission history as CSV or NDJSON.
+
+Used by GET /api/emissions/export/<user_id>. Rows are read through a
+server-side cursor (yield_per, which turns on stream_results) as plain
+column tuples, never ORM objects, and written out EXPORT_BATCH_SIZE rows
+at a time, so memory stays flat however many years of history a user has.
+
+Configuration (environment):
+    EXPORT_BATCH_SIZE  - rows fetched and written per chunk (default 1000)
+"""
+
+import os
+import io
+import csv
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import db, Emission
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Exported columns, in output order
+COLUMNS = (
+    ('id', Emission.id),
+    ('date', Emission.date),
+    ('emission_type', Emission.emission_type),
+    ('activity', Emission.activity),
+    ('source', Emission.source),
+    ('asset_id', Emission.asset_id),
+    ('original_value', Emission.original_value),
+    ('unit', Emission.unit),
+    ('amount', Emission.amount),
+    ('emission_factor', Emission.emission_factor),
+    ('calculation_method', Emission.calculation_method),
+)
+FIELDS = [name for name, _ in COLUMNS]
+
+
+class ExportFilterError(ValueError):
+    """Raised when an export filter (format, date range) can't be used"""
+
+
+def parse_bound(value, end=False):
+    """
+    Parse a start/end filter
+
+    A bare date (YYYY-MM-DD) used as the end bound includes that whole day.
+
+    Returns:
+        datetime, or None if no value was given
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ExportFilterError(f"Invalid date: {value}")
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def export_query(user_id, start=None, end=None, types=None):
+    """
+    Build the export SELECT: filtered, oldest first, served by the
+    (user_id, date) / (user_id, emission_type, date) indexes
+
+    Args:
+        start (datetime): Inclusive lower bound
+        end (datetime): Exclusive upper bound
+        types (list): emission_type values to keep (all when empty)
+    """
+    query = select(*(column for _, column in COLUMNS)).where(Emission.user_id == user_id)
+    if start is not None:
+        query = query.where(Emission.date >= start)
+    if end is not None:
+        query = query.where(Emission.date < end)
+    if types:
+        query = query.where(Emission.emission_type.in_(types))
+    return query.order_by(Emission.date, Emission.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_rows(query):
+    """Yield batches of exported rows as dicts, one server-side fetch at a time"""
+    result = db.session.execute(query)
+    try:
+        for batch in result.partitions():
+            yield [dict(zip(FIELDS, map(_serialize, row))) for row in batch]
+    finally:
+        result.close()
+
+
+def iter_csv(query):
+    """Yield the CSV export one chunk (header, then EXPORT_BATCH_SIZE rows) at a time"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    for batch in iter_rows(query):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def iter_ndjson(query):
+    """Yield the NDJSON export, one JSON object per line"""
+    for batch in iter_rows(query):
+        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in batch)
+
+
+WRITERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+}
@@ -0,0 +1,610 @@
+"""
+Bulk Ingestion
+Validate, calculate and insert many activity readings at once.
+
+Used by POST /api/activities/bulk. Rows go through three passes:
+
+    1. validate every row (one query for all referenced users and assets)
+    2. calculate emissions per category with CarbonCalculator.calculate_batch
+    3. insert in chunks of BULK_CHUNK_SIZE rows, each chunk in its own
+       transaction: one multi-row INSERT per table, then the MonthlySummary /
+       DailySummary / Asset rollups and data versions updated once for the
+       whole chunk
+
+Bad rows are reported individually and never abort the rest of the batch;
+a chunk that fails in the database is rolled back and reported row by row.
+
+Historical imports (POST /api/emissions/import, `manage.py import-emissions`)
+reuse the same passes on CSV/NDJSON files read one chunk at a time. They
+insert emissions only, record a checkpoint after every committed chunk so
+an interrupted import can resume, and rebuild the rollups once at the end
+(or when the import stops early, for the chunks already committed). Lines
+that aren't valid UTF-8, CSV or JSON fail on their own. Files written by
+GET /api/emissions/export import as they are: rows without an activity
+type keep their recorded amount, or are priced by their emission_factor.
+
+Configuration (environment):
+    BULK_MAX_ROWS      - rows accepted per request (default 10000)
+    BULK_CHUNK_SIZE    - rows per insert transaction (default 1000)
+    IMPORT_CHUNK_SIZE  - rows per insert transaction for file imports (default 5000)
+"""
+
+import io
+import os
+import csv
+import json
+import math
+import logging
+from datetime import datetime, timezone
+from itertools import islice
+from collections import defaultdict, deque
+
+from sqlalchemy import select, insert
+
+from models import db, User, Asset, Activity, Emission
+from rollups import (
+    apply_emission_changes, rebuild_monthly_summaries, rebuild_daily_summaries, rebuild_asset_impacts
+)
+from data_versions import bump_session_data_versions
+from utils.carbon_calculator import CarbonCalculator
+
+logger = logging.getLogger(__name__)
+
+BULK_MAX_ROWS = int(os.getenv('BULK_MAX_ROWS', 10000))
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', 1000))
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 5000))
+
+# Errors kept in an import report; the failed count stays exact beyond this
+IMPORT_MAX_ERRORS = 1000
+
+REQUIRED_FIELDS = ('user_id', 'title', 'category', 'activity_type', 'value')
+
+# Category used to price rows by their own emission_factor
+CUSTOM_CATEGORY = 'custom'
+
+# Stored category -> CarbonCalculator category whose factors price it;
+# the row keeps its own category, so it lands in that rollup bucket
+CALCULATOR_CATEGORIES = {
+    'electricity': 'energy',
+}
+
+INVALID_UTF8 = 'Invalid text: not UTF-8'
+
+# Icon shown for an activity of each category
+CATEGORY_ICONS = {
+    'transport': '🚗',
+    'energy': '⚡',
+    'food': '🍽️',
+    'waste': '🗑️',
+    'other': '📝'
+}
+
+
+class BulkPayloadError(ValueError):
+    """Raised when the request body as a whole can't be read as records"""
+
+
+def parse_json_records(body):
+    """
+    Read a JSON array of records (or {"records": [...]})
+
+    Raises:
+        BulkPayloadError: If the body isn't a list of records
+    """
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise BulkPayloadError(f'Invalid JSON: {e}') from e
+    if isinstance(data, dict):
+        data = data.get('records')
+    if not isinstance(data, list):
+        raise BulkPayloadError('Expected a JSON array of records')
+    return data
+
+
+def _is_utf8(text):
+    """False for text holding undecodable bytes (kept as surrogates by open_text)"""
+    try:
+        text.encode('utf-8')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def open_text(stream):
+    """
+    Decode a binary upload lazily, line by line
+
+    Bytes that aren't UTF-8 are kept as surrogate escapes instead of
+    raising mid-file, so the reader can fail just the rows holding them.
+    """
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', errors='surrogateescape', newline='')
+
+
+def iter_ndjson_records(lines):
+    """
+    Yield one record per non-empty line; unparseable lines yield the error text
+
+    Args:
+        lines: Iterable of str/bytes lines (e.g. the request stream)
+    """
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='surrogateescape')
+        line = line.strip()
+        if not line:
+            continue
+        if not _is_utf8(line):
+            yield BulkPayloadError(INVALID_UTF8)
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield BulkPayloadError(f'Invalid JSON: {e}')
+
+
+def _parse_date(value):
+    """ISO date/datetime as a naive UTC datetime (how every date column is stored)"""
+    if value is None:
+        return datetime.utcnow()
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _parse_number(value):
+    """float() that rejects NaN and infinity, which can't be stored or summed"""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f'{value!r} is not a finite number')
+    return number
+
+
+def validate_records(records, start=0, keep_amounts=False):
+    """
+    Check every record in one pass
+
+    A record with its own emission_factor (or, with keep_amounts, its own
+    amount) needs no activity_type; it is priced by those figures instead.
+
+    Args:
+        records: List of dicts (or BulkPayloadError for unparseable lines)
+        start (int): Index reported for the first record
+        keep_amounts (bool): Accept a recorded `amount` (historical imports)
+
+    Returns:
+        tuple: (valid rows as (index, normalized dict), errors as [{'index', 'error'}])
+    """
+    errors = []
+    candidates = []
+
+    for index, record in enumerate(records, start):
+        if isinstance(record, Exception):
+            errors.append({'index': index, 'error': str(record)})
+            continue
+        if not isinstance(record, dict):
+            errors.append({'index': index, 'error': 'Record must be an object'})
+            continue
+        factor = record.get('emission_factor')
+        amount = record.get('amount') if keep_amounts else None
+        priced = factor not in (None, '') or amount not in (None, '')
+        missing = [
+            field for field in REQUIRED_FIELDS
+            if record.get(field) in (None, '') and not (field == 'activity_type' and priced)
+        ]
+        if missing:
+            errors.append({'index': index, 'error': f"Missing required field: {missing[0]}"})
+            continue
+        try:
+            row = {
+                'user_id': int(record['user_id']),
+                'title': str(record['title']),
+                'category': str(record['category']),
+                'activity_type': None if record.get('activity_type') in (None, '') else str(record['activity_type']),
+                'value': _parse_number(record['value']),
+                'emission_factor': _parse_number(factor) if factor not in (None, '') else None,
+                'recorded_amount': _parse_number(amount) if amount not in (None, '') else None,
+                'calculation_method': record.get('calculation_method'),
+                'date': _parse_date(record.get('date')),
+                'asset_id': int(record['asset_id']) if record.get('asset_id') is not None else None,
+                'location': record.get('location', ''),
+                'icon': record.get('icon'),
+                'source': record.get('source'),
+                'input_unit': record.get('input_unit', 'units'),
+            }
+        except (TypeError, ValueError) as e:
+            errors.append({'index': index, 'error': f'Invalid value: {e}'})
+            continue
+        candidates.append((index, row))
+
+    # Every referenced user and asset, checked with one query each
+    user_ids = {row['user_id'] for _, row in candidates}
+    known_users = set(db.session.scalars(select(User.id).where(User.id.in_(user_ids)))) if user_ids else set()
+    asset_ids = {row['asset_id'] for _, row in candidates if row['asset_id'] is not None}
+    asset_owners = dict(db.session.execute(
+        select(Asset.id, Asset.user_id).where(Asset.id.in_(asset_ids))
+    ).all()) if asset_ids else {}
+
+    valid = []
+    for index, row in candidates:
+        if row['user_id'] not in known_users:
+            errors.append({'index': index, 'error': f"User {row['user_id']} not found"})
+        elif row['asset_id'] is not None and asset_owners.get(row['asset_id']) != row['user_id']:
+            errors.append({'index': index, 'error': f"Asset {row['asset_id']} not found"})
+        else:
+            valid.append((index, row))
+
+    errors.sort(key=lambda error: error['index'])
+    return valid, errors
+
+
+def calculate_rows(rows):
+    """
+    Attach amount/factor to validated rows, one calculate_batch per category
+
+    Typed rows are priced by their category's CarbonCalculator factors
+    (see CALCULATOR_CATEGORIES). Rows without an activity_type are priced
+    as value × emission_factor, or keep their recorded amount when they
+    have one.
+
+    Args:
+        rows: List of (index, row) from validate_records (updated in place)
+    """
+    by_category = defaultdict(list)
+    for _, row in rows:
+        by_category[row['category'] if row['activity_type'] is not None else CUSTOM_CATEGORY].append(row)
+
+    for category, group in by_category.items():
+        batch = CarbonCalculator.calculate_batch(
+            CALCULATOR_CATEGORIES.get(category, category),
+            [row['activity_type'] for row in group],
+            [row['value'] for row in group],
+            custom_factors=[1.0 if row['emission_factor'] is None else row['emission_factor'] for row in group],
+        )
+        amounts = batch.amounts.tolist()
+        factors = batch.factors.tolist()
+        for i, row in enumerate(group):
+            if category == CUSTOM_CATEGORY and row['recorded_amount'] is not None:
+                row['amount'] = row['recorded_amount']
+                row['factor'] = row['emission_factor']
+                row['batch'] = None
+                continue
+            row['amount'] = amounts[i]
+            row['factor'] = factors[i]
+            # The calculation text is formatted at insert time, chunk by chunk
+            row['batch'] = (batch, i)
+
+
+def _activity_values(row):
+    icon_category = CALCULATOR_CATEGORIES.get(row['category'], row['category'])
+    return {
+        'user_id': row['user_id'],
+        'title': row['title'],
+        'location': row['location'],
+        'date': row['date'],
+        'amount': row['amount'],
+        'unit': 'kg CO₂',
+        'badge': row['category'],
+        'icon': row['icon'] or CATEGORY_ICONS.get(icon_category, '📝'),
+    }
+
+
+def _emission_values(row):
+    return {
+        'user_id': row['user_id'],
+        'asset_id': row['asset_id'],
+        'emission_type': row['category'],
+        'activity': row['title'],
+        'source': row['source'] or row['title'],
+        'original_value': row['value'],
+        'unit': row['input_unit'],
+        'amount': row['amount'],
+        'calculation_method': (
+            (row['calculation_method'] or 'Recorded amount') if row['batch'] is None
+            else row['batch'][0].calculation(row['batch'][1])
+        ),
+        'emission_factor': row['factor'],
+        'date': row['date'],
+    }
+
+
+def insert_chunk(rows):
+    """
+    Insert one chunk of calculated rows in a single transaction
+
+    Activities and emissions go in as multi-row INSERTs, which bypass the
+    ORM flush hooks, so the rollups and data versions are updated here,
+    once for the whole chunk.
+    """
+    activities = [_activity_values(row) for row in rows]
+    emissions = [_emission_values(row) for row in rows]
+
+    session = db.session
+    session.execute(insert(Activity.__table__), activities)
+    session.execute(insert(Emission.__table__), emissions)
+    apply_emission_changes(session.connection(), [(1, emission) for emission in emissions])
+    bump_session_data_versions(session, {row['user_id'] for row in rows})
+    session.commit()
+
+
+def ingest_records(records, chunk_size=None):
+    """
+    Validate, calculate and insert records, reporting bad rows individually
+
+    Args:
+        records: List of dicts (or BulkPayloadError for unparseable lines)
+        chunk_size (int): Rows per transaction (default BULK_CHUNK_SIZE)
+
+    Returns:
+        dict: {'received', 'inserted', 'failed', 'errors': [{'index', 'error'}]}
+    """
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    valid, errors = validate_records(records)
+    calculate_rows(valid)
+
+    inserted = 0
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        try:
+            insert_chunk([row for _, row in chunk])
+            inserted += len(chunk)
+        except Exception as e:
+            db.session.rollback()
+            logger.error("❌ Bulk chunk failed: %s", e)
+            errors.extend({'index': index, 'error': f'Database error: {e.__class__.__name__}'} for index, _ in chunk)
+
+    errors.sort(key=lambda error: error['index'])
+    return {
+        'received': len(records),
+        'inserted': inserted,
+        'failed': len(records) - inserted,
+        'errors': errors,
+    }
+
+
+# Import column name -> bulk record field
+COLUMN_ALIASES = {
+    'user': 'user_id',
+    'description': 'title',
+    'activity': 'title',
+    'name': 'title',
+    'emission_type': 'category',
+    'type': 'activity_type',
+    'subtype': 'activity_type',
+    'quantity': 'value',
+    'original_value': 'value',
+    'unit': 'input_unit',
+    'factor': 'emission_factor',
+    'timestamp': 'date',
+    'datetime': 'date',
+    'asset': 'asset_id',
+}
+
+# Category spellings found in exports from other tools -> the category we store
+CATEGORY_ALIASES = {
+    'power': 'electricity',
+    'travel': 'transport',
+    'vehicle': 'transport',
+    'diet': 'food',
+}
+
+
+def _normalize_key(value):
+    return str(value).strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def map_record(record, user_id=None):
+    """
+    Map one import row onto the fields validate_records expects
+
+    Column names and category/type spellings are normalized (so "Activity
+    Type: Car Petrol" becomes activity_type 'car_petrol'), empty cells are
+    dropped, `user_id` fills rows without one, and rows without a title get
+    one from their source or type. A category is stored under the same
+    name whether or not the row has a type, so it always reaches the same
+    rollup bucket.
+    """
+    if not isinstance(record, dict):
+        return record
+    mapped = {}
+    for column, value in record.items():
+        if column is None or value is None or value == '':
+            continue
+        key = _normalize_key(column)
+        mapped[COLUMN_ALIASES.get(key, key)] = value
+
+    if mapped.get('category') is not None:
+        category = _normalize_key(mapped['category'])
+        mapped['category'] = CATEGORY_ALIASES.get(category, category)
+    if mapped.get('activity_type') is not None:
+        mapped['activity_type'] = _normalize_key(mapped['activity_type'])
+    if user_id is not None:
+        mapped.setdefault('user_id', user_id)
+    if 'title' not in mapped:
+        title = mapped.get('source') or mapped.get('activity_type')
+        if title is not None:
+            mapped['title'] = str(title).replace('_', ' ').capitalize()
+    return mapped
+
+
+def _row_text(row):
+    for column, value in row.items():
+        yield column
+        yield from value if isinstance(value, list) else (value,)
+
+
+def iter_csv_records(lines):
+    """
+    Yield one dict per CSV row (header row first), reading lines as needed
+
+    A row the csv module rejects, or one holding bytes that aren't UTF-8,
+    is yielded as a BulkPayloadError so only that row fails.
+    """
+    reader = csv.DictReader(lines)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield BulkPayloadError(f'Invalid CSV: {e}')
+            continue
+        if all(_is_utf8(text) for text in _row_text(row) if isinstance(text, str)):
+            yield row
+        else:
+            yield BulkPayloadError(INVALID_UTF8)
+
+
+def iter_file_records(lines, file_format):
+    """
+    Read records incrementally from a text file or stream
+
+    Args:
+        lines: Iterable of text lines
+        file_format (str): 'csv' or 'ndjson'
+    """
+    if file_format == 'csv':
+        return iter_csv_records(lines)
+    if file_format == 'ndjson':
+        return iter_ndjson_records(lines)
+    raise BulkPayloadError(f"Unsupported format: {file_format} (use csv or ndjson)")
+
+
+def detect_format(filename=None, mimetype=None):
+    """Guess 'csv' or 'ndjson' from a file name or content type"""
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return 'ndjson'
+    return 'csv'
+
+
+class ImportCheckpoint:
+    """
+    Progress of one file import, saved after every committed chunk
+
+    Args:
+        path (str): JSON file holding {'rows', 'inserted', 'failed', 'user_ids'}
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Saved progress, or None when the import hasn't started"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, state):
+        # Write then rename, so a crash never leaves a half-written checkpoint
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def insert_emission_chunk(rows):
+    """
+    Insert one chunk of calculated rows as emissions in a single transaction
+
+    Rollups are left alone; import_records rebuilds them once at the end.
+    """
+    db.session.execute(insert(Emission.__table__), [_emission_values(row) for row in rows])
+    db.session.commit()
+
+
+def rebuild_rollups(user_ids):
+    """Rebuild every summary table for the given users (bumps their data versions)"""
+    for user_id in sorted(user_ids):
+        rebuild_monthly_summaries(user_id)
+        rebuild_daily_summaries(user_id)
+        rebuild_asset_impacts(user_id)
+
+
+def import_records(records, user_id=None, skip=0, chunk_size=None, checkpoint=None, progress=None):
+    """
+    Import historical emissions from an iterable of records, chunk by chunk
+
+    Only one chunk is held in memory at a time. Each chunk is validated,
+    calculated and inserted in its own transaction; rollups are rebuilt
+    once every row has been read, or for the committed chunks when reading
+    the rest fails.
+
+    Args:
+        records: Iterable of dicts (or BulkPayloadError for unparseable lines)
+        user_id (int): Owner for rows that don't name one
+        skip (int): Rows already imported (ignored when a checkpoint exists)
+        chunk_size (int): Rows per transaction (default IMPORT_CHUNK_SIZE)
+        checkpoint (ImportCheckpoint): Resume from / record progress here
+        progress (callable): Called with the report after every chunk
+
+    Returns:
+        dict: {'processed', 'inserted', 'failed', 'errors', 'truncated_errors'}
+    """
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    state = (checkpoint.load() if checkpoint else None) or {
+        'rows': skip, 'inserted': 0, 'failed': 0, 'user_ids': [],
+    }
+    report = {
+        'processed': state['rows'],
+        'inserted': state['inserted'],
+        'failed': state['failed'],
+        'errors': [],
+        'truncated_errors': False,
+    }
+    user_ids = set(state['user_ids'])
+
+    records = iter(records)
+    # Fast-forward past rows an earlier run already committed
+    deque(islice(records, report['processed']), maxlen=0)
+
+    try:
+        while True:
+            chunk = [map_record(record, user_id) for record in islice(records, chunk_size)]
+            if not chunk:
+                break
+
+            valid, errors = validate_records(chunk, start=report['processed'], keep_amounts=True)
+            calculate_rows(valid)
+            rows = [row for _, row in valid]
+            try:
+                if rows:
+                    insert_emission_chunk(rows)
+                report['inserted'] += len(rows)
+                user_ids.update(row['user_id'] for row in rows)
+            except Exception as e:
+                db.session.rollback()
+                logger.error("❌ Import chunk failed: %s", e)
+                errors.extend({'index': index, 'error': f'Database error: {e.__class__.__name__}'} for index, _ in valid)
+
+            report['processed'] += len(chunk)
+            report['failed'] += len(errors)
+            room = IMPORT_MAX_ERRORS - len(report['errors'])
+            report['errors'].extend(sorted(errors, key=lambda error: error['index'])[:max(room, 0)])
+            report['truncated_errors'] = report['truncated_errors'] or len(errors) > room
+
+            if checkpoint:
+                checkpoint.save({
+                    'rows': report['processed'], 'inserted': report['inserted'],
+                    'failed': report['failed'], 'user_ids': sorted(user_ids),
+                })
+            if progress:
+                progress(report)
+    except BaseException:
+        # Chunks committed before the failure still get their summaries
+        try:
+            rebuild_rollups(user_ids)
+        except Exception:
+            logger.exception("❌ Rebuilding rollups after a failed import")
+        raise
+
+    rebuild_rollups(user_ids)
+    if checkpoint:
+        checkpoint.clear()
+    return report
@@ -0,0 +1,284 @@
+"""
+Background AI Insights
+Generates the personalized and dashboard insights off the request path.
+
+The insight endpoints never wait for the LLM. They return the stored
+AIInsight for the user, and if it was generated from an older data
+version (see data_versions.py) or doesn't exist yet, they queue a
+regeneration and answer with what they have:
+
+    status 'ready'       - stored insight matches the user's current data
+    status 'refreshing'  - stored insight is from older data, a new one is queued
+    status 'pending'     - nothing stored yet (HTTP 202, curated fallback text)
+
+Writes to a user's emissions/activities/assets/goals also queue a refresh
+of the insights they already have, so the next visit usually finds a
+ready one.
+
+Configuration (environment):
+    INSIGHT_WORKERS  - background threads generating insights (default 2);
+                       0 generates inline, for tests and local debugging
+"""
+
+import os
+import logging
+from datetime import datetime
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import has_app_context
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, Emission, Asset, AIInsight
+from ai_context import build_ai_context
+from data_versions import get_data_version, request_data_version, changed_user_ids
+from utils import ai_helper
+from utils.ai_helper import AIEcoCoach
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_FALLBACK = "Every small action counts! Track your emissions to see how you can make a difference."
+
+
+def build_personalized_insight(user):
+    """Ask the coach for the AI EcoCoach page insight (last 30 days of data)"""
+    return AIEcoCoach.get_personalized_insight(build_ai_context(user.id))
+
+
+def build_dashboard_insight(user):
+    """Ask the coach for the one or two sentence dashboard insight"""
+    # Only the last 5 emissions are sent to the model
+    recent_emissions = (
+        db.session.query(Emission.source, Emission.amount, Emission.unit, Emission.date)
+        .filter_by(user_id=user.id)
+        .order_by(Emission.date.desc())
+        .limit(5)
+        .all()
+    )
+
+    # Top assets by their materialized emission totals
+    top_assets = (
+        db.session.query(Asset.name, Asset.carbon_impact)
+        .filter(Asset.user_id == user.id, Asset.carbon_impact > 0)
+        .order_by(Asset.carbon_impact.desc())
+        .limit(3)
+        .all()
+    )
+
+    emissions_data = [
+        f"{e.source}: {e.amount} {e.unit} on {e.date.strftime('%Y-%m-%d')}"
+        for e in recent_emissions
+    ]
+    top_assets_data = [
+        f"{name}: {round(emissions, 2)} kg CO₂"
+        for name, emissions in top_assets
+    ]
+    return AIEcoCoach.get_dashboard_insight(user.name, emissions_data, top_assets_data)
+
+
+BUILDERS = {
+    'personalized': build_personalized_insight,
+    'dashboard': build_dashboard_insight,
+}
+
+
+def fallback_insight(kind):
+    """Curated insight returned while the first real one is being generated"""
+    if kind == 'dashboard':
+        return {
+            'insight': DASHBOARD_FALLBACK,
+            'category': 'general',
+            'timestamp': datetime.utcnow().isoformat(),
+            'source': 'fallback'
+        }
+    return AIEcoCoach._get_fallback_insight()
+
+
+def get_stored_insight(user_id, kind):
+    return AIInsight.query.filter_by(user_id=user_id, kind=kind).first()
+
+
+def is_fresh(row, version):
+    return row is not None and row.status == 'ready' and row.data_version == version
+
+
+def generate_insight(user_id, kind, only_existing=False):
+    """
+    Generate and store one insight for a user
+
+    The data version is read before the LLM call, so a write that lands
+    while the insight is being generated leaves it stale rather than
+    marking old output as current.
+
+    Args:
+        user_id (int): Owner
+        kind (str): 'personalized' or 'dashboard'
+        only_existing (bool): Skip users who never asked for this insight
+
+    Returns:
+        AIInsight: The stored row, or None if nothing was generated
+    """
+    version = get_data_version(user_id)
+    if version is None:
+        return None
+
+    row = get_stored_insight(user_id, kind)
+    if (row is None and only_existing) or is_fresh(row, version):
+        return row
+
+    user = db.session.get(User, user_id)
+    result = BUILDERS[kind](user)
+    # Without a client the curated text is the best we can do; with one,
+    # a fallback means the call failed and is retried on the next request
+    ai_enabled = ai_helper.openai_available and ai_helper.client is not None
+    failed = result.get('source') != 'ai' and ai_enabled
+
+    if row is None:
+        row = AIInsight(user_id=user_id, kind=kind)
+        db.session.add(row)
+    if failed:
+        row.status = 'failed'
+        row.error = result.get('error') or 'LLM unavailable, served fallback'
+        if row.insight is None:
+            row.insight, row.source = result['insight'], result['source']
+            row.category = result.get('category', 'general')
+    else:
+        row.status = 'ready'
+        row.error = None
+        row.insight, row.source = result['insight'], result['source']
+        row.category = result.get('category', 'general')
+        row.data_version = version
+    row.generated_at = datetime.utcnow()
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another process stored this insight first; theirs is as good as ours
+        db.session.rollback()
+        return get_stored_insight(user_id, kind)
+    return row
+
+
+class InsightWorker:
+    """
+    Thread pool generating insights in the background
+
+    At most one generation runs per (user, kind). A request for a key that
+    is already running is folded into one re-run after it finishes, so a
+    burst of writes costs at most two LLM calls.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.workers = 2
+        self._executor = None
+        self._running = set()
+        self._rerun = {}
+        self._lock = Lock()
+        self.completed = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = int(os.getenv('INSIGHT_WORKERS', self.workers))
+        app.extensions['insight_worker'] = self
+
+        @app.after_request
+        def _refresh_changed_users(response):
+            for user_id in changed_user_ids():
+                for kind in BUILDERS:
+                    self.submit(user_id, kind, only_existing=True)
+            return response
+
+    @property
+    def inline(self):
+        return self.workers <= 0
+
+    def submit(self, user_id, kind, only_existing=False):
+        """
+        Queue a (re)generation
+
+        Returns:
+            bool: True if a new job was started, False if folded into a running one
+        """
+        key = (user_id, kind)
+        with self._lock:
+            if key in self._running:
+                # A full request wins over a refresh-only one
+                self._rerun[key] = self._rerun.get(key, True) and only_existing
+                return False
+            self._running.add(key)
+
+        if self.inline:
+            self._run(key, only_existing)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='insights')
+            self._executor.submit(self._run, key, only_existing)
+        return True
+
+    def _run(self, key, only_existing):
+        while True:
+            try:
+                if has_app_context():
+                    generate_insight(*key, only_existing=only_existing)
+                else:
+                    with self.app.app_context():
+                        generate_insight(*key, only_existing=only_existing)
+                outcome = 'completed'
+            except Exception as e:
+                outcome = 'failed'
+                logger.exception("❌ Insight generation failed for user %s (%s): %s", key[0], key[1], e)
+                if has_app_context():
+                    db.session.rollback()
+
+            with self._lock:
+                setattr(self, outcome, getattr(self, outcome) + 1)
+                if key not in self._rerun:
+                    self._running.discard(key)
+                    return
+                only_existing = self._rerun.pop(key)
+
+    def wait(self):
+        """Block until every queued job has finished (tests and shutdown)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'running': len(self._running),
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+
+
+insight_worker = InsightWorker()
+
+
+def insight_response(user_id, kind):
+    """
+    Build the response for an insight endpoint without waiting on the LLM
+
+    Returns:
+        tuple: (payload dict, HTTP status), or (None, 404) for unknown users
+    """
+    version = request_data_version(user_id)
+    if version is None:
+        return None, 404
+
+    row = get_stored_insight(user_id, kind)
+    if is_fresh(row, version):
+        return dict(row.to_dict(), status='ready'), 200
+
+    insight_worker.submit(user_id, kind)
+    if insight_worker.inline:
+        row = get_stored_insight(user_id, kind)
+        if is_fresh(row, version):
+            return dict(row.to_dict(), status='ready'), 200
+
+    if row is not None and row.insight:
+        return dict(row.to_dict(), status='refreshing'), 200
+    return dict(fallback_insight(kind), status='pending'), 202
@@ -0,0 +1,218 @@
+"""
+Maintenance commands for the CarbonIQ backend.
+
+Usage:
+    python manage.py upgrade-schema                  # bring an existing database up to date with models.py
+                                                     # (rebuilds any rollup table it creates or extends)
+    python manage.py rebuild-summaries [--user-id N] # recompute MonthlySummary buckets from raw emissions
+    python manage.py check-summaries [--user-id N]   # report buckets that disagree with raw emissions
+    python manage.py backfill-daily [--user-id N]    # recompute DailySummary rows from raw emissions
+    python manage.py rebuild-asset-impact [--user-id N]  # recompute Asset.carbon_impact* from raw emissions
+    python manage.py refresh-asset-windows [--user-id N] # roll 30-day/MTD asset windows forward (run daily)
+    python manage.py import-emissions FILE [--user-id N] [--format csv|ndjson] [--chunk-size N] [--restart]
+                                                     # import historical emissions, resuming from FILE.checkpoint
+"""
+
+import os
+import sys
+import argparse
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect
+
+from app import app, db
+from rollups import (
+    rebuild_monthly_summaries, rebuild_daily_summaries, rebuild_asset_impacts, refresh_asset_windows,
+    check_monthly_summaries
+)
+from ingest import ImportCheckpoint, import_records, iter_file_records, detect_format, open_text
+
+
+def upgrade_schema():
+    """
+    Create any missing tables, columns and indexes declared in models.py.
+
+    db.create_all() only creates tables that don't exist yet, so columns
+    (e.g. assets.carbon_impact_30d) and indexes (e.g. ix_emissions_user_date)
+    added to an existing table have to be created separately. New columns
+    are added as nullable. Safe to run repeatedly.
+
+    Rollups are maintained by deltas on top of their stored values, so a
+    rollup table that was just created or extended (e.g. assets, whose
+    carbon_impact used to be client-set) is rebuilt from the raw emissions
+    before any delta lands on a wrong base.
+    """
+    with app.app_context():
+        engine = db.engine
+        before = set(inspect(engine).get_table_names())
+
+        print("🗄️  Creating missing tables...")
+        db.create_all()
+
+        inspector = inspect(engine)
+        changed = {table.name for table in db.metadata.sorted_tables} - before
+        added = 0
+        created = 0
+
+        print("🧱 Checking columns...")
+        for table in db.metadata.sorted_tables:
+            existing = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                print(f"   + {table.name}.{column.name} {column_type}")
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+                changed.add(table.name)
+                added += 1
+
+        print("📇 Checking indexes...")
+        for table in db.metadata.sorted_tables:
+            existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                print(f"   + {index.name} on {table.name}({', '.join(c.name for c in index.columns)})")
+                index.create(bind=engine, checkfirst=True)
+                created += 1
+
+        print(f"✅ Schema up to date ({added} column(s) added, {created} index(es) created)")
+
+    # Each entry rebuilds one rollup table from the raw emissions
+    for table, rebuild in (
+        ('monthly_summaries', rebuild_summaries),
+        ('daily_summaries', backfill_daily),
+        ('assets', rebuild_asset_impact),
+    ):
+        if table in changed:
+            rebuild()
+
+
+def rebuild_summaries(user_id=None):
+    """Reconcile MonthlySummary buckets with the raw emissions"""
+    with app.app_context():
+        scope = f"user {user_id}" if user_id else "all users"
+        print(f"📈 Rebuilding monthly summaries for {scope}...")
+        count = rebuild_monthly_summaries(user_id)
+        print(f"✅ Wrote {count} monthly summaries")
+
+
+def check_summaries(user_id=None):
+    """
+    Compare MonthlySummary buckets with the raw emissions.
+    Exits with status 1 when any bucket is out of step.
+    """
+    with app.app_context():
+        mismatches = check_monthly_summaries(user_id)
+
+        if not mismatches:
+            print("✅ Monthly summaries match the raw emissions")
+            return
+
+        print(f"❌ {len(mismatches)} mismatched value(s):")
+        for m in mismatches:
+            print(f"   user {m['user_id']} {m['year']}-{m['month']:02d} {m['column']}: "
+                  f"stored={m['stored']} expected={m['expected']}")
+        print("   Run `python manage.py rebuild-summaries` to reconcile.")
+        sys.exit(1)
+
+
+def backfill_daily(user_id=None):
+    """Fill DailySummary rows for emissions recorded before the table existed"""
+    with app.app_context():
+        scope = f"user {user_id}" if user_id else "all users"
+        print(f"📅 Backfilling daily summaries for {scope}...")
+        count = rebuild_daily_summaries(user_id)
+        print(f"✅ Wrote {count} daily summaries")
+
+
+def rebuild_asset_impact(user_id=None):
+    """Recompute each asset's total, last-30-day and month-to-date impact"""
+    with app.app_context():
+        scope = f"user {user_id}" if user_id else "all users"
+        print(f"🏗️  Rebuilding asset carbon impact for {scope}...")
+        count = rebuild_asset_impacts(user_id)
+        print(f"✅ Updated {count} assets")
+
+
+def refresh_asset_window_columns(user_id=None):
+    """
+    Roll each asset's stored last-30-day and month-to-date impact forward to today.
+    Schedule it shortly after midnight UTC; until it runs, GET /api/assets
+    computes stale windows on the fly.
+    """
+    with app.app_context():
+        scope = f"user {user_id}" if user_id else "all users"
+        print(f"🗓️  Refreshing asset impact windows for {scope}...")
+        count = refresh_asset_windows(user_id)
+        db.session.commit()
+        print(f"✅ Refreshed {count} assets")
+
+
+def import_emissions(path, user_id=None, file_format=None, chunk_size=None, restart=False):
+    """
+    Import historical emissions from a CSV/NDJSON file, a chunk at a time.
+    Progress is checkpointed to FILE.checkpoint after every chunk, so
+    re-running the same command after an interruption picks up where it
+    stopped; --restart discards the checkpoint and starts over.
+    """
+    if not path:
+        print("❌ import-emissions needs a file path")
+        sys.exit(2)
+
+    with app.app_context():
+        checkpoint = ImportCheckpoint(f"{path}.checkpoint")
+        if restart:
+            checkpoint.clear()
+        state = checkpoint.load()
+        if state:
+            print(f"⏩ Resuming after row {state['rows']} ({state['inserted']} already inserted)")
+
+        def report_progress(report):
+            print(f"   … {report['processed']:,} rows ({report['inserted']:,} inserted, {report['failed']:,} failed)")
+
+        print(f"📥 Importing emissions from {path}...")
+        with open_text(open(path, 'rb')) as f:
+            report = import_records(
+                iter_file_records(f, file_format or detect_format(path)),
+                user_id=user_id, chunk_size=chunk_size, checkpoint=checkpoint, progress=report_progress
+            )
+
+        print(f"✅ Imported {report['inserted']:,} of {report['processed']:,} rows; rollups rebuilt")
+        for error in report['errors'][:20]:
+            print(f"   row {error['index']}: {error['error']}")
+        if report['failed'] > 20:
+            print(f"   ... {report['failed'] - 20:,} more failed row(s)")
+
+
+COMMANDS = {
+    'upgrade-schema': lambda args: upgrade_schema(),
+    'rebuild-summaries': lambda args: rebuild_summaries(args.user_id),
+    'check-summaries': lambda args: check_summaries(args.user_id),
+    'backfill-daily': lambda args: backfill_daily(args.user_id),
+    'rebuild-asset-impact': lambda args: rebuild_asset_impact(args.user_id),
+    'refresh-asset-windows': lambda args: refresh_asset_window_columns(args.user_id),
+    'import-emissions': lambda args: import_emissions(
+        args.path, args.user_id, args.format, args.chunk_size, args.restart
+    ),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='CarbonIQ maintenance commands')
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('path', nargs='?', help='file to import (import-emissions)')
+    parser.add_argument('--user-id', type=int, help='limit the command to one user (import-emissions: owner of rows without one)')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help='import file format (default: from extension)')
+    parser.add_argument('--chunk-size', type=int, help='rows per import transaction')
+    parser.add_argument('--restart', action='store_true', help='ignore a saved import checkpoint')
+    args = parser.parse_args(argv)
+
+    COMMANDS[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
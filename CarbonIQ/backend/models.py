@@ -14,6 +14,9 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Bumped on every emission/activity/asset/goal write (see data_versions.py)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     # Hash the password when setting it
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -29,6 +32,8 @@ class User(db.Model):
     activities = db.relationship("Activity", backref="user", lazy=True, cascade="all, delete-orphan")
     goals = db.relationship("Goal", backref="user", lazy=True, cascade="all, delete-orphan")
     monthly_summaries = db.relationship("MonthlySummary", backref="user", lazy=True, cascade="all, delete-orphan")
+    daily_summaries = db.relationship("DailySummary", backref="user", lazy=True, cascade="all, delete-orphan")
+    ai_insights = db.relationship("AIInsight", backref="user", lazy=True, cascade="all, delete-orphan")
 
     def to_dict(self):
         return {
@@ -53,10 +58,19 @@ class Asset(db.Model):
     model = db.Column(db.String(100))                         # e.g. "CAT 320"
     year = db.Column(db.String(4))                            # e.g. "2019"
     emoji = db.Column(db.String(10))                          # e.g. "🏗️"
-    carbon_impact = db.Column(db.Float, default=0.0)          # Total CO2
     status = db.Column(db.String(50), default="active")       # active / retired
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Materialized from the asset's emissions (see rollups.py), not client-set
+    carbon_impact = db.Column(db.Float, default=0.0)          # Total CO2
+    carbon_impact_30d = db.Column(db.Float, default=0.0)      # Last 30 days
+    carbon_impact_mtd = db.Column(db.Float, default=0.0)      # Month to date
+    impact_window_day = db.Column(db.Date, default=lambda: datetime.utcnow().date())  # Day the 30d/MTD windows were computed for
+
+    __table_args__ = (
+        db.Index('ix_assets_user_impact', 'user_id', 'carbon_impact'),
+    )
+
     # Relationships
     emissions = db.relationship("Emission", backref="asset", lazy=True, cascade="all, delete-orphan")
 
@@ -70,6 +84,8 @@ class Asset(db.Model):
             'year': self.year,
             'emoji': self.emoji,
             'carbon_impact': float(self.carbon_impact) if self.carbon_impact else 0.0,
+            'carbon_impact_30d': float(self.carbon_impact_30d) if self.carbon_impact_30d else 0.0,
+            'carbon_impact_mtd': float(self.carbon_impact_mtd) if self.carbon_impact_mtd else 0.0,
             'status': self.status
         }
 
@@ -99,6 +115,13 @@ class Emission(db.Model):
     
     date = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Per-user time-range lookups (dashboard, metrics, goal progress)
+    __table_args__ = (
+        db.Index('ix_emissions_user_date', 'user_id', 'date'),
+        db.Index('ix_emissions_user_type_date', 'user_id', 'emission_type', 'date'),
+        db.Index('ix_emissions_asset_date', 'asset_id', 'date'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -125,6 +148,10 @@ class Activity(db.Model):
     badge = db.Column(db.String(50))                          # e.g. "vehicle"
     icon = db.Column(db.String(10))                           # emoji e.g. "🚗"
 
+    __table_args__ = (
+        db.Index('ix_activities_user_date', 'user_id', 'date'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -209,4 +236,73 @@ class MonthlySummary(db.Model):
         }
     
     def __repr__(self):
-        return f"<MonthlySummary {self.year}-{self.month} User:{self.user_id}>"
\ No newline at end of file
+        return f"<MonthlySummary {self.year}-{self.month} User:{self.user_id}>"
+
+
+class DailySummary(db.Model):
+    __tablename__ = "daily_summaries"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+
+    total_emissions = db.Column(db.Float, default=0.0)
+
+    # Category breakdown (same buckets as MonthlySummary)
+    electricity_emissions = db.Column(db.Float, default=0.0)
+    transport_emissions = db.Column(db.Float, default=0.0)
+    food_emissions = db.Column(db.Float, default=0.0)
+    other_emissions = db.Column(db.Float, default=0.0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Unique constraint (also serves the per-user day-range lookups)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='unique_user_day'),
+    )
+
+    def to_dict(self):
+        return {
+            'date': self.day.isoformat(),
+            'total_emissions': float(self.total_emissions),
+            'electricity': float(self.electricity_emissions),
+            'transport': float(self.transport_emissions),
+            'food': float(self.food_emissions),
+            'other': float(self.other_emissions)
+        }
+
+    def __repr__(self):
+        return f"<DailySummary {self.day} User:{self.user_id}>"
+
+
+class AIInsight(db.Model):
+    __tablename__ = "ai_insights"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)             # personalized / dashboard
+    status = db.Column(db.String(20), default="pending")        # ready / failed
+
+    insight = db.Column(db.Text)
+    category = db.Column(db.String(50))
+    source = db.Column(db.String(20))                           # ai / fallback
+    error = db.Column(db.Text)
+
+    # User.data_version the insight was generated from (see insights.py)
+    data_version = db.Column(db.Integer)
+    generated_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'kind', name='unique_user_insight'),
+    )
+
+    def to_dict(self):
+        return {
+            'insight': self.insight,
+            'category': self.category,
+            'source': self.source,
+            'timestamp': self.generated_at.isoformat() if self.generated_at else None
+        }
+
+    def __repr__(self):
+        return f"<AIInsight {self.kind} User:{self.user_id} {self.status}>"
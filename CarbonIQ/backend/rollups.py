@@ -0,0 +1,668 @@
+"""
+Rollup Maintenance
+Keeps MonthlySummary and DailySummary buckets, and the per-asset
+carbon_impact columns, in step with Emission writes.
+
+Every insert, update or delete of an Emission that goes through the ORM
+session applies a +/- amount delta to the matching (user, year, month)
+and (user, day) buckets inside the same transaction, so a write costs O(1)
+statements instead of re-aggregating the whole month. Bulk inserts that
+bypass the session must call apply_emission_changes() (plus
+data_versions.bump_data_versions()) or the rebuild_*() functions
+themselves; check_monthly_summaries() reports any drift.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, date as date_type
+
+from sqlalchemy import event, inspect, select, update, delete, insert, func, case, and_, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import db, User, Asset, Emission, MonthlySummary, DailySummary
+from utils.periods import previous_month
+from data_versions import bump_data_versions
+
+# emission_type -> MonthlySummary category column (anything else is "other")
+CATEGORY_COLUMNS = {
+    'electricity': 'electricity_emissions',
+    'transport': 'transport_emissions',
+    'food': 'food_emissions',
+}
+
+EMISSION_FIELDS = ('user_id', 'asset_id', 'emission_type', 'amount', 'date')
+
+# Rolling window behind Asset.carbon_impact_30d
+ASSET_WINDOW_DAYS = 30
+
+UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def category_column(emission_type):
+    """Get the MonthlySummary column an emission type is rolled into"""
+    return CATEGORY_COLUMNS.get(emission_type, 'other_emissions')
+
+
+def next_month(year, month):
+    """Get (year, month) of the month after the given one"""
+    if month == 12:
+        return year + 1, 1
+    return year, month + 1
+
+
+# ---------------------------------------------------------------------------
+# Collecting changes from the session
+# ---------------------------------------------------------------------------
+
+def _snapshot(emission, previous=False):
+    """Get the rollup-relevant fields of an emission, before or after the flush"""
+    state = inspect(emission)
+    row = {}
+    for field in EMISSION_FIELDS:
+        history = state.attrs[field].history
+        if previous and history.deleted:
+            row[field] = history.deleted[0]
+        elif history.added:
+            row[field] = history.added[0]
+        else:
+            row[field] = getattr(emission, field)
+    return row
+
+
+def _previous_snapshots(session):
+    """
+    Capture what dirty/deleted emissions looked like before this flush
+
+    Attributes set on an expired instance (the usual case after a commit)
+    carry no previous value in their history, so those rows are read back
+    from the database in one query while they still hold the old values.
+    """
+    previous = {}
+    lookup = {}
+
+    for obj in session.deleted:
+        if isinstance(obj, Emission):
+            previous[obj] = _snapshot(obj, previous=True)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Emission) or not session.is_modified(obj, include_collections=False):
+            continue
+        state = inspect(obj)
+        unknown = any(
+            state.attrs[field].history.added and not state.attrs[field].history.deleted
+            for field in EMISSION_FIELDS
+        )
+        if unknown and state.identity:
+            lookup[state.identity[0]] = obj
+        else:
+            previous[obj] = _snapshot(obj, previous=True)
+
+    if lookup:
+        columns = [getattr(Emission, field) for field in EMISSION_FIELDS]
+        rows = session.connection().execute(
+            select(Emission.id, *columns).where(Emission.id.in_(list(lookup)))
+        )
+        for row in rows:
+            previous[lookup[row.id]] = {field: getattr(row, field) for field in EMISSION_FIELDS}
+
+    return previous
+
+
+def _session_emission_changes(session, previous):
+    """
+    Turn the emissions being flushed into signed row snapshots
+
+    Returns:
+        list: [(sign, {'user_id', 'asset_id', 'emission_type', 'amount', 'date'}), ...]
+    """
+    changes = []
+
+    for obj in session.new:
+        if isinstance(obj, Emission):
+            changes.append((1, _snapshot(obj)))
+
+    for obj in session.deleted:
+        if obj in previous:
+            changes.append((-1, previous[obj]))
+
+    for obj in session.dirty:
+        if obj not in previous or obj in session.deleted:
+            continue
+        before = previous[obj]
+        after = _snapshot(obj)
+        if before != after:
+            changes.append((-1, before))
+            changes.append((1, after))
+
+    # Users deleted in this flush take their summaries with them
+    deleted_users = {obj.id for obj in session.deleted if isinstance(obj, User)}
+    return [
+        (sign, row) for sign, row in changes
+        if row['user_id'] is not None and row['user_id'] not in deleted_users
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Applying deltas
+# ---------------------------------------------------------------------------
+
+def upsert_delta(connection, table, keys, deltas, insert_values=None):
+    """
+    Atomically add `deltas` to the row identified by `keys`, creating it if needed
+
+    Args:
+        connection: Connection inside the current transaction
+        table: Table with a unique constraint over `keys`
+        keys (dict): Column values identifying the bucket
+        deltas (dict): column -> amount to add
+        insert_values (dict): Extra column values used only when the row is created
+    """
+    now = datetime.utcnow()
+    insert_values = dict(insert_values or {})
+    if 'updated_at' in table.c:
+        insert_values.setdefault('updated_at', now)
+
+    upsert = UPSERT_DIALECTS.get(connection.dialect.name)
+    if upsert is not None:
+        stmt = upsert(table).values(**keys, **deltas, **insert_values)
+        set_ = {
+            column: func.coalesce(table.c[column], 0) + stmt.excluded[column]
+            for column in deltas
+        }
+        if 'updated_at' in table.c:
+            set_['updated_at'] = now
+        connection.execute(stmt.on_conflict_do_update(index_elements=list(keys), set_=set_))
+        return
+
+    # Portable fallback: update in place, insert when the bucket doesn't exist yet
+    values = {column: func.coalesce(table.c[column], 0) + delta for column, delta in deltas.items()}
+    if 'updated_at' in table.c:
+        values['updated_at'] = now
+    where = and_(*(table.c[column] == value for column, value in keys.items()))
+    result = connection.execute(update(table).where(where).values(**values))
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(**keys, **deltas, **insert_values))
+
+
+def _apply_monthly_delta(connection, user_id, year, month, deltas):
+    """Apply one bucket's deltas plus the knock-on change to next month's comparison"""
+    table = MonthlySummary.__table__
+    prev_year, prev_month = previous_month(year, month)
+    next_year, following_month = next_month(year, month)
+
+    previous_total = (
+        select(func.coalesce(func.sum(table.c.total_emissions), 0.0))
+        .where(
+            table.c.user_id == user_id,
+            table.c.year == prev_year,
+            table.c.month == prev_month,
+        )
+        .scalar_subquery()
+    )
+
+    upsert_delta(
+        connection,
+        table,
+        {'user_id': user_id, 'year': year, 'month': month},
+        deltas,
+        insert_values={
+            'previous_month_emissions': previous_total,
+            'created_at': datetime.utcnow(),
+        },
+    )
+
+    # Next month compares itself against this one
+    if deltas.get('total_emissions'):
+        connection.execute(
+            update(table)
+            .where(
+                table.c.user_id == user_id,
+                table.c.year == next_year,
+                table.c.month == following_month,
+            )
+            .values(
+                previous_month_emissions=func.coalesce(table.c.previous_month_emissions, 0)
+                + deltas['total_emissions']
+            )
+        )
+
+    # percent_change > 0 means emissions decreased (see EmissionService.get_dashboard_stats)
+    connection.execute(
+        update(table)
+        .where(
+            table.c.user_id == user_id,
+            or_(
+                and_(table.c.year == year, table.c.month == month),
+                and_(table.c.year == next_year, table.c.month == following_month),
+            ),
+        )
+        .values(percent_change=case(
+            (
+                table.c.previous_month_emissions > 0,
+                (table.c.previous_month_emissions - table.c.total_emissions)
+                / table.c.previous_month_emissions * 100,
+            ),
+            else_=0.0,
+        ))
+    )
+
+
+def day_of(value):
+    """Get the calendar day of an emission date (datetime or date)"""
+    return value.date() if isinstance(value, datetime) else value
+
+
+def asset_windows(today=None):
+    """
+    Get the (last_30_days_start, month_start) datetimes for the asset impact windows
+
+    Returns:
+        tuple: (datetime, datetime)
+    """
+    today = today or datetime.utcnow().date()
+    midnight = datetime(today.year, today.month, today.day)
+    return midnight - timedelta(days=ASSET_WINDOW_DAYS), midnight.replace(day=1)
+
+
+def _apply_asset_delta(connection, asset_id, deltas, today):
+    """
+    Add an asset's emission deltas to its materialized impact columns.
+
+    The 30-day/MTD columns are only adjusted when they were computed for
+    today; stale windows are computed on read by current_asset_windows()
+    and rolled forward by refresh_asset_windows().
+    """
+    table = Asset.__table__
+    current = table.c.impact_window_day == today
+
+    def windowed(column, delta):
+        return case((current, func.coalesce(column, 0) + delta), else_=column)
+
+    connection.execute(
+        update(table)
+        .where(table.c.id == asset_id)
+        .values(
+            carbon_impact=func.coalesce(table.c.carbon_impact, 0) + deltas['total'],
+            carbon_impact_30d=windowed(table.c.carbon_impact_30d, deltas['last_30d']),
+            carbon_impact_mtd=windowed(table.c.carbon_impact_mtd, deltas['mtd']),
+        )
+    )
+
+
+def apply_emission_changes(connection, changes):
+    """
+    Fold signed emission rows into MonthlySummary/DailySummary/Asset deltas and apply them
+
+    Args:
+        connection: Connection inside the current transaction
+        changes: Iterable of (sign, row) where row has user_id, emission_type, amount and date
+    """
+    monthly = defaultdict(lambda: defaultdict(float))
+    daily = defaultdict(lambda: defaultdict(float))
+    assets = defaultdict(lambda: defaultdict(float))
+    today = datetime.utcnow().date()
+    # Compared by calendar day: emission dates may be plain dates or datetimes
+    last_30d_start, month_start = (bound.date() for bound in asset_windows(today))
+
+    for sign, row in changes:
+        amount = float(row.get('amount') or 0.0) * sign
+        if not amount:
+            continue
+        date = row.get('date') or datetime.utcnow()
+        column = category_column(row.get('emission_type'))
+        for bucket in (
+            monthly[(row['user_id'], date.year, date.month)],
+            daily[(row['user_id'], day_of(date))],
+        ):
+            bucket['total_emissions'] += amount
+            bucket[column] += amount
+
+        if row.get('asset_id') is not None:
+            asset = assets[row['asset_id']]
+            asset['total'] += amount
+            day = day_of(date)
+            asset['last_30d'] += amount if day >= last_30d_start else 0.0
+            asset['mtd'] += amount if day >= month_start else 0.0
+
+    for (user_id, year, month), deltas in monthly.items():
+        _apply_monthly_delta(connection, user_id, year, month, dict(deltas))
+
+    for (user_id, day), deltas in daily.items():
+        upsert_delta(connection, DailySummary.__table__, {'user_id': user_id, 'day': day}, dict(deltas))
+
+    for asset_id, deltas in assets.items():
+        _apply_asset_delta(connection, asset_id, deltas, today)
+
+
+@event.listens_for(Session, 'before_flush')
+def _capture_previous_rows(session, flush_context, instances):
+    session.info['rollup_previous'] = _previous_snapshots(session)
+
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_rollups(session, flush_context):
+    previous = session.info.pop('rollup_previous', {})
+    changes = _session_emission_changes(session, previous)
+    if changes:
+        apply_emission_changes(session.connection(), changes)
+
+
+# ---------------------------------------------------------------------------
+# Reconciliation
+# ---------------------------------------------------------------------------
+
+SUMMARY_COLUMNS = (
+    'total_emissions',
+    'previous_month_emissions',
+    'percent_change',
+    'electricity_emissions',
+    'transport_emissions',
+    'food_emissions',
+    'other_emissions',
+)
+
+
+def _expected_monthly_summaries(user_id=None):
+    """
+    Aggregate the raw emissions into the MonthlySummary rows they should produce
+
+    Returns:
+        dict: (user_id, year, month) -> {summary column: value}
+    """
+    year = func.extract('year', Emission.date)
+    month = func.extract('month', Emission.date)
+
+    query = select(
+        Emission.user_id,
+        year.label('year'),
+        month.label('month'),
+        Emission.emission_type,
+        func.sum(Emission.amount).label('total'),
+    ).group_by(Emission.user_id, year, month, Emission.emission_type)
+    if user_id is not None:
+        query = query.where(Emission.user_id == user_id)
+
+    buckets = defaultdict(lambda: defaultdict(float))
+    for row in db.session.execute(query):
+        bucket = buckets[(row.user_id, int(row.year), int(row.month))]
+        bucket['total_emissions'] += row.total or 0.0
+        bucket[category_column(row.emission_type)] += row.total or 0.0
+
+    expected = {}
+    for (uid, y, m), totals in buckets.items():
+        previous_total = buckets.get((uid, *previous_month(y, m)), {}).get('total_emissions', 0.0)
+        total = totals['total_emissions']
+        expected[(uid, y, m)] = {
+            'total_emissions': total,
+            'previous_month_emissions': previous_total,
+            'percent_change': ((previous_total - total) / previous_total) * 100 if previous_total > 0 else 0.0,
+            'electricity_emissions': totals['electricity_emissions'],
+            'transport_emissions': totals['transport_emissions'],
+            'food_emissions': totals['food_emissions'],
+            'other_emissions': totals['other_emissions'],
+        }
+    return expected
+
+
+def rebuild_monthly_summaries(user_id=None):
+    """
+    Rebuild MonthlySummary buckets from scratch out of the raw emissions
+
+    Args:
+        user_id (int): Only rebuild this user's buckets (default: everyone)
+
+    Returns:
+        int: Number of buckets written
+    """
+    now = datetime.utcnow()
+    summaries = [
+        {'user_id': uid, 'year': y, 'month': m, **values, 'created_at': now, 'updated_at': now}
+        for (uid, y, m), values in _expected_monthly_summaries(user_id).items()
+    ]
+
+    try:
+        stmt = delete(MonthlySummary.__table__)
+        if user_id is not None:
+            stmt = stmt.where(MonthlySummary.__table__.c.user_id == user_id)
+        db.session.execute(stmt)
+        if summaries:
+            db.session.execute(insert(MonthlySummary.__table__), summaries)
+        bump_data_versions(db.session.connection(), None if user_id is None else [user_id])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise e
+
+    return len(summaries)
+
+
+def check_monthly_summaries(user_id=None, tolerance=0.01):
+    """
+    Compare stored MonthlySummary buckets against the raw emissions
+
+    Args:
+        user_id (int): Only check this user's buckets (default: everyone)
+        tolerance (float): Allowed absolute difference per column (kg CO2)
+
+    Returns:
+        list: [{'user_id', 'year', 'month', 'column', 'stored', 'expected'}, ...]
+    """
+    expected = _expected_monthly_summaries(user_id)
+
+    query = MonthlySummary.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    stored = {(s.user_id, s.year, s.month): s for s in query.all()}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        uid, year, month = key
+        summary = stored.get(key)
+        values = expected.get(key)
+        if values is None:
+            # A bucket emptied by deletes: zero totals, still compared to last month
+            previous_total = expected.get((uid, *previous_month(year, month)), {}).get('total_emissions', 0.0)
+            values = dict.fromkeys(SUMMARY_COLUMNS, 0.0)
+            values['previous_month_emissions'] = previous_total
+            values['percent_change'] = 100.0 if previous_total > 0 else 0.0
+
+        for column in SUMMARY_COLUMNS:
+            stored_value = float(getattr(summary, column) or 0.0) if summary else None
+            if stored_value is None or abs(stored_value - values[column]) > tolerance:
+                mismatches.append({
+                    'user_id': uid,
+                    'year': year,
+                    'month': month,
+                    'column': column,
+                    'stored': stored_value,
+                    'expected': values[column],
+                })
+    return mismatches
+
+
+def rebuild_daily_summaries(user_id=None):
+    """
+    Rebuild DailySummary rows from scratch out of the raw emissions
+
+    Args:
+        user_id (int): Only rebuild this user's days (default: everyone)
+
+    Returns:
+        int: Number of days written
+    """
+    day = func.date(Emission.date)
+    query = select(
+        Emission.user_id,
+        day.label('day'),
+        Emission.emission_type,
+        func.sum(Emission.amount).label('total'),
+    ).group_by(Emission.user_id, day, Emission.emission_type)
+    if user_id is not None:
+        query = query.where(Emission.user_id == user_id)
+
+    buckets = defaultdict(lambda: defaultdict(float))
+    for row in db.session.execute(query):
+        # SQLite returns DATE() as text
+        row_day = date_type.fromisoformat(row.day) if isinstance(row.day, str) else day_of(row.day)
+        bucket = buckets[(row.user_id, row_day)]
+        bucket['total_emissions'] += row.total or 0.0
+        bucket[category_column(row.emission_type)] += row.total or 0.0
+
+    now = datetime.utcnow()
+    days = [
+        {
+            'user_id': uid,
+            'day': row_day,
+            'total_emissions': totals['total_emissions'],
+            'electricity_emissions': totals['electricity_emissions'],
+            'transport_emissions': totals['transport_emissions'],
+            'food_emissions': totals['food_emissions'],
+            'other_emissions': totals['other_emissions'],
+            'updated_at': now,
+        }
+        for (uid, row_day), totals in buckets.items()
+    ]
+
+    try:
+        stmt = delete(DailySummary.__table__)
+        if user_id is not None:
+            stmt = stmt.where(DailySummary.__table__.c.user_id == user_id)
+        db.session.execute(stmt)
+        if days:
+            db.session.execute(insert(DailySummary.__table__), days)
+        bump_data_versions(db.session.connection(), None if user_id is None else [user_id])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise e
+
+    return len(days)
+
+
+def _window_total(start):
+    """Correlated subquery summing an asset's emissions since `start`"""
+    return (
+        select(func.coalesce(func.sum(Emission.amount), 0.0))
+        .where(Emission.asset_id == Asset.id, Emission.date >= start)
+        .scalar_subquery()
+    )
+
+
+def current_asset_windows(assets):
+    """
+    Get today's 30-day/MTD totals for assets whose stored windows are from an earlier day
+
+    Read-only: the totals come from one grouped query over those assets'
+    recent emissions and are not written back, so list reads take no locks.
+
+    Args:
+        assets: Asset rows about to be returned
+
+    Returns:
+        dict: asset_id -> (carbon_impact_30d, carbon_impact_mtd), stale assets only
+    """
+    today = datetime.utcnow().date()
+    stale = [asset.id for asset in assets if asset.impact_window_day != today]
+    if not stale:
+        return {}
+
+    last_30d_start, month_start = asset_windows(today)
+    rows = db.session.execute(
+        select(
+            Emission.asset_id,
+            func.sum(case((Emission.date >= last_30d_start, Emission.amount), else_=0.0)),
+            func.sum(case((Emission.date >= month_start, Emission.amount), else_=0.0)),
+        )
+        .where(Emission.asset_id.in_(stale), Emission.date >= min(last_30d_start, month_start))
+        .group_by(Emission.asset_id)
+    )
+
+    windows = dict.fromkeys(stale, (0.0, 0.0))
+    windows.update({asset_id: (last_30d or 0.0, mtd or 0.0) for asset_id, last_30d, mtd in rows})
+    return windows
+
+
+def refresh_asset_windows(user_id=None):
+    """
+    Recompute carbon_impact_30d/_mtd for assets whose windows were computed
+    before today. A no-op for assets already refreshed today; the caller commits.
+    Meant for a daily job (`manage.py refresh-asset-windows`), not the read path.
+
+    Args:
+        user_id (int): Only refresh this user's assets (default: everyone)
+    """
+    today = datetime.utcnow().date()
+    last_30d_start, month_start = asset_windows(today)
+
+    stmt = (
+        update(Asset)
+        .where(or_(Asset.impact_window_day.is_(None), Asset.impact_window_day != today))
+        .values(
+            carbon_impact_30d=_window_total(last_30d_start),
+            carbon_impact_mtd=_window_total(month_start),
+            impact_window_day=today,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if user_id is not None:
+        stmt = stmt.where(Asset.user_id == user_id)
+    # No data version bump: the windows only move when the day does, and
+    # day-relative responses already carry the day in their ETag
+    return db.session.execute(stmt).rowcount
+
+
+def rebuild_asset_impacts(user_id=None):
+    """
+    Recompute every materialized asset impact column from the raw emissions
+
+    Args:
+        user_id (int): Only rebuild this user's assets (default: everyone)
+
+    Returns:
+        int: Number of assets written
+    """
+    stmt = (
+        update(Asset)
+        .values(
+            carbon_impact=select(func.coalesce(func.sum(Emission.amount), 0.0))
+            .where(Emission.asset_id == Asset.id)
+            .scalar_subquery(),
+            impact_window_day=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if user_id is not None:
+        stmt = stmt.where(Asset.user_id == user_id)
+
+    try:
+        count = db.session.execute(stmt).rowcount
+        refresh_asset_windows(user_id)
+        bump_data_versions(db.session.connection(), None if user_id is None else [user_id])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise e
+
+    return count
+
+
+def get_monthly_summaries(user_id, *periods):
+    """
+    Fetch a user's summaries for the given (year, month) periods in one query
+
+    Returns:
+        dict: (year, month) -> MonthlySummary (missing periods are omitted)
+    """
+    if not periods:
+        return {}
+    summaries = MonthlySummary.query.filter(
+        MonthlySummary.user_id == user_id,
+        or_(*(
+            and_(MonthlySummary.year == year, MonthlySummary.month == month)
+            for year, month in periods
+        ))
+    ).all()
+    return {(s.year, s.month): s for s in summaries}
@@ -1,32 +1,37 @@
 from flask import Blueprint, jsonify, request
 from models import db, Activity, Emission, User, Asset
 from utils.carbon_calculator import CarbonCalculator
+from utils.pagination import paginate, InvalidCursor
+from utils.etags import enable_conditional_get
+from ingest import (
+    ingest_records, parse_json_records, iter_ndjson_records, BulkPayloadError, CATEGORY_ICONS, BULK_MAX_ROWS
+)
 from datetime import datetime
-import traceback
+import logging
 
 activity_bp = Blueprint('activity_bp', __name__, url_prefix='/api/activities')
+logger = logging.getLogger(__name__)
+enable_conditional_get(activity_bp)
 
 
 # GET ALL ACTIVITIES
 @activity_bp.route('/<int:user_id>', methods=['GET'])
 def get_activities(user_id):
     """
-    Get all activities for a user
-    Returns: [{ id, title, location, date, amount, unit, badge, icon }, ...]
+    Get a user's activities, newest first
+    Query: limit, cursor, total, category
+    Returns: { activities: [{ id, title, location, date, amount, unit, badge, icon }, ...],
+               pagination: { limit, next_cursor, has_more, total } }
     """
     try:
-        print(f"🔍 Querying activities for user {user_id}")
+        logger.debug("🔍 Querying activities for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
         
-        # Get pagination parameters
-        page = request.args.get('page', 1, type=int)
-        limit = request.args.get('limit', 20, type=int)
-        
         # Get filter parameters
         category = request.args.get('category', None)
         
@@ -36,29 +41,17 @@ def get_activities(user_id):
         if category:
             query = query.filter_by(badge=category)
         
-        # Order by date descending
-        query = query.order_by(Activity.date.desc())
-        
-        # Paginate
-        offset = (page - 1) * limit
-        activities = query.limit(limit).offset(offset).all()
-        total = query.count()
-        
-        print(f"📝 Found {len(activities)} activities (total: {total})")
+        # Keyset paginate on (date, id), newest first
+        page = paginate(query, Activity.date, Activity.id, total_key=('activities', user_id, category))
         
-        activities_data = [activity.to_dict() for activity in activities]
+        logger.debug("📝 Found %s activities (more: %s)", len(page.items), page.has_more)
         
-        return jsonify({
-            'activities': activities_data,
-            'total': total,
-            'page': page,
-            'limit': limit,
-            'pages': (total + limit - 1) // limit
-        }), 200
+        return jsonify(page.to_dict('activities')), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"❌ Error getting activities: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error getting activities: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -73,21 +66,21 @@ def create_activity():
     """
     try:
         data = request.get_json()
-        print(f"🆕 Creating new activity: {data}")
+        logger.debug("🆕 Creating new activity: %s", data)
         
         # Validate required fields
         required_fields = ['user_id', 'title', 'category', 'activity_type', 'value']
         for field in required_fields:
             if field not in data:
                 error_msg = f"Missing required field: {field}"
-                print(f"❌ {error_msg}")
+                logger.info("❌ %s", error_msg)
                 return jsonify({'error': error_msg}), 400
         
         # Check if user exists
         user = User.query.get(data['user_id'])
         if not user:
             error_msg = f"User {data['user_id']} not found"
-            print(f"❌ {error_msg}")
+            logger.info("❌ %s", error_msg)
             return jsonify({'error': error_msg}), 404
         
         # Calculate carbon emission based on category
@@ -110,15 +103,6 @@ def create_activity():
             factor = data.get('emission_factor', 1.0)
             emission_result = CarbonCalculator.calculate_custom_emission(value, factor)
         
-        # Get icon based on category
-        icon_map = {
-            'transport': '🚗',
-            'energy': '⚡',
-            'food': '🍽️',
-            'waste': '🗑️',
-            'other': '📝'
-        }
-        
         # Create Activity record
         new_activity = Activity(
             user_id=data['user_id'],
@@ -128,7 +112,7 @@ def create_activity():
             amount=emission_result['amount'],
             unit=emission_result['unit'],
             badge=category,
-            icon=data.get('icon', icon_map.get(category, '📝'))
+            icon=data.get('icon', CATEGORY_ICONS.get(category, '📝'))
         )
         
         db.session.add(new_activity)
@@ -153,8 +137,8 @@ def create_activity():
         db.session.add(new_emission)
         db.session.commit()
         
-        print(f"✅ Activity created successfully: {new_activity.to_dict()}")
-        print(f"✅ Emission recorded: {emission_result['amount']} kg CO₂")
+        logger.info("✅ Activity created successfully: %s", new_activity)
+        logger.info("✅ Emission recorded: %s kg CO₂", emission_result['amount'])
         
         return jsonify({
             'message': 'Activity created successfully!',
@@ -168,8 +152,53 @@ def create_activity():
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error creating activity: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error creating activity: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+# BULK CREATE ACTIVITIES
+@activity_bp.route('/bulk', methods=['POST'])
+def create_activities_bulk():
+    """
+    Create many activities (and their emissions) in one request
+    Body: JSON array of activity objects (same fields as POST /api/activities),
+          or NDJSON (Content-Type: application/x-ndjson), one object per line
+    Returns: { received, inserted, failed, errors: [{ index, error }, ...] }
+             201 when every row was inserted, 207 when some failed,
+             400 when none could be inserted
+    """
+    try:
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            records = []
+            for record in iter_ndjson_records(request.stream):
+                records.append(record)
+                if len(records) > BULK_MAX_ROWS:
+                    break
+        else:
+            records = parse_json_records(request.get_data(as_text=True))
+        
+        if len(records) > BULK_MAX_ROWS:
+            return jsonify({'error': f'At most {BULK_MAX_ROWS} records per request'}), 413
+        if not records:
+            return jsonify({'error': 'No records provided'}), 400
+        
+        logger.debug("📦 Bulk creating %s activities", len(records))
+        result = ingest_records(records)
+        logger.info("✅ Bulk insert: %s inserted, %s failed", result['inserted'], result['failed'])
+        
+        if result['inserted'] == 0:
+            status = 400
+        elif result['failed']:
+            status = 207
+        else:
+            status = 201
+        return jsonify(result), status
+        
+    except BulkPayloadError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("❌ Error bulk creating activities: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -184,11 +213,11 @@ def update_activity(activity_id):
         activity = Activity.query.get(activity_id)
         
         if not activity:
-            print(f"❌ Activity {activity_id} not found")
+            logger.info("❌ Activity %s not found", activity_id)
             return jsonify({'error': 'Activity not found'}), 404
         
         data = request.get_json()
-        print(f"📝 Updating activity {activity_id}: {data}")
+        logger.debug("📝 Updating activity %s: %s", activity_id, data)
         
         # Update fields if provided
         if 'title' in data:
@@ -206,7 +235,7 @@ def update_activity(activity_id):
         
         db.session.commit()
         
-        print(f"✅ Activity updated successfully: {activity.to_dict()}")
+        logger.info("✅ Activity updated successfully: %s", activity)
         return jsonify({
             'message': 'Activity updated successfully!',
             'activity': activity.to_dict()
@@ -214,8 +243,7 @@ def update_activity(activity_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error updating activity: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error updating activity: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -229,21 +257,20 @@ def delete_activity(activity_id):
         activity = Activity.query.get(activity_id)
         
         if not activity:
-            print(f"❌ Activity {activity_id} not found")
+            logger.info("❌ Activity %s not found", activity_id)
             return jsonify({'error': 'Activity not found'}), 404
         
-        print(f"🗑️ Deleting activity {activity_id}: {activity.title}")
+        logger.info("🗑️ Deleting activity %s: %s", activity_id, activity.title)
         
         db.session.delete(activity)
         db.session.commit()
         
-        print("✅ Activity deleted successfully!")
+        logger.info("✅ Activity deleted successfully!")
         return jsonify({'message': 'Activity deleted successfully!'}), 200
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error deleting activity: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error deleting activity: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -318,8 +345,7 @@ def get_categories():
         return jsonify(formatted_categories), 200
         
     except Exception as e:
-        print(f"❌ Error getting categories: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error getting categories: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -330,7 +356,7 @@ def get_activity_stats(user_id):
     Get statistics about user's activities
     """
     try:
-        print(f"📊 Fetching activity stats for user {user_id}")
+        logger.debug("📊 Fetching activity stats for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
@@ -371,6 +397,5 @@ def get_activity_stats(user_id):
         }), 200
         
     except Exception as e:
-        print(f"❌ Error getting activity stats: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error getting activity stats: %s", e)
         return jsonify({'error': str(e)}), 500
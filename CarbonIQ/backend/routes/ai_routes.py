@@ -1,82 +1,49 @@
 from flask import Blueprint, jsonify, request
-from models import db, User, Emission, Activity
+from ai_context import build_ai_context, category_emissions
 from utils.ai_helper import AIEcoCoach, get_daily_tip, analyze_emission_trend
-from datetime import datetime, timedelta
-import traceback
+from insights import insight_response
+from utils.sse import sse_response
+from utils.trends import TrendAnalysis
+from datetime import datetime
+import logging
 
 ai_bp = Blueprint('ai_bp', __name__, url_prefix='/api/ai')
+logger = logging.getLogger(__name__)
 
 
 # GET PERSONALIZED INSIGHT
 @ai_bp.route('/insight/<int:user_id>', methods=['GET'])
 def get_personalized_insight(user_id):
     """
-    Get personalized AI insight based on user's emission data
+    Get the stored personalized AI insight for a user
+
+    Never waits on the LLM: returns the latest stored insight (status
+    'ready' or 'refreshing'), or 202 with status 'pending' and a curated
+    insight while the first one is generated in the background.
     """
     try:
-        print(f"🤖 Generating AI insight for user {user_id}")
+        logger.debug("🤖 Fetching AI insight for user %s", user_id)
         
-        # Check if user exists
-        user = User.query.get(user_id)
-        if not user:
-            print(f"❌ User {user_id} not found")
+        payload, status = insight_response(user_id, 'personalized')
+        if payload is None:
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
         
-        # Get recent emissions (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        emissions = Emission.query.filter(
-            Emission.user_id == user_id,
-            Emission.date >= thirty_days_ago
-        ).order_by(Emission.date.desc()).all()
-        
-        emissions_data = [
-            {
-                'amount': e.amount,
-                'emission_type': e.emission_type,
-                'source': e.source,
-                'date': e.date.isoformat()
-            }
-            for e in emissions
-        ]
-        
-        # Get recent activities
-        activities = Activity.query.filter(
-            Activity.user_id == user_id,
-            Activity.date >= thirty_days_ago
-        ).order_by(Activity.date.desc()).all()
-        
-        activities_data = [
-            {
-                'title': a.title,
-                'amount': a.amount,
-                'badge': a.badge,
-                'date': a.date.isoformat()
-            }
-            for a in activities
-        ]
-        
-        # Get user data
-        user_data = {
-            'username': user.name,  # User model has 'name' not 'username'
-            'email': user.email
-        }
-        
-        # Generate insight
-        insight = AIEcoCoach.get_personalized_insight(
-            user_data,
-            emissions_data,
-            activities_data
-        )
-        
-        print(f"✅ AI insight generated: {insight['source']}")
-        return jsonify(insight), 200
+        logger.debug("✅ AI insight %s: %s", payload['status'], payload['source'])
+        return jsonify(payload), status
         
     except Exception as e:
-        print(f"❌ Error generating insight: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error generating insight: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
+def _wants_stream():
+    """True when the client asked for the chat reply as server-sent events"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return request.accept_mimetypes.best_match(['application/json', 'text/event-stream']) == 'text/event-stream'
+
+
 # CHAT WITH AI COACH
 @ai_bp.route('/chat', methods=['POST'])
 def chat_with_coach():
@@ -85,10 +52,14 @@ def chat_with_coach():
     Body: {
         user_id, message, conversation_history (optional)
     }
+    
+    Send `Accept: text/event-stream` (or ?stream=true) to get the reply as
+    server-sent events: `token` events with each delta, then one `done`
+    event with the full response (fallback replies arrive as just `done`).
     """
     try:
         data = request.get_json()
-        print(f"💬 AI chat request: {data.get('message', '')[:50]}...")
+        logger.debug("💬 AI chat request: %s...", data.get('message', '')[:50])
         
         # Validate required fields
         if 'user_id' not in data or 'message' not in data:
@@ -98,31 +69,20 @@ def chat_with_coach():
         message = data['message']
         conversation_history = data.get('conversation_history', [])
         
-        # Check if user exists
-        user = User.query.get(user_id)
-        if not user:
+        # Recent footprint, aggregated in SQL
+        context = build_ai_context(user_id)
+        if context is None:
             return jsonify({'error': 'User not found'}), 404
         
-        # Get user context (recent emissions and activities)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        user_context = f"User: {context.user_name}\n{context.summary()}"
         
-        emissions = Emission.query.filter(
-            Emission.user_id == user_id,
-            Emission.date >= thirty_days_ago
-        ).all()
-        
-        activities = Activity.query.filter(
-            Activity.user_id == user_id,
-            Activity.date >= thirty_days_ago
-        ).all()
-        
-        # Prepare context
-        total_emissions = sum(e.amount for e in emissions)
-        activity_count = len(activities)
-        
-        user_context = f"""User: {user.name}
-Total emissions (last 30 days): {total_emissions:.2f} kg CO₂
-Activities logged: {activity_count}"""
+        if _wants_stream():
+            logger.debug("📡 Streaming AI response")
+            return sse_response(AIEcoCoach.stream_chat_with_coach(
+                message,
+                conversation_history,
+                user_context
+            ))
         
         # Get AI response
         response = AIEcoCoach.chat_with_coach(
@@ -131,12 +91,11 @@ Activities logged: {activity_count}"""
             user_context
         )
         
-        print(f"✅ AI response generated: {response['source']}")
+        logger.debug("✅ AI response generated: %s", response['source'])
         return jsonify(response), 200
         
     except Exception as e:
-        print(f"❌ Error in AI chat: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in AI chat: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -151,24 +110,18 @@ def get_reduction_tips():
         category = request.args.get('category', 'general')
         user_id = request.args.get('user_id', type=int)
         
-        print(f"💡 Getting reduction tips for category: {category}")
+        logger.debug("💡 Getting reduction tips for category: %s", category)
         
         current_emissions = 0
         
         # If user_id provided, get their current emissions in that category
         if user_id:
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            emissions = Emission.query.filter(
-                Emission.user_id == user_id,
-                Emission.emission_type == category,
-                Emission.date >= thirty_days_ago
-            ).all()
-            current_emissions = sum(e.amount for e in emissions)
+            current_emissions = round(category_emissions(user_id, category), 2)
         
         # Get tips
         tips = AIEcoCoach.get_reduction_tips(category, current_emissions)
         
-        print(f"✅ Generated {len(tips)} tips")
+        logger.debug("✅ Generated %s tips", len(tips))
         return jsonify({
             'category': category,
             'tips': tips,
@@ -176,8 +129,7 @@ def get_reduction_tips():
         }), 200
         
     except Exception as e:
-        print(f"❌ Error getting tips: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error getting tips: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -188,7 +140,7 @@ def get_daily_sustainability_tip():
     Get a random daily sustainability tip
     """
     try:
-        print("📅 Getting daily tip")
+        logger.debug("📅 Getting daily tip")
         tip = get_daily_tip()
         
         return jsonify({
@@ -197,8 +149,7 @@ def get_daily_sustainability_tip():
         }), 200
         
     except Exception as e:
-        print(f"❌ Error getting daily tip: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error getting daily tip: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -209,52 +160,19 @@ def analyze_trend(user_id):
     Analyze user's emission trend and provide insight
     """
     try:
-        print(f"📈 Analyzing emission trend for user {user_id}")
+        logger.debug("📈 Analyzing emission trend for user %s", user_id)
         
-        # Check if user exists
-        user = User.query.get(user_id)
-        if not user:
+        context = build_ai_context(user_id)
+        if context is None:
             return jsonify({'error': 'User not found'}), 404
         
-        # Get emissions history (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        emissions = Emission.query.filter(
-            Emission.user_id == user_id,
-            Emission.date >= thirty_days_ago
-        ).order_by(Emission.date.desc()).all()
-        
-        emissions_history = [
-            {
-                'amount': e.amount,
-                'date': e.date.isoformat()
-            }
-            for e in emissions
-        ]
-        
-        # Analyze trend
-        insight = analyze_emission_trend(emissions_history)
+        # Daily bins -> rolling means, week-over-week change, slope, anomalies
+        trend = TrendAnalysis.from_daily(context.daily)
+        insight = analyze_emission_trend(trend)
         
-        # Calculate weekly averages
-        recent_week = [e for e in emissions if e.date >= datetime.utcnow() - timedelta(days=7)]
-        previous_week = [e for e in emissions if datetime.utcnow() - timedelta(days=14) <= e.date < datetime.utcnow() - timedelta(days=7)]
-        
-        recent_avg = sum(e.amount for e in recent_week) / 7 if recent_week else 0
-        previous_avg = sum(e.amount for e in previous_week) / 7 if previous_week else 0
-        
-        change_percent = 0
-        if previous_avg > 0:
-            change_percent = ((recent_avg - previous_avg) / previous_avg) * 100
-        
-        print(f"✅ Trend analysis complete")
-        return jsonify({
-            'insight': insight,
-            'recent_week_avg': round(recent_avg, 2),
-            'previous_week_avg': round(previous_avg, 2),
-            'change_percent': round(change_percent, 2),
-            'trend': 'decreasing' if change_percent < -5 else 'increasing' if change_percent > 5 else 'stable'
-        }), 200
+        logger.debug("✅ Trend analysis complete")
+        return jsonify(dict(trend.to_dict(), insight=insight)), 200
         
     except Exception as e:
-        print(f"❌ Error analyzing trend: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error analyzing trend: %s", e)
         return jsonify({'error': str(e)}), 500
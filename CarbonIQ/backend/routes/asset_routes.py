@@ -1,34 +1,52 @@
 from flask import Blueprint, jsonify, request
 from models import db, Asset, User
-import traceback
+from rollups import current_asset_windows
+from utils.pagination import paginate, InvalidCursor
+from utils.etags import enable_conditional_get
+import logging
 
 asset_bp = Blueprint('asset_bp', __name__)
+logger = logging.getLogger(__name__)
+enable_conditional_get(asset_bp)
 
 # GET ALL ASSETS
 @asset_bp.route('/<int:user_id>', methods=['GET'])
 def get_assets(user_id):
     """
-    Get all assets for a user (for My Assets page)
-    Returns: [{ id, name, type, fuel_type, model, year, emoji, carbon_impact, status }, ...]
+    Get a user's active assets, newest first (for My Assets page)
+    Query: limit, cursor, total
+    Returns: { assets: [{ id, name, type, fuel_type, model, year, emoji, carbon_impact,
+                          carbon_impact_30d, carbon_impact_mtd, status }, ...],
+               pagination: { limit, next_cursor, has_more, total } }
     """
     try:
-        print(f"🔍 Querying assets for user {user_id}")
+        logger.debug("🔍 Querying assets for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
         
-        assets = Asset.query.filter_by(user_id=user_id, status='active').all()
-        print(f"📊 Found {len(assets)} assets")
+        query = Asset.query.filter_by(user_id=user_id, status='active')
+        page = paginate(query, Asset.created_at, Asset.id, default_limit=100, total_key=('assets', user_id))
+        logger.debug("📊 Found %s assets", len(page.items))
         
-        assets_data = [asset.to_dict() for asset in assets]
-        return jsonify(assets_data), 200
+        # 30-day/month-to-date windows stored on an earlier day are computed here, not saved
+        windows = current_asset_windows(page.items)
         
+        def serialize(asset):
+            data = asset.to_dict()
+            if asset.id in windows:
+                data['carbon_impact_30d'], data['carbon_impact_mtd'] = windows[asset.id]
+            return data
+        
+        return jsonify(page.to_dict('assets', serialize=serialize)), 200
+        
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"❌ Error getting assets: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error getting assets: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -38,24 +56,25 @@ def create_asset():
     """
     Create a new asset
     Body: { user_id, name, type, fuel_type, model, year, emoji }
+    carbon_impact is computed from the asset's emissions and can't be set here
     """
     try:
         data = request.get_json()
-        print(f"🆕 Creating new asset: {data}")
+        logger.debug("🆕 Creating new asset: %s", data)
         
         # Validate required fields
         required_fields = ['user_id', 'name', 'type']
         for field in required_fields:
             if field not in data:
                 error_msg = f"Missing required field: {field}"
-                print(f"❌ {error_msg}")
+                logger.info("❌ %s", error_msg)
                 return jsonify({'error': error_msg}), 400
         
         # Check if user exists
         user = User.query.get(data['user_id'])
         if not user:
             error_msg = f"User {data['user_id']} not found"
-            print(f"❌ {error_msg}")
+            logger.info("❌ %s", error_msg)
             return jsonify({'error': error_msg}), 404
         
         new_asset = Asset(
@@ -65,14 +84,13 @@ def create_asset():
             fuel_type=data.get('fuel_type', ''),
             model=data.get('model', ''),
             year=data.get('year', ''),
-            emoji=data.get('emoji', '📝'),
-            carbon_impact=data.get('carbon_impact', 0.0)
+            emoji=data.get('emoji', '📝')
         )
         
         db.session.add(new_asset)
         db.session.commit()
         
-        print(f"✅ Asset created successfully: {new_asset.to_dict()}")
+        logger.info("✅ Asset created successfully: %s", new_asset)
         return jsonify({
             'message': 'Asset created successfully!',
             'asset': new_asset.to_dict()
@@ -80,8 +98,7 @@ def create_asset():
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error creating asset: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error creating asset: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -96,11 +113,11 @@ def update_asset(asset_id):
         asset = Asset.query.get(asset_id)
         
         if not asset:
-            print(f"❌ Asset {asset_id} not found")
+            logger.info("❌ Asset %s not found", asset_id)
             return jsonify({'error': 'Asset not found'}), 404
         
         data = request.get_json()
-        print(f"📝 Updating asset {asset_id}: {data}")
+        logger.debug("📝 Updating asset %s: %s", asset_id, data)
         
         # Update fields if provided
         if 'name' in data:
@@ -115,12 +132,10 @@ def update_asset(asset_id):
             asset.year = data['year']
         if 'emoji' in data:
             asset.emoji = data['emoji']
-        if 'carbon_impact' in data:
-            asset.carbon_impact = data['carbon_impact']
         
         db.session.commit()
         
-        print(f"✅ Asset updated successfully: {asset.to_dict()}")
+        logger.info("✅ Asset updated successfully: %s", asset)
         return jsonify({
             'message': 'Asset updated successfully!',
             'asset': asset.to_dict()
@@ -128,8 +143,7 @@ def update_asset(asset_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error updating asset: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error updating asset: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -143,22 +157,21 @@ def delete_asset(asset_id):
         asset = Asset.query.get(asset_id)
         
         if not asset:
-            print(f"❌ Asset {asset_id} not found")
+            logger.info("❌ Asset %s not found", asset_id)
             return jsonify({'error': 'Asset not found'}), 404
         
-        print(f"🗑️ Deleting asset {asset_id}: {asset.name}")
+        logger.info("🗑️ Deleting asset %s: %s", asset_id, asset.name)
         
         # Soft delete
         asset.status = 'deleted'
         db.session.commit()
         
-        print("✅ Asset deleted successfully!")
+        logger.info("✅ Asset deleted successfully!")
         return jsonify({'message': 'Asset deleted successfully!'}), 200
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error deleting asset: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error deleting asset: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -169,18 +182,17 @@ def get_single_asset(asset_id):
     Get details of a single asset
     """
     try:
-        print(f"🔍 Querying single asset {asset_id}")
+        logger.debug("🔍 Querying single asset %s", asset_id)
         
         asset = Asset.query.get(asset_id)
         
         if not asset:
-            print(f"❌ Asset {asset_id} not found")
+            logger.info("❌ Asset %s not found", asset_id)
             return jsonify({'error': 'Asset not found'}), 404
         
-        print(f"✅ Found asset: {asset.to_dict()}")
+        logger.debug("✅ Found asset: %s", asset)
         return jsonify(asset.to_dict()), 200
         
     except Exception as e:
-        print(f"❌ Error getting single asset: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error getting single asset: %s", e)
         return jsonify({'error': str(e)}), 500
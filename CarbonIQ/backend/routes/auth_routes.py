@@ -3,12 +3,14 @@ from werkzeug.security import check_password_hash, generate_password_hash
 import jwt
 import datetime
 import os
+import logging
 from functools import wraps
 
 # Import database and User model
 from models import db, User
 
 auth_bp = Blueprint('auth', __name__)
+logger = logging.getLogger(__name__)
 
 # Get SECRET_KEY from environment variable
 SECRET_KEY = os.getenv('SECRET_KEY', 'fallback-secret-key')
@@ -49,7 +51,7 @@ def login():
         }), 200
         
     except Exception as e:
-        print(f"Login error: {str(e)}")
+        logger.exception("Login error: %s", e)
         return jsonify({'error': 'An error occurred during login'}), 500
 
 
@@ -95,7 +97,7 @@ def signup():
         
     except Exception as e:
         db.session.rollback()
-        print(f"Signup error: {str(e)}")
+        logger.exception("Signup error: %s", e)
         return jsonify({'error': 'An error occurred during signup'}), 500
 
 
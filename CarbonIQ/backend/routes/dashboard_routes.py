@@ -1,83 +1,81 @@
 from flask import Blueprint, jsonify, request
-from sqlalchemy import func, extract
-from models import db, Emission, Asset, Activity, MonthlySummary, User, Goal
+from sqlalchemy import func, case, select, literal, union_all
+from models import db, Emission, Asset, Activity, MonthlySummary, DailySummary, User, Goal
+from utils.periods import month_window, previous_month, in_window
+from utils.cache import cached_per_user
+from utils.etags import enable_conditional_get, skip_etag
+from utils.trends import TrendAnalysis, bin_daily
+from utils.pagination import (
+    Page, clamp_limit, encode_feed_cursor, decode_feed_cursor, feed_keyset_filter, InvalidCursor
+)
 from datetime import datetime, timedelta
-import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Try to import OpenAI client
-try:
-    from openai import OpenAI
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    openai_available = True
-except ImportError:
-    openai_available = False
-    print("⚠️ OpenAI library not available")
+from insights import insight_response, DASHBOARD_FALLBACK
 
 dashboard_bp = Blueprint("dashboard_bp", __name__, url_prefix="/api/dashboard")
+enable_conditional_get(dashboard_bp)
+
+# Longest window the emissions trend chart may request
+MAX_TREND_DAYS = 365
 
 
 # --- 1. Dashboard Stats ---
 @dashboard_bp.route("/stats/<int:user_id>", methods=["GET"])
+@cached_per_user("dashboard_stats")
 def get_dashboard_stats(user_id):
-    total_emissions = (
-        db.session.query(func.sum(Emission.amount))
-        .filter_by(user_id=user_id)
-        .scalar()
-        or 0
-    )
+    now = datetime.utcnow()
+    this_month = month_window(now.year, now.month)
+    last_month = month_window(*previous_month(now.year, now.month))
 
-    asset_count = db.session.query(Asset).filter_by(user_id=user_id).count()
+    def month_sum(window):
+        return func.coalesce(
+            func.sum(case((in_window(Emission.date, window), Emission.amount), else_=0)), 0
+        )
 
-    recent_activities = (
-        db.session.query(Emission)
-        .filter_by(user_id=user_id)
+    # One round trip for every number on the card: conditional sums over the
+    # user's emissions plus scalar subqueries for the asset and goal counts
+    totals = db.session.execute(
+        select(
+            func.coalesce(func.sum(Emission.amount), 0).label("total"),
+            month_sum(this_month).label("this_month"),
+            month_sum(last_month).label("last_month"),
+            select(func.count(Asset.id))
+            .where(Asset.user_id == user_id)
+            .scalar_subquery()
+            .label("asset_count"),
+            select(func.count(Goal.id))
+            .where(Goal.user_id == user_id, Goal.status == 'active')
+            .scalar_subquery()
+            .label("active_goals"),
+        ).where(Emission.user_id == user_id)
+    ).one()
+
+    recent_activities = db.session.execute(
+        select(
+            Emission.id,
+            Emission.amount,
+            Emission.date,
+            Emission.source,
+            Emission.emission_type,
+            Emission.unit,
+        )
+        .where(Emission.user_id == user_id)
         .order_by(Emission.date.desc())
         .limit(5)
-        .all()
-    )
+    ).all()
+
+    current_month_emissions = totals.this_month
+    last_month_emissions = totals.last_month
 
-    # Get user's active goals
-    active_goals = Goal.query.filter_by(user_id=user_id, status='active').count()
-    
-    # Calculate monthly change
-    current_month = datetime.utcnow().month
-    current_year = datetime.utcnow().year
-    
-    # Get current month's emissions
-    current_month_emissions = db.session.query(func.sum(Emission.amount))\
-        .filter(
-            Emission.user_id == user_id,
-            extract('month', Emission.date) == current_month,
-            extract('year', Emission.date) == current_year
-        )\
-        .scalar() or 0
-    
-    # Get previous month's emissions
-    last_month = current_month - 1 if current_month > 1 else 12
-    last_month_year = current_year if current_month > 1 else current_year - 1
-    
-    last_month_emissions = db.session.query(func.sum(Emission.amount))\
-        .filter(
-            Emission.user_id == user_id,
-            extract('month', Emission.date) == last_month,
-            extract('year', Emission.date) == last_month_year
-        )\
-        .scalar() or 0
-    
     # Calculate percentage change
     monthly_change = 0
     if last_month_emissions > 0:
         monthly_change = ((current_month_emissions - last_month_emissions) / last_month_emissions) * 100
     
     return jsonify({
-        "totalEmission": round(total_emissions, 2),
+        "totalEmission": round(totals.total, 2),
         "thisMonth": round(current_month_emissions, 2),
-        "activitiesLogged": asset_count,  # Number of assets as activities logged
-        "activeGoals": active_goals,
+        "activitiesLogged": totals.asset_count,  # Number of assets as activities logged
+        "activeGoals": totals.active_goals,
         "monthly_change": round(monthly_change, 2),
         "recent_activities": [
             {
@@ -95,38 +93,45 @@ def get_dashboard_stats(user_id):
 
 # --- 2. Emissions Trend ---
 @dashboard_bp.route("/emissions-trend/<int:user_id>", methods=["GET"])
+@cached_per_user("emissions_trend")
 def get_emissions_trend(user_id):
-    days = int(request.args.get("days", 30))
-    start_date = datetime.utcnow() - timedelta(days=days)
+    # Read the pre-aggregated per-day rows; cap the window so one request can't scan years
+    days = min(max(int(request.args.get("days", 30)), 1), MAX_TREND_DAYS)
+    start_day = (datetime.utcnow() - timedelta(days=days)).date()
 
     trend_data = (
-        db.session.query(
-            func.date(Emission.date).label("date"),
-            func.sum(Emission.amount).label("total")
-        )
-        .filter(Emission.user_id == user_id, Emission.date >= start_date)
-        .group_by(func.date(Emission.date))
-        .order_by(func.date(Emission.date))  # ✅ ensure sorted ascending by date
+        db.session.query(DailySummary.day, DailySummary.total_emissions)
+        .filter(DailySummary.user_id == user_id, DailySummary.day >= start_day)
+        .order_by(DailySummary.day)  # ✅ ensure sorted ascending by date
         .all()
     )
 
-    return jsonify([
-        {"date": str(row.date), "value": round(row.total, 2)} for row in trend_data
-    ]), 200
+    # Bin once into a dense daily array for the 7-day mean and anomaly flags
+    # (stretched to cover any future-dated rows)
+    span = max(days + 1, (trend_data[-1].day - start_day).days + 1) if trend_data else days + 1
+    trend = TrendAnalysis(bin_daily(trend_data, start_day, span), start_day)
+
+    points = []
+    for row in trend_data:
+        index = (row.day - start_day).days
+        points.append({
+            "date": str(row.day),
+            "value": round(row.total_emissions, 2),
+            "rolling_avg": round(float(trend.rolling[index]), 2),
+            "anomaly": bool(trend.anomalies[index]),
+        })
+    return jsonify(points), 200
 
 
 # --- 3. Top Emitters ---
 @dashboard_bp.route("/top-emitters/<int:user_id>", methods=["GET"])
+@cached_per_user("top_emitters")
 def get_top_emitters(user_id):
+    # carbon_impact is maintained from the asset's emissions, so this is an index scan
     results = (
-        db.session.query(
-            Asset.name,
-            func.sum(Emission.amount).label("total")
-        )
-        .join(Emission, Asset.id == Emission.asset_id)
-        .filter(Emission.user_id == user_id)
-        .group_by(Asset.name)
-        .order_by(func.sum(Emission.amount).desc())
+        db.session.query(Asset.name, Asset.carbon_impact)
+        .filter(Asset.user_id == user_id, Asset.carbon_impact > 0)
+        .order_by(Asset.carbon_impact.desc())
         .limit(5)
         .all()
     )
@@ -147,170 +152,101 @@ def get_top_emitters(user_id):
 
 
 # --- 4. Recent Activities ---
-@dashboard_bp.route("/recent-activities/<int:user_id>", methods=["GET"])
-def get_recent_activities(user_id):
-    limit = int(request.args.get("limit", 10))
-    
-    # Get emissions and activities
-    emissions = (
-        db.session.query(Emission)
-        .filter_by(user_id=user_id)
-        .order_by(Emission.date.desc())
-        .limit(limit)
-        .all()
-    )
-    
-    # Get manual activities
-    activities = (
-        db.session.query(Activity)
-        .filter_by(user_id=user_id)
-        .order_by(Activity.date.desc())
-        .limit(limit)
-        .all()
+def _feed_branch(kind, model, columns, user_id, cursor, limit):
+    """One side of the recent-activities feed: newest `limit` rows of a table after the cursor"""
+    query = (
+        select(literal(kind).label("kind"), model.id, model.date, model.amount, model.unit, *columns)
+        .where(model.user_id == user_id, model.date.isnot(None))
     )
-    
-    # Combine and sort by date
-    all_activities = []
-    
-    for e in emissions:
-        # Skip if no date
-        if not e.date:
-            continue
-            
-        all_activities.append({
-            "type": "emission",
-            "id": e.id,
-            "title": f"{e.source} - {e.emission_type}",
-            "amount": round(e.amount, 2),
-            "date": e.date.strftime('%b %d, %Y'),
-            "timestamp": e.date.isoformat(),
-            "asset_id": e.asset_id,
-            "source": e.source,
-            "emission_type": e.emission_type,
-            "unit": e.unit,
-            "badge": e.emission_type or "emission",
+    if cursor:
+        query = query.where(feed_keyset_filter(model.date, model.id, kind, cursor))
+    # Limit each branch first so the index does the work before the merge
+    return select(query.order_by(model.date.desc(), model.id.desc()).limit(limit).subquery())
+
+
+def _serialize_feed_row(row):
+    base = {
+        "type": row.kind,
+        "id": row.id,
+        "amount": round(row.amount, 2),
+        "date": row.date.strftime('%b %d, %Y'),
+        "timestamp": row.date.isoformat(),
+        "unit": row.unit,
+    }
+    if row.kind == "emission":
+        base.update({
+            "title": f"{row.source} - {row.emission_type}",
+            "asset_id": row.asset_id,
+            "source": row.source,
+            "emission_type": row.emission_type,
+            "badge": row.emission_type or "emission",
             "location": "N/A",
             "icon": "🌍",
             "iconBg": "bg-green-500"
         })
-    
-    for a in activities:
-        # Skip if no date
-        if not a.date:
-            continue
-            
-        all_activities.append({
-            "type": "activity",
-            "id": a.id,
-            "title": a.title,
-            "location": a.location or "N/A",
-            "amount": round(a.amount, 2),
-            "date": a.date.strftime('%b %d, %Y'),
-            "timestamp": a.date.isoformat(),
-            "unit": a.unit,
-            "badge": a.badge or "activity",
-            "icon": a.icon or "✅",
+    else:
+        base.update({
+            "title": row.title,
+            "location": row.location or "N/A",
+            "badge": row.badge or "activity",
+            "icon": row.icon or "✅",
             "iconBg": "bg-blue-500"
         })
-    
-    # Sort all activities by timestamp
-    all_activities.sort(key=lambda x: x["timestamp"], reverse=True)
-    
-    # Return only the requested number of items
-    return jsonify(all_activities[:limit]), 200
+    return base
+
+
+@dashboard_bp.route("/recent-activities/<int:user_id>", methods=["GET"])
+@cached_per_user("recent_activities")
+def get_recent_activities(user_id):
+    # Emissions and manual activities merged newest first in one UNION ALL;
+    # ?cursor=<pagination.next_cursor> loads the next page
+    limit = clamp_limit(request.args.get("limit", type=int), default=10, maximum=50)
+    try:
+        cursor = decode_feed_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
+    null = literal(None)
+    emissions = _feed_branch("emission", Emission, [
+        Emission.source, Emission.emission_type, Emission.asset_id,
+        null.label("title"), null.label("location"), null.label("badge"), null.label("icon"),
+    ], user_id, cursor, limit + 1)
+    activities = _feed_branch("activity", Activity, [
+        null.label("source"), null.label("emission_type"), null.label("asset_id"),
+        Activity.title, Activity.location, Activity.badge, Activity.icon,
+    ], user_id, cursor, limit + 1)
+
+    feed = union_all(emissions, activities).subquery()
+    rows = db.session.execute(
+        select(feed)
+        .order_by(feed.c.date.desc(), feed.c.kind.desc(), feed.c.id.desc())
+        .limit(limit + 1)
+    ).all()
+
+    page = Page(rows[:limit], limit)
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        page.next_cursor = encode_feed_cursor(last.date, last.kind, last.id)
+
+    return jsonify(page.to_dict("activities", serialize=_serialize_feed_row)), 200
 
 
 # --- 5. AI Insights ---
 @dashboard_bp.route("/insights/<int:user_id>", methods=["GET"])
 def get_ai_insights(user_id):
     try:
-        # Get user data for context
-        user = User.query.get_or_404(user_id)
-        
-        # Get recent emissions data
-        recent_emissions = (
-            db.session.query(Emission)
-            .filter_by(user_id=user_id)
-            .order_by(Emission.date.desc())
-            .limit(20)
-            .all()
-        )
-        
-        # Get top assets by emissions
-        top_assets = (
-            db.session.query(
-                Asset.name,
-                func.sum(Emission.amount).label("total_emissions")
-            )
-            .join(Emission, Asset.id == Emission.asset_id)
-            .filter(Emission.user_id == user_id)
-            .group_by(Asset.name)
-            .order_by(func.sum(Emission.amount).desc())
-            .limit(3)
-            .all()
-        )
-        
-        # Format data for AI
-        emissions_data = [
-            f"{e.source}: {e.amount} {e.unit} on {e.date.strftime('%Y-%m-%d')}"
-            for e in recent_emissions[:5]  # Only send last 5 for context
-        ]
-        
-        top_assets_data = [
-            f"{name}: {round(emissions, 2)} kg CO₂"
-            for name, emissions in top_assets
-        ]
-        
-        # Create prompt for AI
-        prompt = f"""
-        You are an AI sustainability coach. Provide a brief, friendly, and actionable 
-        insight based on the user's carbon emissions data. Focus on one key observation 
-        and one specific, practical suggestion for reducing their carbon footprint.
-        
-        User: {user.name}
-        
-        Recent emissions:
-        {emissions}
-        
-        Top emission sources:
-        {sources}
-        
-        Keep the response under 2 sentences. Be encouraging and specific.
-        Example: "I see your daily commute is your biggest source of emissions. 
-        Could you try working from home one day this week to reduce your impact?"
-        """.format(
-            emissions="\n".join(emissions_data) or "No recent emissions data",
-            sources="\n".join(top_assets_data) or "No emission sources identified"
-        )
-        
-        # Get AI response
-        if openai_available and client:
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful AI sustainability coach."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=100,
-                    temperature=0.7
-                )
-                
-                insight = response.choices[0].message.content.strip()
-            except Exception as ai_error:
-                print(f"⚠️ OpenAI API error: {ai_error}")
-                insight = "Every small action counts! Track your emissions to see how you can make a difference."
-        else:
-            insight = "Every small action counts! Track your emissions to see how you can make a difference."
-        
-        return jsonify({
-            "insight": insight,
-            "timestamp": datetime.utcnow().isoformat()
-        }), 200
+        # Served from the stored insight; generation happens in the background
+        payload, status = insight_response(user_id, "dashboard")
+        if payload is None:
+            return jsonify({"error": "User not found"}), 404
+        if payload["status"] != "ready":
+            # Becomes ready without a data write, so don't let clients revalidate it
+            skip_etag()
+        return jsonify(payload), status
         
     except Exception as e:
         # Fallback in case of API failure
         return jsonify({
-            "insight": "Every small action counts! Track your emissions to see how you can make a difference.",
+            "insight": DASHBOARD_FALLBACK,
             "error": str(e)
         }), 200
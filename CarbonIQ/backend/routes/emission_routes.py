@@ -0,0 +1,152 @@
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from models import db, User, Emission
+from utils.pagination import paginate, InvalidCursor
+from exports import FORMATS, WRITERS, ExportFilterError, parse_bound, export_query
+from ingest import BulkPayloadError, import_records, iter_file_records, detect_format, open_text
+import logging
+
+emission_bp = Blueprint('emission_bp', __name__, url_prefix='/api/emissions')
+logger = logging.getLogger(__name__)
+
+
+def _export_format():
+    """?format=csv|ndjson, else NDJSON when the client only accepts it, else CSV"""
+    requested = request.args.get('format')
+    if requested:
+        if requested not in FORMATS:
+            raise ExportFilterError(f"Unsupported format: {requested} (use csv or ndjson)")
+        return requested
+    best = request.accept_mimetypes.best_match(list(FORMATS.values()))
+    return 'ndjson' if best == FORMATS['ndjson'] else 'csv'
+
+
+# GET USER EMISSIONS
+@emission_bp.route('/user/<int:user_id>', methods=['GET'])
+def get_user_emissions(user_id):
+    """
+    Get a user's emission history, newest first
+    Query: limit, cursor, total
+    Returns: { emissions: [...], pagination: { limit, next_cursor, has_more, total } }
+    """
+    try:
+        logger.debug("🔍 Querying emissions for user %s", user_id)
+
+        # Check if user exists
+        if db.session.get(User, user_id) is None:
+            logger.info("❌ User %s not found", user_id)
+            return jsonify({'error': 'User not found'}), 404
+
+        # Keyset paginate on (date, id), newest first
+        page = paginate(
+            Emission.query.filter_by(user_id=user_id), Emission.date, Emission.id, total_key=('emissions', user_id)
+        )
+
+        logger.debug("📊 Showing %s emissions (more: %s)", len(page.items), page.has_more)
+
+        return jsonify(page.to_dict('emissions')), 200
+
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.exception("❌ Error getting user emissions: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+# EXPORT EMISSION HISTORY
+@emission_bp.route('/export/<int:user_id>', methods=['GET'])
+def export_emissions(user_id):
+    """
+    Stream a user's full emission history, oldest first
+    Query: format (csv | ndjson), start, end (ISO dates, end inclusive), type (repeatable or comma-separated)
+    Returns: CSV with a header row, or one JSON object per line, with columns
+             id, date, emission_type, activity, source, asset_id, original_value,
+             unit, amount, emission_factor, calculation_method
+    """
+    try:
+        logger.debug("📤 Exporting emissions for user %s", user_id)
+
+        # Check if user exists
+        if db.session.get(User, user_id) is None:
+            logger.info("❌ User %s not found", user_id)
+            return jsonify({'error': 'User not found'}), 404
+
+        export_format = _export_format()
+        start = parse_bound(request.args.get('start'))
+        end = parse_bound(request.args.get('end'), end=True)
+        types = [t for value in request.args.getlist('type') for t in value.split(',') if t]
+
+        query = export_query(user_id, start=start, end=end, types=types)
+
+        # Rows are fetched while the response is written, so keep the request context alive
+        response = Response(stream_with_context(WRITERS[export_format](query)), mimetype=FORMATS[export_format])
+        response.headers['Content-Disposition'] = f'attachment; filename="emissions_{user_id}.{export_format}"'
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    except ExportFilterError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.exception("❌ Error exporting emissions: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+# IMPORT EMISSION HISTORY
+@emission_bp.route('/import', methods=['POST'])
+def import_emissions():
+    """
+    Import historical emissions from a CSV or NDJSON file, read chunk by chunk
+    Body: multipart `file`, or the raw file with Content-Type text/csv / application/x-ndjson
+    Query: user_id (owner for rows without one), format (csv | ndjson), skip (rows already imported)
+    Columns: category, activity_type (or type), value (or quantity), date, title, unit,
+             asset_id, emission_factor, source, user_id; a file from /export/<user_id>
+             imports as is (rows without a type keep their amount)
+    Returns: { processed, inserted, failed, errors: [{ index, error }], truncated_errors }
+             A failure part way through returns 500 with the same counts for the
+             chunks already committed, plus `error` and `skip`: re-send the file
+             with ?skip=<skip> to resume after them.
+    """
+    # Latest per-chunk report, kept so a failure can say how far the import got
+    progress = {}
+    try:
+        user_id = request.args.get('user_id', type=int)
+        skip = request.args.get('skip', 0, type=int)
+
+        if user_id is not None and db.session.get(User, user_id) is None:
+            logger.info("❌ User %s not found", user_id)
+            return jsonify({'error': 'User not found'}), 404
+
+        upload = request.files.get('file')
+        if upload is not None:
+            stream = upload.stream
+            file_format = request.args.get('format') or detect_format(upload.filename, upload.mimetype)
+        else:
+            stream = request.stream
+            file_format = request.args.get('format') or detect_format(mimetype=request.mimetype)
+
+        # Decode lazily: the upload is never read into memory as a whole
+        lines = open_text(stream)
+
+        def report_progress(report):
+            progress['report'] = report
+            logger.debug("📥 Imported %s rows (%s inserted, %s failed)", report['processed'], report['inserted'], report['failed'])
+
+        report = import_records(
+            iter_file_records(lines, file_format), user_id=user_id, skip=skip, progress=report_progress
+        )
+
+        logger.info("✅ Import finished: %s of %s rows inserted", report['inserted'], report['processed'])
+
+        if report['inserted'] == 0 and report['processed'] > skip:
+            return jsonify(report), 400
+        return jsonify(report), 201 if report['failed'] == 0 else 207
+
+    except BulkPayloadError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("❌ Error importing emissions: %s", e)
+        report = progress.get('report')
+        if report is None:
+            return jsonify({'error': str(e)}), 500
+        # Chunks before the failure are committed; the client resumes after them
+        return jsonify(dict(report, error=str(e), skip=report['processed'])), 500
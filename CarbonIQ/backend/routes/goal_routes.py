@@ -1,40 +1,46 @@
 from flask import Blueprint, jsonify, request
-from models import db, User, Goal, Emission
+from models import db, User, Goal, DailySummary
+from utils.pagination import paginate, InvalidCursor
+from utils.etags import enable_conditional_get
 from datetime import datetime, timedelta
-import traceback
+from bisect import bisect_left
+import logging
 
 goal_bp = Blueprint('goal_bp', __name__, url_prefix='/api/goals')
+logger = logging.getLogger(__name__)
+enable_conditional_get(goal_bp)
 
 
 # GET ALL GOALS FOR A USER
 @goal_bp.route('/<int:user_id>', methods=['GET'])
 def get_user_goals(user_id):
     """
-    Get all goals for a specific user with progress tracking
+    Get a user's goals with progress tracking, newest start date first
+    Query: limit, cursor, total
+    Returns: { goals: [...], pagination: { limit, next_cursor, has_more, total } }
     """
     try:
-        print(f"🎯 Fetching goals for user {user_id}")
+        logger.debug("🎯 Fetching goals for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Get all goals
-        goals = Goal.query.filter_by(user_id=user_id).order_by(Goal.start_date.desc()).all()
+        # Get one page of goals
+        query = Goal.query.filter_by(user_id=user_id)
+        page = paginate(query, Goal.start_date, Goal.id, default_limit=100, total_key=('goals', user_id))
         
-        # Calculate progress for each goal
-        goals_with_progress = []
-        for goal in goals:
-            progress_data = calculate_goal_progress(goal, user_id)
-            goals_with_progress.append(progress_data)
+        # Calculate progress for every goal on the page from one emission series
+        page.items = calculate_goals_progress(page.items, user_id)
         
-        print(f"✅ Found {len(goals_with_progress)} goals")
-        return jsonify(goals_with_progress), 200
+        logger.debug("✅ Found %s goals", len(page.items))
+        return jsonify(page.to_dict('goals', serialize=lambda progress: progress)), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"❌ Error fetching goals: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error fetching goals: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -45,7 +51,7 @@ def get_goal_detail(goal_id):
     Get detailed information about a specific goal
     """
     try:
-        print(f"🎯 Fetching goal {goal_id}")
+        logger.debug("🎯 Fetching goal %s", goal_id)
         
         goal = Goal.query.get(goal_id)
         if not goal:
@@ -54,12 +60,11 @@ def get_goal_detail(goal_id):
         # Get progress data
         progress_data = calculate_goal_progress(goal, goal.user_id)
         
-        print(f"✅ Goal details loaded")
+        logger.debug("✅ Goal details loaded")
         return jsonify(progress_data), 200
         
     except Exception as e:
-        print(f"❌ Error fetching goal: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error fetching goal: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -74,7 +79,7 @@ def create_goal():
     """
     try:
         data = request.get_json()
-        print(f"🎯 Creating new goal: {data.get('title', '')}")
+        logger.info("🎯 Creating new goal: %s", data.get('title', ''))
         
         # Validate required fields
         required_fields = ['user_id', 'title', 'target_reduction_percentage']
@@ -112,13 +117,12 @@ def create_goal():
         # Return goal with progress
         progress_data = calculate_goal_progress(new_goal, user_id)
         
-        print(f"✅ Goal created: {new_goal.id}")
+        logger.info("✅ Goal created: %s", new_goal.id)
         return jsonify(progress_data), 201
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error creating goal: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error creating goal: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -134,7 +138,7 @@ def update_goal(goal_id):
     """
     try:
         data = request.get_json()
-        print(f"🎯 Updating goal {goal_id}")
+        logger.debug("🎯 Updating goal %s", goal_id)
         
         goal = Goal.query.get(goal_id)
         if not goal:
@@ -164,13 +168,12 @@ def update_goal(goal_id):
         # Return updated goal with progress
         progress_data = calculate_goal_progress(goal, goal.user_id)
         
-        print(f"✅ Goal updated")
+        logger.info("✅ Goal updated")
         return jsonify(progress_data), 200
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error updating goal: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error updating goal: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -181,7 +184,7 @@ def delete_goal(goal_id):
     Delete a goal
     """
     try:
-        print(f"🎯 Deleting goal {goal_id}")
+        logger.info("🎯 Deleting goal %s", goal_id)
         
         goal = Goal.query.get(goal_id)
         if not goal:
@@ -190,13 +193,12 @@ def delete_goal(goal_id):
         db.session.delete(goal)
         db.session.commit()
         
-        print(f"✅ Goal deleted")
+        logger.info("✅ Goal deleted")
         return jsonify({'message': 'Goal deleted successfully'}), 200
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error deleting goal: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error deleting goal: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -207,7 +209,7 @@ def get_goal_stats(user_id):
     Get overall goal statistics for a user
     """
     try:
-        print(f"📊 Fetching goal stats for user {user_id}")
+        logger.debug("📊 Fetching goal stats for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
@@ -219,12 +221,12 @@ def get_goal_stats(user_id):
         active_goals = [g for g in all_goals if g.status == 'active']
         completed_goals = [g for g in all_goals if g.status == 'completed']
         
-        # Calculate average progress for active goals
+        # Calculate average progress for active goals (computed once per goal)
+        active_progress = calculate_goals_progress(active_goals, user_id)
         total_progress = 0
         goals_with_progress = 0
         
-        for goal in active_goals:
-            progress_data = calculate_goal_progress(goal, user_id)
+        for progress_data in active_progress:
             if progress_data['current_progress'] is not None:
                 total_progress += progress_data['current_progress']
                 goals_with_progress += 1
@@ -236,43 +238,79 @@ def get_goal_stats(user_id):
             'active_goals': len(active_goals),
             'completed_goals': len(completed_goals),
             'average_progress': round(avg_progress, 1),
-            'on_track': sum(1 for g in active_goals if calculate_goal_progress(g, user_id)['on_track'])
+            'on_track': sum(1 for p in active_progress if p['on_track'])
         }
         
-        print(f"✅ Goal stats calculated")
+        logger.debug("✅ Goal stats calculated")
         return jsonify(stats), 200
         
     except Exception as e:
-        print(f"❌ Error fetching goal stats: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error fetching goal stats: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
-# HELPER FUNCTION: Calculate goal progress
-def calculate_goal_progress(goal, user_id):
+# HELPER FUNCTIONS: Calculate goal progress
+class EmissionSeries:
+    """
+    Ordered per-day emission totals for one user with prefix sums,
+    so the total over any day range is two bisects and a subtraction
+    """
+
+    def __init__(self, user_id, since):
+        rows = db.session.query(DailySummary.day, DailySummary.total_emissions).filter(
+            DailySummary.user_id == user_id,
+            DailySummary.day >= since
+        ).order_by(DailySummary.day).all()
+
+        self.days = [row.day for row in rows]
+        self.prefix = [0.0]
+        for row in rows:
+            self.prefix.append(self.prefix[-1] + (row.total_emissions or 0))
+
+    def total(self, start, end=None):
+        """Sum of emissions for days in [start, end); open-ended when end is None"""
+        lo = bisect_left(self.days, start)
+        hi = len(self.days) if end is None else bisect_left(self.days, end)
+        return self.prefix[hi] - self.prefix[lo] if hi > lo else 0
+
+
+def calculate_goals_progress(goals, user_id):
+    """
+    Calculate progress for several goals of one user
+
+    Loads a single per-day series covering the earliest baseline window
+    through today and derives every goal's totals from it in memory.
+    """
+    goals = list(goals)
+    if not goals:
+        return []
+
+    start_days = [(goal.start_date or datetime.utcnow()).date() for goal in goals]
+    series = EmissionSeries(user_id, min(start_days) - timedelta(days=30))
+
+    return [
+        calculate_goal_progress(goal, user_id, series)
+        for goal in goals
+    ]
+
+
+def calculate_goal_progress(goal, user_id, series=None):
     """
     Calculate progress for a goal based on emission data
     """
     try:
-        # Get baseline emissions (before goal start date)
-        baseline_emissions = db.session.query(db.func.sum(Emission.amount)).filter(
-            Emission.user_id == user_id,
-            Emission.date < goal.start_date
-        ).scalar() or 0
+        # Baseline is the 30 whole days before the goal's start day;
+        # current emissions are everything from the start day onwards
+        start_day = goal.start_date.date()
+        baseline_start = start_day - timedelta(days=30)
+        if series is None:
+            series = EmissionSeries(user_id, baseline_start)
         
         # Get time period for baseline (30 days before goal start)
-        baseline_start = goal.start_date - timedelta(days=30)
-        baseline_period_emissions = db.session.query(db.func.sum(Emission.amount)).filter(
-            Emission.user_id == user_id,
-            Emission.date >= baseline_start,
-            Emission.date < goal.start_date
-        ).scalar() or 0
+        baseline_period_emissions = series.total(baseline_start, start_day)
         
         # Get current emissions (since goal start)
-        current_emissions = db.session.query(db.func.sum(Emission.amount)).filter(
-            Emission.user_id == user_id,
-            Emission.date >= goal.start_date
-        ).scalar() or 0
+        current_emissions = series.total(start_day)
         
         # Calculate days since goal started
         days_since_start = (datetime.utcnow() - goal.start_date).days
@@ -326,7 +364,7 @@ def calculate_goal_progress(goal, user_id):
         }
         
     except Exception as e:
-        print(f"⚠️ Error calculating progress for goal {goal.id}: {str(e)}")
+        logger.warning("⚠️ Error calculating progress for goal %s: %s", goal.id, e)
         return {
             'id': goal.id,
             'title': goal.title,
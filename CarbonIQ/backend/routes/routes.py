@@ -1,18 +1,22 @@
 from flask import Blueprint, jsonify, request
 from models import db, User, Asset, Emission, Activity, Goal, MonthlySummary
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import func
+from sqlalchemy import func, and_, or_
 from datetime import datetime, timedelta
-import traceback
+from rollups import get_monthly_summaries
+from utils.periods import month_window, previous_month, in_window
+import logging
 import random
 
+logger = logging.getLogger(__name__)
+
 # Try to import EmissionService, but handle if it doesn't exist
 try:
     from emissionservice import EmissionService
     emission_service_available = True
-    print("✅ EmissionService imported successfully")
+    logger.debug("✅ EmissionService imported successfully")
 except ImportError as e:
-    print(f"⚠️ EmissionService not available: {e}")
+    logger.warning("⚠️ EmissionService not available: %s", e)
     emission_service_available = False
 
 api = Blueprint('api', __name__, url_prefix='/api')
@@ -22,19 +26,19 @@ api = Blueprint('api', __name__, url_prefix='/api')
 def test_db():
     """Test database connectivity and basic queries"""
     try:
-        print("🧪 Testing database connectivity...")
+        logger.debug("🧪 Testing database connectivity...")
         
         # Test users
         users_count = User.query.count()
-        print(f"👥 Users in DB: {users_count}")
+        logger.debug("👥 Users in DB: %s", users_count)
         
         # Test emissions
         emissions_count = Emission.query.count()
-        print(f"🌫️ Emissions in DB: {emissions_count}")
+        logger.debug("🌫️ Emissions in DB: %s", emissions_count)
         
         # Test activities
         activities_count = Activity.query.count()
-        print(f"📊 Activities in DB: {activities_count}")
+        logger.debug("📊 Activities in DB: %s", activities_count)
         
         # Test specific user
         user_1 = User.query.get(1)
@@ -54,8 +58,7 @@ def test_db():
         }), 200
         
     except Exception as e:
-        print(f"❌ Database test failed: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Database test failed: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # GET DASHBOARD STATS (Top 4 cards) - ENHANCED VERSION
@@ -65,17 +68,17 @@ def get_dashboard_stats(user_id):
     Get statistics for the 4 cards at the top of dashboard
     """
     try:
-        print(f"📊 Fetching dashboard stats for user {user_id}")
+        logger.debug("📊 Fetching dashboard stats for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
         
         # Total Emission (all time)
         total_emission = db.session.query(func.sum(Emission.amount)).filter_by(user_id=user_id).scalar() or 0
-        print(f"🌍 Total emission: {total_emission}")
+        logger.debug("🌍 Total emission: %s", total_emission)
         
         # This Month Emission
         first_day_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
@@ -83,18 +86,18 @@ def get_dashboard_stats(user_id):
             Emission.user_id == user_id,
             Emission.date >= first_day_of_month
         ).scalar() or 0
-        print(f"📅 This month emission: {this_month}")
+        logger.debug("📅 This month emission: %s", this_month)
         
         # Activities Logged (this month)
         activities_count = Activity.query.filter(
             Activity.user_id == user_id,
             Activity.date >= first_day_of_month
         ).count()
-        print(f"📝 Activities logged: {activities_count}")
+        logger.debug("📝 Activities logged: %s", activities_count)
         
         # Active Goals
         active_goals = Goal.query.filter_by(user_id=user_id, status='active').count()
-        print(f"🎯 Active goals: {active_goals}")
+        logger.debug("🎯 Active goals: %s", active_goals)
         
         response_data = {
             'totalEmission': round(total_emission, 2),
@@ -114,9 +117,9 @@ def get_dashboard_stats(user_id):
                     'message': enhanced_stats.get('message', ''),
                     'category_breakdown': enhanced_stats.get('category_breakdown', {})
                 }
-                print("✅ Enhanced stats added")
+                logger.debug("✅ Enhanced stats added")
             except Exception as e:
-                print(f"⚠️ Enhanced stats failed: {e}")
+                logger.warning("⚠️ Enhanced stats failed: %s", e)
                 response_data['enhancedData'] = {
                     'change_percent': 0,
                     'change_type': 'neutral', 
@@ -133,12 +136,11 @@ def get_dashboard_stats(user_id):
                 'category_breakdown': {}
             }
         
-        print(f"✅ Returning dashboard stats: {response_data}")
+        logger.debug("✅ Returning dashboard stats: %s", response_data)
         return jsonify(response_data), 200
         
     except Exception as e:
-        print(f"❌ Error in dashboard stats: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in dashboard stats: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # GET EMISSIONS TREND (Last 30 Days) - FIXED VERSION
@@ -149,7 +151,7 @@ def get_emissions_trend(user_id):
         days = request.args.get('days', 30, type=int)
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        print(f"🔍 Querying emissions trend for user {user_id}, last {days} days from {start_date}")
+        logger.debug("🔍 Querying emissions trend for user %s, last %s days from %s", user_id, days, start_date)
         
         # Query and group emissions by date
         emissions_by_date = db.session.query(
@@ -164,7 +166,7 @@ def get_emissions_trend(user_id):
             func.date(Emission.date)
         ).all()
         
-        print(f"📊 Found {len(emissions_by_date)} days with emissions data")
+        logger.debug("📊 Found %s days with emissions data", len(emissions_by_date))
         
         # Create trend data with proper format for frontend
         trend_data = []
@@ -179,7 +181,7 @@ def get_emissions_trend(user_id):
         
         # If no data found, create sample trend for demo
         if not trend_data:
-            print("📝 No emissions data found, creating sample trend")
+            logger.debug("📝 No emissions data found, creating sample trend")
             for i in range(days):
                 date = (datetime.utcnow() - timedelta(days=days - i - 1)).strftime('%b %d')
                 # Create a realistic trend pattern
@@ -192,14 +194,13 @@ def get_emissions_trend(user_id):
                     'value': round(value, 2)
                 })
         
-        print(f"📈 Returning trend data with {len(trend_data)} points")
-        print(f"📅 Sample data: {trend_data[:3]}...")  # Show first 3 points
+        logger.debug("📈 Returning trend data with %s points", len(trend_data))
+        logger.debug("📅 Sample data: %s...", trend_data[:3])  # Show first 3 points
         
         return jsonify(trend_data), 200
         
     except Exception as e:
-        print(f"❌ Error in emissions trend: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in emissions trend: %s", e)
         # Return sample data instead of empty array
         sample_data = []
         for i in range(30):
@@ -215,12 +216,12 @@ def get_emissions_trend(user_id):
 def get_top_emitters(user_id):
     """Get top emission sources with actual emission values (not percentages)"""
     try:
-        print(f"🔍 Querying top emitters for user {user_id}")
+        logger.debug("🔍 Querying top emitters for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
         
         # Query top emitters with actual emission values
@@ -231,11 +232,11 @@ def get_top_emitters(user_id):
             func.sum(Emission.amount).desc()
         ).limit(4).all()
         
-        print(f"📊 Found {len(top_emitters)} top emitters")
+        logger.debug("📊 Found %s top emitters", len(top_emitters))
         
         # If no emitters found, return sample data
         if not top_emitters:
-            print("📝 No emitters found, returning sample data")
+            logger.debug("📝 No emitters found, returning sample data")
             sample_emitters = [
                 {'name': 'Excavator', 'value': 45.2},
                 {'name': 'Work Truck', 'value': 32.8},
@@ -260,12 +261,11 @@ def get_top_emitters(user_id):
             for i, emitter in enumerate(top_emitters)
         ]
         
-        print(f"🎨 Returning top emitters: {emitters_data}")
+        logger.debug("🎨 Returning top emitters: %s", emitters_data)
         return jsonify(emitters_data), 200
         
     except Exception as e:
-        print(f"❌ Error in top emitters: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in top emitters: %s", e)
         # Return sample data on error
         sample_data = [
             {'name': 'Excavator', 'value': 45.2, 'color': '#f59e0b'},
@@ -284,28 +284,27 @@ def get_recent_activities(user_id):
     """
     try:
         limit = request.args.get('limit', 10, type=int)
-        print(f"🔍 Querying recent activities for user {user_id}, limit {limit}")
+        logger.debug("🔍 Querying recent activities for user %s, limit %s", user_id, limit)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
         
         activities = Activity.query.filter_by(user_id=user_id).order_by(
             Activity.date.desc()
         ).limit(limit).all()
         
-        print(f"📝 Found {len(activities)} activities")
+        logger.debug("📝 Found %s activities", len(activities))
         
         activities_data = [activity.to_dict() for activity in activities]
-        print(f"✅ Returning activities: {activities_data}")
+        logger.debug("✅ Returning activities: %s", activities_data)
         
         return jsonify(activities_data), 200
         
     except Exception as e:
-        print(f"❌ Error in recent activities: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in recent activities: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # GET ALL ASSETS
@@ -316,23 +315,22 @@ def get_assets(user_id):
     Returns: [{ id, name, type, fuelType, model, year, emoji }, ...]
     """
     try:
-        print(f"🔍 Querying assets for user {user_id}")
+        logger.debug("🔍 Querying assets for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
         
         assets = Asset.query.filter_by(user_id=user_id, status='active').all()
-        print(f"📊 Found {len(assets)} assets")
+        logger.debug("📊 Found %s assets", len(assets))
         
         assets_data = [asset.to_dict() for asset in assets]
         return jsonify(assets_data), 200
         
     except Exception as e:
-        print(f"❌ Error getting assets: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error getting assets: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # CREATE NEW ASSET
@@ -344,21 +342,21 @@ def create_asset():
     """
     try:
         data = request.get_json()
-        print(f"🆕 Creating new asset: {data}")
+        logger.debug("🆕 Creating new asset: %s", data)
         
         # Validate required fields
         required_fields = ['user_id', 'name', 'type']
         for field in required_fields:
             if field not in data:
                 error_msg = f'Missing required field: {field}'
-                print(f"❌ {error_msg}")
+                logger.info("❌ %s", error_msg)
                 return jsonify({'error': error_msg}), 400
         
         # Check if user exists
         user = User.query.get(data['user_id'])
         if not user:
             error_msg = f"User {data['user_id']} not found"
-            print(f"❌ {error_msg}")
+            logger.info("❌ %s", error_msg)
             return jsonify({'error': error_msg}), 404
         
         new_asset = Asset(
@@ -375,7 +373,7 @@ def create_asset():
         db.session.add(new_asset)
         db.session.commit()
         
-        print(f"✅ Asset created successfully: {new_asset.to_dict()}")
+        logger.info("✅ Asset created successfully: %s", new_asset)
         return jsonify({
             'message': 'Asset created successfully!',
             'asset': new_asset.to_dict()
@@ -383,8 +381,7 @@ def create_asset():
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error creating asset: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error creating asset: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # UPDATE ASSET
@@ -398,11 +395,11 @@ def update_asset(asset_id):
         asset = Asset.query.get(asset_id)
         
         if not asset:
-            print(f"❌ Asset {asset_id} not found")
+            logger.info("❌ Asset %s not found", asset_id)
             return jsonify({'error': 'Asset not found'}), 404
         
         data = request.get_json()
-        print(f"📝 Updating asset {asset_id}: {data}")
+        logger.debug("📝 Updating asset %s: %s", asset_id, data)
         
         # Update fields
         if 'name' in data:
@@ -420,7 +417,7 @@ def update_asset(asset_id):
         
         db.session.commit()
         
-        print(f"✅ Asset updated successfully: {asset.to_dict()}")
+        logger.info("✅ Asset updated successfully: %s", asset)
         return jsonify({
             'message': 'Asset updated successfully!',
             'asset': asset.to_dict()
@@ -428,8 +425,7 @@ def update_asset(asset_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error updating asset: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error updating asset: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # DELETE ASSET
@@ -442,22 +438,21 @@ def delete_asset(asset_id):
         asset = Asset.query.get(asset_id)
         
         if not asset:
-            print(f"❌ Asset {asset_id} not found")
+            logger.info("❌ Asset %s not found", asset_id)
             return jsonify({'error': 'Asset not found'}), 404
         
-        print(f"🗑️ Deleting asset {asset_id}: {asset.name}")
+        logger.info("🗑️ Deleting asset %s: %s", asset_id, asset.name)
         
         # Soft delete
         asset.status = 'deleted'
         db.session.commit()
         
-        print("✅ Asset deleted successfully!")
+        logger.info("✅ Asset deleted successfully!")
         return jsonify({'message': 'Asset deleted successfully!'}), 200
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error deleting asset: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error deleting asset: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # GET SINGLE ASSET
@@ -467,20 +462,19 @@ def get_single_asset(asset_id):
     Get details of a single asset
     """
     try:
-        print(f"🔍 Querying single asset {asset_id}")
+        logger.debug("🔍 Querying single asset %s", asset_id)
         
         asset = Asset.query.get(asset_id)
         
         if not asset:
-            print(f"❌ Asset {asset_id} not found")
+            logger.info("❌ Asset %s not found", asset_id)
             return jsonify({'error': 'Asset not found'}), 404
         
-        print(f"✅ Found asset: {asset.to_dict()}")
+        logger.debug("✅ Found asset: %s", asset)
         return jsonify(asset.to_dict()), 200
         
     except Exception as e:
-        print(f"❌ Error getting single asset: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error getting single asset: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # SEED SAMPLE DATA
@@ -490,12 +484,12 @@ def seed_data(user_id):
     Create sample data for testing (REMOVE IN PRODUCTION)
     """
     try:
-        print(f"🌱 Seeding sample data for user {user_id}")
+        logger.info("🌱 Seeding sample data for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
         
         # Create sample assets
@@ -526,13 +520,12 @@ def seed_data(user_id):
         
         db.session.commit()
         
-        print("✅ Sample data created successfully!")
+        logger.info("✅ Sample data created successfully!")
         return jsonify({'message': 'Sample data created successfully!'}), 201
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error seeding data: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error seeding data: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # RECORD EMISSION
@@ -541,19 +534,19 @@ def record_emission():
     """Record a new emission with automatic calculation"""
     try:
         data = request.get_json()
-        print(f"📝 Recording new emission: {data}")
+        logger.debug("📝 Recording new emission: %s", data)
         
         required_fields = ['user_id', 'original_value', 'emission_type']
         if not all(field in data for field in required_fields):
             error_msg = 'Missing required fields'
-            print(f"❌ {error_msg}")
+            logger.info("❌ %s", error_msg)
             return jsonify({'error': error_msg}), 400
         
         # Check if user exists
         user = User.query.get(data['user_id'])
         if not user:
             error_msg = f"User {data['user_id']} not found"
-            print(f"❌ {error_msg}")
+            logger.info("❌ %s", error_msg)
             return jsonify({'error': error_msg}), 404
         
         if emission_service_available:
@@ -576,7 +569,7 @@ def record_emission():
             db.session.add(emission)
             db.session.commit()
         
-        print(f"✅ Emission recorded successfully: {emission.to_dict()}")
+        logger.info("✅ Emission recorded successfully: %s", emission)
         return jsonify({
             'message': 'Emission recorded successfully',
             'emission': emission.to_dict(),
@@ -584,42 +577,10 @@ def record_emission():
         }), 201
         
     except Exception as e:
-        print(f"❌ Error recording emission: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error recording emission: %s", e)
         return jsonify({'error': str(e)}), 500
 
-# GET USER EMISSIONS
-@api.route('/emissions/user/<int:user_id>')
-def get_user_emissions(user_id):
-    """Get user's emission history with pagination"""
-    try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        
-        print(f"🔍 Querying emissions for user {user_id}, page {page}, per_page {per_page}")
-        
-        # Check if user exists
-        user = User.query.get(user_id)
-        if not user:
-            print(f"❌ User {user_id} not found")
-            return jsonify({'error': 'User not found'}), 404
-        
-        emissions = Emission.query.filter_by(user_id=user_id)\
-            .order_by(Emission.date.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
-        
-        print(f"📊 Found {emissions.total} total emissions, showing {len(emissions.items)} on page {page}")
-        
-        return jsonify({
-            'emissions': [e.to_dict() for e in emissions.items],
-            'total': emissions.total,
-            'pages': emissions.pages,
-            'current_page': page
-        })
-    except Exception as e:
-        print(f"❌ Error getting user emissions: {str(e)}")
-        traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
+# GET USER EMISSIONS: served by emission_bp.get_user_emissions
 
 # GET EMISSION CATEGORIES
 @api.route('/emissions/categories/<int:user_id>', methods=['GET'])
@@ -627,12 +588,12 @@ def get_emission_categories(user_id):
     """Get emissions broken down by category for current month"""
     try:
         current_date = datetime.now()
-        print(f"🔍 Querying emission categories for user {user_id}, {current_date.year}-{current_date.month}")
+        logger.debug("🔍 Querying emission categories for user %s, %s-%s", user_id, current_date.year, current_date.month)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
         
         summary = MonthlySummary.query.filter_by(
@@ -642,7 +603,7 @@ def get_emission_categories(user_id):
         ).first()
         
         if not summary:
-            print("📝 No monthly summary found, returning zeros")
+            logger.debug("📝 No monthly summary found, returning zeros")
             return jsonify({
                 'electricity': 0,
                 'transport': 0,
@@ -657,12 +618,11 @@ def get_emission_categories(user_id):
             'other': round(summary.other_emissions, 2)
         }
         
-        print(f"📊 Emission categories: {result}")
+        logger.debug("📊 Emission categories: %s", result)
         return jsonify(result), 200
         
     except Exception as e:
-        print(f"❌ Error getting emission categories: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error getting emission categories: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # SEED EMISSION DATA
@@ -672,12 +632,12 @@ def seed_emission_data(user_id):
     Create sample emission data for testing (REMOVE IN PRODUCTION)
     """
     try:
-        print(f"🌱 Seeding emission data for user {user_id}")
+        logger.info("🌱 Seeding emission data for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
         
         sample_emissions = [
@@ -759,7 +719,7 @@ def seed_emission_data(user_id):
                 db.session.commit()
             created_emissions.append(emission.to_dict())
         
-        print(f"✅ Created {len(created_emissions)} sample emissions")
+        logger.info("✅ Created %s sample emissions", len(created_emissions))
         return jsonify({
             'message': 'Sample emission data created successfully!',
             'emissions_created': len(created_emissions),
@@ -767,8 +727,7 @@ def seed_emission_data(user_id):
         }), 201
         
     except Exception as e:
-        print(f"❌ Error seeding emission data: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error seeding emission data: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # ENHANCED DASHBOARD STATS
@@ -776,23 +735,23 @@ def seed_emission_data(user_id):
 def get_enhanced_stats(user_id):
     """Get enhanced dashboard stats with emissions service"""
     try:
-        print(f"📊 Fetching enhanced stats for user {user_id}")
+        logger.debug("📊 Fetching enhanced stats for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
         
         if emission_service_available:
             stats = EmissionService.get_dashboard_stats(user_id)
-            print(f"✅ Enhanced stats: {stats}")
+            logger.debug("✅ Enhanced stats: %s", stats)
             return jsonify({
                 'success': True,
                 'enhancedData': stats
             }), 200
         else:
-            print("⚠️ EmissionService not available for enhanced stats")
+            logger.warning("⚠️ EmissionService not available for enhanced stats")
             return jsonify({
                 'success': False,
                 'error': 'EmissionService not available',
@@ -800,8 +759,7 @@ def get_enhanced_stats(user_id):
             }), 200
             
     except Exception as e:
-        print(f"❌ Error getting enhanced stats: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error getting enhanced stats: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # DEBUG EMISSIONS ENDPOINT
@@ -827,11 +785,11 @@ def debug_emissions(user_id):
                 'is_datetime': isinstance(e.date, datetime)
             })
         
-        print(f"🔍 Debug emissions info: {debug_info}")
+        logger.debug("🔍 Debug emissions info: %s", debug_info)
         return jsonify(debug_info), 200
         
     except Exception as e:
-        print(f"❌ Error in debug emissions: {str(e)}")
+        logger.error("❌ Error in debug emissions: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # GET USER METRICS
@@ -842,36 +800,29 @@ def get_user_metrics(user_id):
     Returns enhanced data for metrics card
     """
     try:
-        print(f"📊 Fetching user metrics for user {user_id}")
+        logger.debug("📊 Fetching user metrics for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
 
-        # Calculate current month emissions
+        # Current and previous month totals from the monthly rollups
         current_month = datetime.utcnow().month
         current_year = datetime.utcnow().year
+        previous_year, prev_month = previous_month(current_year, current_month)
         
-        current_month_data = db.session.query(func.sum(Emission.amount)).filter(
-            Emission.user_id == user_id,
-            func.extract('month', Emission.date) == current_month,
-            func.extract('year', Emission.date) == current_year
-        ).scalar() or 0
-
-        # Calculate previous month emissions
-        previous_month = current_month - 1 if current_month > 1 else 12
-        previous_year = current_year if current_month > 1 else current_year - 1
-        
-        previous_month_data = db.session.query(func.sum(Emission.amount)).filter(
-            Emission.user_id == user_id,
-            func.extract('month', Emission.date) == previous_month,
-            func.extract('year', Emission.date) == previous_year
-        ).scalar() or 0
+        summaries = get_monthly_summaries(
+            user_id,
+            (current_year, current_month),
+            (previous_year, prev_month)
+        )
+        current_summary = summaries.get((current_year, current_month))
+        previous_summary = summaries.get((previous_year, prev_month))
 
-        current_emissions = float(current_month_data)
-        previous_emissions = float(previous_month_data)
+        current_emissions = float(current_summary.total_emissions or 0) if current_summary else 0.0
+        previous_emissions = float(previous_summary.total_emissions or 0) if previous_summary else 0.0
 
         # Calculate percentage change
         change_percent = 0
@@ -899,19 +850,18 @@ def get_user_metrics(user_id):
             'message': message,
             'total_emissions': round(current_emissions, 2),
             'previous_emissions': round(previous_emissions, 2),
-            'comparison_period': f"{datetime(previous_year, previous_month, 1).strftime('%B %Y')}",
+            'comparison_period': f"{datetime(previous_year, prev_month, 1).strftime('%B %Y')}",
             'updated_at': datetime.utcnow().isoformat()
         }
 
-        print(f"✅ User metrics calculated: {metrics}")
+        logger.debug("✅ User metrics calculated: %s", metrics)
         return jsonify({
             'success': True,
             'enhancedData': metrics
         }), 200
 
     except Exception as e:
-        print(f"❌ Error in user metrics: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in user metrics: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # GET MONTHLY METRICS
@@ -926,43 +876,37 @@ def get_monthly_metrics():
         if not user_id:
             return jsonify({'error': 'user_id query parameter is required'}), 400
 
-        print(f"📊 Fetching monthly metrics for user {user_id}")
+        logger.debug("📊 Fetching monthly metrics for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
 
         # Current month data
         current_month = datetime.utcnow().month
         current_year = datetime.utcnow().year
         
-        # Total emissions for current month
-        monthly_total = db.session.query(func.sum(Emission.amount)).filter(
-            Emission.user_id == user_id,
-            func.extract('month', Emission.date) == current_month,
-            func.extract('year', Emission.date) == current_year
-        ).scalar() or 0
+        this_month = month_window(current_year, current_month)
 
         # Activity count for current month
         activity_count = Activity.query.filter(
             Activity.user_id == user_id,
-            func.extract('month', Activity.date) == current_month,
-            func.extract('year', Activity.date) == current_year
+            in_window(Activity.date, this_month)
         ).count()
 
-        # Category breakdown
+        # Category breakdown with per-type counts; the month total is their sum
         categories = db.session.query(
             Emission.emission_type,
             func.sum(Emission.amount).label('total_emissions'),
             func.count(Emission.id).label('activity_count')
         ).filter(
             Emission.user_id == user_id,
-            func.extract('month', Emission.date) == current_month,
-            func.extract('year', Emission.date) == current_year
+            in_window(Emission.date, this_month)
         ).group_by(Emission.emission_type).all()
 
+        monthly_total = sum(float(cat.total_emissions or 0) for cat in categories)
         category_data = []
         for cat in categories:
             category_data.append({
@@ -980,15 +924,14 @@ def get_monthly_metrics():
             'updated_at': datetime.utcnow().isoformat()
         }
 
-        print(f"✅ Monthly metrics calculated: {metrics}")
+        logger.debug("✅ Monthly metrics calculated: %s", metrics)
         return jsonify({
             'success': True,
             'monthlyData': metrics
         }), 200
 
     except Exception as e:
-        print(f"❌ Error in monthly metrics: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in monthly metrics: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # GET DASHBOARD METRICS
@@ -998,43 +941,34 @@ def get_dashboard_metrics(user_id):
     Get comprehensive dashboard metrics for the metrics card
     """
     try:
-        print(f"📊 Fetching dashboard metrics for user {user_id}")
+        logger.debug("📊 Fetching dashboard metrics for user %s", user_id)
         
         # Check if user exists
         user = User.query.get(user_id)
         if not user:
-            print(f"❌ User {user_id} not found")
+            logger.info("❌ User %s not found", user_id)
             return jsonify({'error': 'User not found'}), 404
 
         # Current month data
         current_month = datetime.utcnow().month
         current_year = datetime.utcnow().year
         
-        current_data = db.session.query(func.sum(Emission.amount)).filter(
-            Emission.user_id == user_id,
-            func.extract('month', Emission.date) == current_month,
-            func.extract('year', Emission.date) == current_year
-        ).scalar() or 0
-
         # Previous month data
-        previous_month = current_month - 1 if current_month > 1 else 12
-        previous_year = current_year if current_month > 1 else current_year - 1
-        
-        previous_data = db.session.query(func.sum(Emission.amount)).filter(
-            Emission.user_id == user_id,
-            func.extract('month', Emission.date) == previous_month,
-            func.extract('year', Emission.date) == previous_year
-        ).scalar() or 0
-
-        # Year-to-date data
-        ytd_data = db.session.query(func.sum(Emission.amount)).filter(
-            Emission.user_id == user_id,
-            func.extract('year', Emission.date) == current_year
-        ).scalar() or 0
+        previous_year, prev_month = previous_month(current_year, current_month)
+        
+        # This year's buckets plus last month's (which may be in last year)
+        summaries = MonthlySummary.query.filter(
+            MonthlySummary.user_id == user_id,
+            or_(
+                MonthlySummary.year == current_year,
+                and_(MonthlySummary.year == previous_year, MonthlySummary.month == prev_month)
+            )
+        ).all()
+        totals = {(s.year, s.month): float(s.total_emissions or 0) for s in summaries}
 
-        current_emissions = float(current_data)
-        previous_emissions = float(previous_data)
-        ytd_emissions = float(ytd_data)
+        current_emissions = totals.get((current_year, current_month), 0.0)
+        previous_emissions = totals.get((previous_year, prev_month), 0.0)
+        ytd_emissions = sum(total for (year, _), total in totals.items() if year == current_year)
 
         # Calculate monthly change
         change_percent = 0
@@ -1063,19 +997,18 @@ def get_dashboard_metrics(user_id):
             'current_emissions': round(current_emissions, 2),
             'previous_emissions': round(previous_emissions, 2),
             'ytd_emissions': round(ytd_emissions, 2),
-            'comparison_period': f"{datetime(previous_year, previous_month, 1).strftime('%B %Y')}",
+            'comparison_period': f"{datetime(previous_year, prev_month, 1).strftime('%B %Y')}",
             'updated_at': datetime.utcnow().isoformat()
         }
 
-        print(f"✅ Dashboard metrics calculated: {metrics}")
+        logger.debug("✅ Dashboard metrics calculated: %s", metrics)
         return jsonify({
             'success': True,
             'metrics': metrics
         }), 200
 
     except Exception as e:
-        print(f"❌ Error in dashboard metrics: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in dashboard metrics: %s", e)
         return jsonify({'error': str(e)}), 500
     
 
@@ -6,8 +6,11 @@ import random
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from sqlalchemy import insert
+
 from app import app, db
 from models import User, Asset, Activity, Emission, Goal, MonthlySummary
+from rollups import rebuild_monthly_summaries, rebuild_daily_summaries, rebuild_asset_impacts
 
 def seed_database():
     """Seed the database with sample data optimized for dashboard charts"""
@@ -62,8 +65,7 @@ def seed_database():
                     'fuel_type': 'diesel',
                     'model': 'CAT 320',
                     'year': '2019',
-                    'emoji': '🏗️',
-                    'carbon_impact': 15.5
+                    'emoji': '🏗️'
                 },
                 {
                     'user_id': john.id,
@@ -72,8 +74,7 @@ def seed_database():
                     'fuel_type': 'diesel',
                     'model': 'Toyota Hilux',
                     'year': '2020',
-                    'emoji': '🚚',
-                    'carbon_impact': 12.2
+                    'emoji': '🚚'
                 },
                 {
                     'user_id': john.id,
@@ -82,8 +83,7 @@ def seed_database():
                     'fuel_type': 'petrol',
                     'model': 'Honda Accord',
                     'year': '2021',
-                    'emoji': '🚗',
-                    'carbon_impact': 8.7
+                    'emoji': '🚗'
                 },
                 
                 # Sarah's assets
@@ -94,8 +94,7 @@ def seed_database():
                     'fuel_type': 'electric',
                     'model': 'Tesla Model 3',
                     'year': '2023',
-                    'emoji': '🚗',
-                    'carbon_impact': 0.0
+                    'emoji': '🚗'
                 },
                 {
                     'user_id': sarah.id,
@@ -104,8 +103,7 @@ def seed_database():
                     'fuel_type': 'diesel',
                     'model': 'Cummins 5000',
                     'year': '2022',
-                    'emoji': '⚡',
-                    'carbon_impact': 20.1
+                    'emoji': '⚡'
                 }
             ]
             
@@ -233,11 +231,9 @@ def seed_database():
                             'date': date
                         })
 
-            # Add all emissions to database
-            for emission_data in emissions_data:
-                emission = Emission(**emission_data)
-                db.session.add(emission)
-            
+            # Add all emissions to database in one bulk insert; the monthly
+            # summaries are rebuilt once at the end instead of per row
+            db.session.execute(insert(Emission), emissions_data)
             db.session.commit()
             print(f"✅ Created {len(emissions_data)} emissions entries")
 
@@ -297,10 +293,7 @@ def seed_database():
                     'date': date
                 })
 
-            for activity_data in activities_data:
-                activity = Activity(**activity_data)
-                db.session.add(activity)
-            
+            db.session.execute(insert(Activity), activities_data)
             db.session.commit()
             print(f"✅ Created {len(activities_data)} activities")
 
@@ -337,54 +330,14 @@ def seed_database():
             db.session.commit()
             print(f"✅ Created {len(goals_data)} goals")
 
-            # Create monthly summaries with calculated data
+            # Build monthly summaries from the bulk-inserted emissions
             print("📈 Creating monthly summaries...")
-            current_date = datetime.utcnow()
-            
-            # Calculate actual totals for current month
-            john_current_emissions = sum([e.amount for e in Emission.query.filter(
-                Emission.user_id == john.id,
-                Emission.date >= current_date.replace(day=1)
-            ).all()])
-            
-            sarah_current_emissions = sum([e.amount for e in Emission.query.filter(
-                Emission.user_id == sarah.id,
-                Emission.date >= current_date.replace(day=1)
-            ).all()])
-            
-            monthly_summaries = [
-                {
-                    'user_id': john.id,
-                    'year': current_date.year,
-                    'month': current_date.month,
-                    'total_emissions': round(john_current_emissions, 2),
-                    'previous_month_emissions': round(john_current_emissions * 1.2, 2),  # 20% higher last month
-                    'percent_change': -16.7,
-                    'electricity_emissions': round(john_current_emissions * 0.3, 2),
-                    'transport_emissions': round(john_current_emissions * 0.4, 2),
-                    'food_emissions': 0.0,
-                    'other_emissions': round(john_current_emissions * 0.3, 2)
-                },
-                {
-                    'user_id': sarah.id,
-                    'year': current_date.year,
-                    'month': current_date.month,
-                    'total_emissions': round(sarah_current_emissions, 2),
-                    'previous_month_emissions': round(sarah_current_emissions * 0.9, 2),  # 10% lower last month
-                    'percent_change': 11.1,
-                    'electricity_emissions': round(sarah_current_emissions * 0.6, 2),
-                    'transport_emissions': round(sarah_current_emissions * 0.4, 2),
-                    'food_emissions': 0.0,
-                    'other_emissions': 0.0
-                }
-            ]
-            
-            for summary_data in monthly_summaries:
-                summary = MonthlySummary(**summary_data)
-                db.session.add(summary)
-            
-            db.session.commit()
-            print(f"✅ Created {len(monthly_summaries)} monthly summaries")
+            summary_count = rebuild_monthly_summaries()
+            print(f"✅ Created {summary_count} monthly summaries")
+            daily_count = rebuild_daily_summaries()
+            print(f"✅ Created {daily_count} daily summaries")
+            rebuild_asset_impacts()
+            print("✅ Computed asset carbon impact")
 
             # Print debug information
             print("\n" + "="*50)
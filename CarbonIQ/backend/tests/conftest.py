@@ -0,0 +1,127 @@
+import os
+import sys
+import random
+from datetime import datetime
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Never let the test run touch the real database
+os.environ['DATABASE_URL'] = 'sqlite://'
+# Generate AI insights inline so tests see them without waiting on threads
+os.environ['INSIGHT_WORKERS'] = '0'
+
+from app import app as flask_app  # noqa: E402
+from models import db, User, Emission  # noqa: E402
+from utils.cache import response_cache  # noqa: E402
+from utils.pagination import clear_total_cache  # noqa: E402
+from utils import ai_helper  # noqa: E402
+from utils.ai_helper import llm_guard, prompt_cache  # noqa: E402
+from utils.fake_llm import FakeLLMClient  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    # Ids restart with every fresh database, so cached entries must not carry over
+    response_cache.clear()
+    clear_total_cache()
+    # Upstream failures simulated by one test must not open the circuit for the next
+    llm_guard.breaker.reset()
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app):
+    user = User(name='Test User', email='test@example.com')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def seeded(app):
+    """
+    The sample data from seed.py: John and Sarah with 30 days of emissions,
+    a week of activities, assets, goals and rebuilt summaries
+
+    Returns:
+        dict: name -> id for both users and one of John's goals, assets and activities
+    """
+    from seed import seed_database
+    from models import Asset, Activity, Goal
+
+    random.seed(0)
+    seed_database()
+    john = User.query.filter_by(email='john.doe@example.com').one()
+    sarah = User.query.filter_by(email='sarah.connor@example.com').one()
+    return {
+        'john': john.id,
+        'sarah': sarah.id,
+        'goal': Goal.query.filter_by(user_id=john.id).first().id,
+        'asset': Asset.query.filter_by(user_id=john.id).first().id,
+        'activity': Activity.query.filter_by(user_id=john.id).first().id,
+    }
+
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager collecting every SQL statement executed inside it"""
+    @contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+    return counter
+
+
+@pytest.fixture
+def add_emission(app):
+    """
+    Emission factory: add_emission(user_id, amount, date=None, **fields)
+
+    Adds a 'transport' emission from 'Car', recorded now unless a date is
+    given, to the session; other Emission columns can be passed as keywords.
+    The caller commits.
+    """
+    def add(user_id, amount, date=None, **fields):
+        values = {'emission_type': 'transport', 'source': 'Car', 'original_value': amount}
+        values.update(fields)
+        emission = Emission(user_id=user_id, amount=amount, date=date or datetime.utcnow(), **values)
+        db.session.add(emission)
+        return emission
+
+    return add
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """FakeLLMClient installed as the AI coach's client, with an empty prompt cache"""
+    fake = FakeLLMClient()
+    monkeypatch.setattr(ai_helper, 'client', fake)
+    monkeypatch.setattr(ai_helper, 'openai_available', True)
+    prompt_cache.clear()
+    yield fake
+    prompt_cache.clear()
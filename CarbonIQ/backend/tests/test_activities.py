@@ -0,0 +1,207 @@
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+import ingest
+from models import db, Activity, Emission, DailySummary
+from data_versions import get_data_version
+from rollups import check_monthly_summaries
+from utils.carbon_calculator import CarbonCalculator
+from utils.pagination import clear_total_cache
+
+
+def add_activities(user, count, same_date=None):
+    start = datetime(2025, 1, 1)
+    db.session.execute(insert(Activity), [
+        {
+            'user_id': user.id,
+            'title': f'Activity {n}',
+            'amount': 1.0,
+            'badge': 'transport' if n % 2 else 'energy',
+            'date': same_date or start + timedelta(hours=n),
+        }
+        for n in range(count)
+    ])
+    db.session.commit()
+
+
+def walk(client, url):
+    ids, cursor = [], None
+    while True:
+        page_url = url + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(page_url).get_json()
+        ids.extend(a['id'] for a in data['activities'])
+        cursor = data['pagination']['next_cursor']
+        if not cursor:
+            return ids
+
+
+def test_cursor_walk_returns_every_activity_once(client, user):
+    add_activities(user, 45)
+
+    ids = walk(client, f'/api/activities/{user.id}?limit=10')
+
+    assert len(ids) == 45
+    assert len(set(ids)) == 45
+    dates = [db.session.get(Activity, i).date for i in ids]
+    assert dates == sorted(dates, reverse=True)
+
+
+def test_cursor_breaks_ties_on_id(client, user):
+    add_activities(user, 7, same_date=datetime(2025, 3, 1))
+
+    ids = walk(client, f'/api/activities/{user.id}?limit=3')
+
+    assert ids == sorted(ids, reverse=True)
+    assert len(ids) == 7
+
+
+def test_rows_without_a_date_are_paged_last(client, user):
+    add_activities(user, 5)
+    add_activities(user, 5, same_date=datetime(2030, 1, 1))
+    # The column default fills in missing dates on insert, so clear them afterwards
+    Activity.query.filter(Activity.date == datetime(2030, 1, 1)).update({Activity.date: None})
+    db.session.commit()
+
+    ids = walk(client, f'/api/activities/{user.id}?limit=3')
+
+    assert len(ids) == 10
+    assert len(set(ids)) == 10
+    assert [db.session.get(Activity, i).date for i in ids][5:] == [None] * 5
+
+
+def test_deep_pages_skip_offset_and_count(client, user, count_queries):
+    add_activities(user, 60)
+    user_id = user.id
+    data = client.get(f'/api/activities/{user_id}?limit=20&cursor=').get_json()
+    cursor = client.get(
+        f"/api/activities/{user_id}?limit=20&cursor={data['pagination']['next_cursor']}"
+    ).get_json()['pagination']['next_cursor']
+
+    with count_queries() as statements:
+        data = client.get(f'/api/activities/{user_id}?limit=20&cursor={cursor}').get_json()
+
+    assert len(data['activities']) == 20
+    assert data['pagination']['has_more'] is False
+    # User lookup + one keyset page query; no re-count of the whole list
+    assert len(statements) <= 2
+    assert not any('count(' in s for s in statements)
+
+
+def test_totals_are_opt_in_and_cached(client, user, count_queries):
+    clear_total_cache()
+    add_activities(user, 12)
+    user_id = user.id
+
+    assert client.get(f'/api/activities/{user_id}').get_json()['pagination']['total'] is None
+
+    data = client.get(f'/api/activities/{user_id}?total=true&category=transport').get_json()
+    assert data['pagination']['total'] == 6
+
+    with count_queries() as statements:
+        data = client.get(f'/api/activities/{user_id}?total=true&category=transport').get_json()
+    assert data['pagination']['total'] == 6
+    assert not any('count(' in s for s in statements)
+
+
+def test_invalid_cursor_is_rejected(client, user):
+    response = client.get(f'/api/activities/{user.id}?cursor=not-a-cursor')
+
+    assert response.status_code == 400
+
+
+def reading(owner_id, n, **overrides):
+    record = {
+        'user_id': owner_id, 'title': f'Trip {n}', 'category': 'transport',
+        'activity_type': 'car_petrol' if n % 2 else 'bus', 'value': 10 + n,
+        'date': f'2025-03-{n % 28 + 1:02d}T08:00:00',
+    }
+    record.update(overrides)
+    return record
+
+
+def test_bulk_insert_reports_bad_rows_without_aborting(client, user):
+    user_id = user.id
+    records = [reading(user_id, n) for n in range(5)]
+    records[1] = reading(user_id, 1, value='lots')
+    records[3] = reading(user_id, 3, user_id=999)
+    records.append({'title': 'No user'})
+
+    response = client.post('/api/activities/bulk', json=records)
+
+    assert response.status_code == 207
+    result = response.get_json()
+    assert result['inserted'] == 3
+    assert [e['index'] for e in result['errors']] == [1, 3, 5]
+    assert Activity.query.filter_by(user_id=user_id).count() == 3
+
+    emission = Emission.query.filter_by(user_id=user_id, activity='Trip 2').one()
+    assert emission.amount == CarbonCalculator.calculate_transport_emission(12, 'bus')['amount']
+    assert emission.calculation_method == '12.0 km × 0.089 kg CO₂/km'
+
+
+def test_bulk_insert_rejects_rows_the_database_would_refuse(client, user):
+    user_id = user.id
+    records = [reading(user_id, n) for n in range(5)]
+    records.append(reading(user_id, 5, value='nan'))
+    records.append(reading(user_id, 6, emission_factor='inf'))
+    # An offset is converted to naive UTC like every other stored date
+    records.append(reading(user_id, 7, date='2026-10-01T08:00:00+02:00'))
+
+    response = client.post('/api/activities/bulk', json=records)
+
+    result = response.get_json()
+    assert response.status_code == 207
+    assert result['inserted'] == 6
+    assert [e['index'] for e in result['errors']] == [5, 6]
+    assert 'finite' in result['errors'][0]['error']
+    assert Activity.query.filter_by(title='Trip 7').one().date == datetime(2026, 10, 1, 6, 0)
+    assert check_monthly_summaries(user_id) == []
+
+
+def test_bulk_insert_maintains_rollups_and_versions(client, user):
+    user_id = user.id
+    version = get_data_version(user_id)
+    records = [reading(user_id, n) for n in range(20)]
+
+    assert client.post('/api/activities/bulk', json=records).status_code == 201
+
+    assert get_data_version(user_id) > version
+    assert check_monthly_summaries(user_id) == []
+    daily_total = db.session.query(db.func.sum(DailySummary.total_emissions)).filter_by(user_id=user_id).scalar()
+    emission_total = db.session.query(db.func.sum(Emission.amount)).filter_by(user_id=user_id).scalar()
+    assert round(daily_total, 6) == round(emission_total, 6)
+
+
+def test_bulk_insert_accepts_ndjson(client, user):
+    user_id = user.id
+    body = '\n'.join([json.dumps(reading(user_id, 0)), '{not json', '', json.dumps(reading(user_id, 1))])
+
+    response = client.post('/api/activities/bulk', data=body, content_type='application/x-ndjson')
+
+    result = response.get_json()
+    assert response.status_code == 207
+    assert result['inserted'] == 2
+    assert result['errors'][0]['index'] == 1
+
+
+def test_bulk_insert_cost_is_per_chunk_not_per_row(client, user, count_queries, monkeypatch):
+    monkeypatch.setattr(ingest, 'BULK_CHUNK_SIZE', 50)
+    user_id = user.id
+
+    def statements_for(count):
+        records = [reading(user_id, n, date='2025-04-01T08:00:00') for n in range(count)]
+        with count_queries() as statements:
+            assert client.post('/api/activities/bulk', json=records).status_code == 201
+        return len(statements)
+
+    assert statements_for(10) == statements_for(50)
+    # Two chunks cost one more chunk's worth, not 50 more rows' worth
+    assert statements_for(100) < 2 * statements_for(50)
+
+
+def test_bulk_insert_rejects_unusable_payloads(client, user):
+    assert client.post('/api/activities/bulk', data='{', content_type='application/json').status_code == 400
+    assert client.post('/api/activities/bulk', json=[]).status_code == 400
+    assert client.post('/api/activities/bulk', json=[{'title': 'x'}]).status_code == 400
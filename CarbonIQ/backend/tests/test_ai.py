@@ -0,0 +1,171 @@
+import json
+import threading
+from datetime import date
+
+from ai_context import AIContext
+from utils import ai_helper
+from utils.ai_helper import AIEcoCoach, PromptCache, emission_bucket, prompt_cache
+
+
+def make_context(**by_category):
+    today = date(2025, 6, 30)
+    return AIContext(1, 'Test User', 30, today, by_category, [(today, sum(by_category.values()))], [], 0)
+
+
+def test_identical_context_is_served_from_cache(fake_llm):
+    first = AIEcoCoach.get_personalized_insight(make_context(transport=12.0))
+    second = AIEcoCoach.get_personalized_insight(make_context(transport=12.0))
+
+    assert first['insight'] == second['insight']
+    assert first['source'] == 'ai'
+    assert first['category'] == 'transport'
+    assert len(fake_llm.calls) == 1
+    assert prompt_cache.stats()['hits'] == 1
+
+    # A different context is a different prompt
+    AIEcoCoach.get_personalized_insight(make_context(transport=12.0, food=1.0))
+    assert len(fake_llm.calls) == 2
+
+
+def test_fingerprint_ignores_whitespace_only_differences():
+    a = PromptCache.fingerprint([{'role': 'user', 'content': 'Total:  5 kg\n\n'}], 100, 0.7)
+    b = PromptCache.fingerprint([{'role': 'user', 'content': 'Total: 5 kg'}], 100, 0.7)
+    c = PromptCache.fingerprint([{'role': 'user', 'content': 'Total: 6 kg'}], 100, 0.7)
+
+    assert a == b
+    assert a != c
+
+
+def test_tips_are_shared_within_an_emission_bucket(fake_llm):
+    assert emission_bucket(60) == emission_bucket(95) == '50-100 kg'
+    assert emission_bucket(0) == 'none'
+    assert emission_bucket(5000) == '1000+ kg'
+
+    AIEcoCoach.get_reduction_tips('transport', 60)
+    AIEcoCoach.get_reduction_tips('transport', 95)
+    AIEcoCoach.get_reduction_tips('transport', 120)
+    AIEcoCoach.get_reduction_tips('food', 60)
+
+    assert len(fake_llm.calls) == 3
+
+
+def test_concurrent_identical_calls_are_coalesced(fake_llm):
+    fake_llm.latency = 0.2
+    results = []
+    start = threading.Barrier(5)
+
+    def request_tips():
+        start.wait()
+        results.append(AIEcoCoach.get_reduction_tips('energy', 30))
+
+    threads = [threading.Thread(target=request_tips) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(fake_llm.calls) == 1
+    assert len(results) == 5
+    assert all(r == results[0] for r in results)
+
+
+def test_cache_is_size_bounded(fake_llm):
+    cache = PromptCache(ttl=60, max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.get_or_create(key, lambda: key.upper())
+
+    assert len(cache.backend) == 2
+    assert cache.get_or_create('a', lambda: 'fresh') == 'fresh'
+
+
+def test_failures_fall_back_and_are_not_cached(fake_llm, monkeypatch):
+    def boom(**kwargs):
+        raise RuntimeError('upstream down')
+    monkeypatch.setattr(fake_llm.chat.completions, 'create', boom)
+
+    tips = AIEcoCoach.get_reduction_tips('food', 10)
+
+    assert tips == AIEcoCoach.FALLBACK_RESPONSES['food'][:3]
+    assert len(prompt_cache.backend) == 0
+
+
+def test_dashboard_insight_endpoint_uses_cached_completion(client, user, fake_llm):
+    fake_llm.reply = 'Try cycling to work once a week.'
+
+    first = client.get(f'/api/dashboard/insights/{user.id}').get_json()
+    second = client.get(f'/api/dashboard/insights/{user.id}').get_json()
+
+    assert first['insight'] == 'Try cycling to work once a week.'
+    assert second['insight'] == first['insight']
+    assert len(fake_llm.calls) == 1
+
+
+COACH_REPLY = 'Cycle to work twice a week to cut transport emissions.'
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def chat(client, user_id, **kwargs):
+    return client.post(
+        '/api/ai/chat',
+        json={'user_id': user_id, 'message': 'How do I cut transport emissions?'},
+        headers={'Accept': 'text/event-stream'},
+        **kwargs
+    )
+
+
+def test_chat_streams_tokens_then_done(client, user, fake_llm):
+    fake_llm.reply = COACH_REPLY
+
+    response = chat(client, user.id)
+
+    assert response.mimetype == 'text/event-stream'
+    events = parse_sse(response.get_data(as_text=True))
+    tokens = [data['delta'] for event, data in events if event == 'token']
+    assert len(tokens) > 1
+    assert events[-1][0] == 'done'
+    assert events[-1][1]['source'] == 'ai'
+    assert events[-1][1]['response'] == ''.join(tokens).strip() == fake_llm.reply
+
+
+def test_chat_fallback_is_a_single_event(client, user, monkeypatch):
+    monkeypatch.setattr(ai_helper, 'openai_available', False)
+
+    events = parse_sse(chat(client, user.id).get_data(as_text=True))
+
+    assert len(events) == 1
+    assert events[0][0] == 'done'
+    assert events[0][1]['response'] in AIEcoCoach.FALLBACK_RESPONSES['transport']
+
+
+def test_chat_stream_pulls_upstream_only_as_fast_as_the_client_reads(client, user, fake_llm):
+    fake_llm.reply = COACH_REPLY
+
+    response = chat(client, user.id, buffered=False)
+    body = iter(response.response)
+
+    next(body)
+    next(body)
+    upstream = fake_llm.streams[0]
+    assert upstream.pulled == 2
+
+    # Client goes away: the upstream stream is closed, not drained
+    response.close()
+    assert upstream.closed
+    assert upstream.pulled < len(upstream.pieces)
+
+
+def test_chat_without_stream_still_returns_json(client, user, fake_llm):
+    fake_llm.reply = COACH_REPLY
+
+    response = client.post('/api/ai/chat', json={'user_id': user.id, 'message': 'Hi'})
+
+    assert response.mimetype == 'application/json'
+    assert response.get_json()['response'] == fake_llm.reply
+    assert fake_llm.streams == []
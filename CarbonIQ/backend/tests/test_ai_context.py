@@ -0,0 +1,95 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from models import db, Activity
+from ai_context import build_ai_context
+
+TODAY = date(2025, 6, 30)
+
+
+@pytest.fixture
+def add_emissions(add_emission):
+    """add_emissions(user, rows, today): (days_ago, amount, type, source) rows, each at 9:00"""
+    def add(user, rows, today=TODAY):
+        for days_ago, amount, emission_type, source in rows:
+            date = datetime.combine(today - timedelta(days=days_ago), datetime.min.time()) + timedelta(hours=9)
+            add_emission(user.id, amount, date, emission_type=emission_type, source=source)
+        db.session.commit()
+
+    return add
+
+
+def test_context_totals_weeks_and_sources(app, user, add_emissions):
+    add_emissions(user, [
+        (0, 10.0, 'transport', 'Car'),
+        (3, 5.0, 'transport', 'Car'),
+        (8, 4.0, 'electricity', 'Grid'),
+        (20, 2.0, 'food', 'Beef'),
+        (40, 100.0, 'transport', 'Flight'),  # outside the window
+    ])
+    db.session.add(Activity(user_id=user.id, title='Drive', amount=10.0, date=datetime(2025, 6, 30, 9)))
+    db.session.commit()
+
+    context = build_ai_context(user.id, today=TODAY)
+
+    assert context.total == 21.0
+    assert context.by_category == {'electricity': 4.0, 'transport': 15.0, 'food': 2.0, 'other': 0.0}
+    assert context.top_category == 'transport'
+    assert context.weekly[0] == (TODAY - timedelta(days=6), 15.0)
+    assert context.weekly[1] == (TODAY - timedelta(days=13), 4.0)
+    assert sum(amount for _, amount in context.weekly) == 21.0
+    assert context.top_sources == [('Car', 15.0), ('Grid', 4.0), ('Beef', 2.0)]
+    assert len(context.daily) == 30
+    assert context.activity_count == 1
+    assert 'Top emission source: transport (15.00 kg CO₂)' in context.summary()
+
+
+def test_context_query_count_is_flat(app, user, add_emissions, count_queries):
+    add_emissions(user, [(n % 30, 1.0, 'transport', f'Trip {n % 7}') for n in range(300)])
+    user_id = user.id
+
+    with count_queries() as statements:
+        context = build_ai_context(user_id, today=TODAY)
+
+    assert context.total == 300.0
+    assert len(statements) == 3
+    assert not any('FROM emissions' in s and 'GROUP BY' not in s for s in statements)
+
+
+def test_context_for_unknown_or_idle_user(app, user):
+    assert build_ai_context(999) is None
+
+    context = build_ai_context(user.id)
+    assert context.total == 0
+    assert context.top_category == 'general'
+    assert context.summary() == 'No recent data available'
+
+
+def test_ai_endpoints_share_the_context(client, user, add_emissions, count_queries):
+    add_emissions(user, [(0, 10.0, 'transport', 'Car'), (9, 20.0, 'transport', 'Car')], datetime.utcnow().date())
+    user_id = user.id
+
+    with count_queries() as statements:
+        tips = client.get(f'/api/ai/tips?category=transport&user_id={user_id}').get_json()
+    assert len(statements) == 1
+    assert tips['current_emissions'] == 30.0
+
+    trend = client.get(f'/api/ai/analyze-trend/{user_id}').get_json()
+    assert trend['recent_week_avg'] == round(10.0 / 7, 2)
+    assert trend['previous_week_avg'] == round(20.0 / 7, 2)
+    assert trend['trend'] == 'decreasing'
+    assert client.get('/api/ai/analyze-trend/999').status_code == 404
+
+
+def test_tips_total_tip_categories_that_are_not_summary_buckets(client, user, add_emissions):
+    # create_activity stores the UI's tip category as the emission_type
+    add_emissions(user, [(1, 40.0, 'energy', 'Heating'), (2, 10.0, 'waste', 'Landfill'),
+                         (40, 99.0, 'energy', 'Heating')], datetime.utcnow().date())
+    user_id = user.id
+
+    energy = client.get(f'/api/ai/tips?category=energy&user_id={user_id}').get_json()
+    waste = client.get(f'/api/ai/tips?category=waste&user_id={user_id}').get_json()
+
+    assert energy['current_emissions'] == 40.0
+    assert waste['current_emissions'] == 10.0
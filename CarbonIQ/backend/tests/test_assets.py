@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+from emissionservice import EmissionService
+from models import db, Asset
+from rollups import rebuild_asset_impacts, refresh_asset_windows
+
+
+def add_asset(user, name):
+    asset = Asset(user_id=user.id, name=name, type='vehicle')
+    db.session.add(asset)
+    db.session.commit()
+    return asset
+
+
+def impact(asset_id):
+    asset = db.session.get(Asset, asset_id)
+    db.session.refresh(asset)
+    return asset.carbon_impact, asset.carbon_impact_30d, asset.carbon_impact_mtd
+
+
+def test_asset_impact_follows_emission_writes(client, user, add_emission):
+    truck = add_asset(user, 'Truck')
+    now = datetime.utcnow()
+
+    refresh_asset_windows(user.id)  # the daily job: windows now current for today
+    db.session.commit()
+    recent = add_emission(user.id, 10.0, now, asset_id=truck.id, source=truck.name)
+    add_emission(user.id, 5.0, now - timedelta(days=200), asset_id=truck.id, source=truck.name)
+    db.session.commit()
+
+    assert impact(truck.id) == (15.0, 10.0, 10.0)
+
+    recent.amount = 4.0
+    db.session.commit()
+    assert impact(truck.id) == (9.0, 4.0, 4.0)
+
+    db.session.delete(recent)
+    db.session.commit()
+    assert impact(truck.id) == (5.0, 0.0, 0.0)
+
+
+def test_asset_emissions_recorded_with_a_plain_date(app, user):
+    truck = add_asset(user, 'Truck')
+    refresh_asset_windows(user.id)
+    db.session.commit()
+
+    # record_emission defaults to datetime.now().date(), not a datetime
+    EmissionService.record_emission(user.id, {
+        'original_value': 5, 'emission_type': 'transport', 'unit': 'kg', 'asset_id': truck.id,
+    })
+    EmissionService.record_emission(user.id, {
+        'original_value': 2, 'emission_type': 'transport', 'unit': 'kg', 'asset_id': truck.id,
+        'date': (datetime.utcnow() - timedelta(days=90)).date(),
+    })
+
+    assert impact(truck.id) == (7.0, 5.0, 5.0)
+
+
+def test_stale_windows_are_computed_on_read_without_writing(client, user, add_emission, count_queries):
+    truck = add_asset(user, 'Truck')
+    add_emission(user.id, 7.0, datetime.utcnow(), asset_id=truck.id, source=truck.name)
+    db.session.commit()
+    # Windows computed on an earlier day don't receive deltas until refreshed
+    truck.impact_window_day = datetime.utcnow().date() - timedelta(days=1)
+    truck.carbon_impact_30d = 99.0
+    db.session.commit()
+
+    with count_queries() as statements:
+        data = client.get(f'/api/assets/{truck.user_id}').get_json()['assets']
+
+    assert data[0]['carbon_impact'] == 7.0
+    assert data[0]['carbon_impact_30d'] == 7.0
+    assert not [s for s in statements if s.lstrip().upper().startswith('UPDATE')]
+    assert impact(truck.id)[1] == 99.0
+
+
+def test_carbon_impact_is_not_client_settable(client, user):
+    response = client.post('/api/assets', json={
+        'user_id': user.id, 'name': 'Van', 'type': 'vehicle', 'carbon_impact': 500
+    })
+
+    assert response.get_json()['asset']['carbon_impact'] == 0.0
+
+
+def test_top_emitters_and_rebuild(client, user, add_emission, count_queries):
+    assets = [add_asset(user, f'Asset {n}') for n in range(7)]
+    for n, asset in enumerate(assets):
+        add_emission(user.id, float(n + 1), datetime.utcnow() - timedelta(days=n),
+                     asset_id=asset.id, source=asset.name)
+    db.session.commit()
+    user_id = user.id
+
+    # Drift the stored values, then rebuild from the emissions
+    Asset.query.update({Asset.carbon_impact: 0.0})
+    db.session.commit()
+    assert rebuild_asset_impacts(user_id) == 7
+
+    with count_queries() as statements:
+        data = client.get(f'/api/dashboard/top-emitters/{user_id}').get_json()
+
+    # Data version lookup + one indexed read of the assets
+    assert len(statements) == 2
+    assert 'GROUP BY' not in statements[1]
+    assert [row['value'] for row in data] == [7.0, 6.0, 5.0, 4.0, 3.0]
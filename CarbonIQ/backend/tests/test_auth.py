@@ -0,0 +1,28 @@
+def test_signup_then_login_returns_a_working_token(client, count_queries):
+    response = client.post('/signup', json={'email': 'new@example.com', 'password': 'password123'})
+    assert response.status_code == 201
+    assert response.get_json()['user']['email'] == 'new@example.com'
+
+    login = client.post('/login', json={'email': 'new@example.com', 'password': 'password123'})
+    assert login.status_code == 200
+    token = login.get_json()['token']
+
+    with count_queries() as statements:
+        verified = client.get('/verify', headers={'Authorization': f'Bearer {token}'})
+    assert verified.status_code == 200
+    assert len(statements) == 1
+
+
+def test_login_rejects_bad_credentials(client, user):
+    assert client.post('/login', json={'email': 'test@example.com', 'password': 'wrong'}).status_code == 401
+    assert client.post('/login', json={'email': 'nobody@example.com', 'password': 'x'}).status_code == 401
+
+
+def test_signup_rejects_duplicate_email(client, user):
+    response = client.post('/signup', json={'email': 'test@example.com', 'password': 'password123'})
+    assert response.status_code == 409
+
+
+def test_verify_requires_a_token(client):
+    assert client.get('/verify').status_code == 401
+    assert client.get('/verify', headers={'Authorization': 'Bearer not-a-token'}).status_code == 401
@@ -0,0 +1,158 @@
+import time
+from fnmatch import fnmatch
+
+from models import db, Activity, Asset, Goal
+from data_versions import get_data_version
+from utils.cache import MemoryBackend, RedisBackend, ResponseCache, response_cache
+
+
+class FakeRedis:
+    """Local stand-in for a Redis server: bytes values, SET EX expiry"""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        value, expires_at = self.store.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.store[key]
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        expires_at = time.monotonic() + ex if ex else None
+        self.store[key] = (value.encode('utf-8'), expires_at)
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+    def scan_iter(self, pattern):
+        return [key for key in list(self.store) if fnmatch(key, pattern)]
+
+
+class BrokenBackend:
+    def get(self, key):
+        raise ConnectionError('cache down')
+
+    def set(self, key, value, ttl):
+        raise ConnectionError('cache down')
+
+
+def test_repeat_requests_are_served_from_cache(client, user, add_emission, count_queries):
+    add_emission(user.id, 5.0)
+    db.session.commit()
+    user_id = user.id
+
+    first = client.get(f'/api/dashboard/stats/{user_id}')
+    with count_queries() as statements:
+        second = client.get(f'/api/dashboard/stats/{user_id}')
+
+    assert second.get_json() == first.get_json()
+    # Only the data version lookup
+    assert len(statements) == 1
+    stats = response_cache.stats()['endpoints']['dashboard_stats']
+    assert stats == {'hits': 1, 'misses': 1, 'errors': 0}
+
+
+def test_query_params_are_part_of_the_key(client, user):
+    user_id = user.id
+    client.get(f'/api/dashboard/emissions-trend/{user_id}?days=7')
+    client.get(f'/api/dashboard/emissions-trend/{user_id}?days=30')
+
+    assert response_cache.stats()['endpoints']['emissions_trend']['misses'] == 2
+
+
+def test_writes_invalidate_the_users_entries(client, user, add_emission):
+    add_emission(user.id, 5.0)
+    db.session.commit()
+    user_id = user.id
+    assert client.get(f'/api/dashboard/stats/{user_id}').get_json()['totalEmission'] == 5.0
+
+    add_emission(user_id, 2.5)
+    db.session.commit()
+
+    assert client.get(f'/api/dashboard/stats/{user_id}').get_json()['totalEmission'] == 7.5
+
+
+def test_every_tracked_write_bumps_the_version(app, user):
+    user_id = user.id
+    versions = [get_data_version(user_id)]
+
+    db.session.add(Activity(user_id=user_id, title='Bike', amount=1.0))
+    db.session.commit()
+    versions.append(get_data_version(user_id))
+
+    asset = Asset(user_id=user_id, name='Truck', type='vehicle')
+    db.session.add(asset)
+    db.session.commit()
+    versions.append(get_data_version(user_id))
+
+    goal = Goal(user_id=user_id, title='Cut 10%', target_reduction_percentage=10)
+    db.session.add(goal)
+    db.session.commit()
+    versions.append(get_data_version(user_id))
+
+    goal.status = 'completed'
+    db.session.commit()
+    versions.append(get_data_version(user_id))
+
+    db.session.delete(asset)
+    db.session.commit()
+    versions.append(get_data_version(user_id))
+
+    assert versions == sorted(set(versions))
+
+    # A rolled-back write leaves the version alone
+    db.session.add(Activity(user_id=user_id, title='Walk', amount=1.0))
+    db.session.flush()
+    db.session.rollback()
+    assert get_data_version(user_id) == versions[-1]
+
+
+def test_memory_backend_ttl_and_lru():
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', '1', ttl=60)
+    backend.set('b', '2', ttl=60)
+    backend.get('a')               # a is now most recently used
+    backend.set('c', '3', ttl=60)  # evicts b
+
+    assert backend.get('a') == '1'
+    assert backend.get('b') is None
+    assert backend.get('c') == '3'
+
+    backend.set('d', '4', ttl=0)
+    assert backend.get('d') is None
+
+
+def test_redis_backend_round_trip():
+    server = FakeRedis()
+    cache = ResponseCache(RedisBackend(server), ttl=30)
+
+    assert cache.get('stats', 'k') is None
+    cache.set('stats', 'k', '{"ok": true}')
+
+    assert cache.get('stats', 'k') == '{"ok": true}'
+    assert list(server.store) == ['carboniq:k']
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+    cache.clear()
+    assert server.store == {}
+
+
+def test_cache_failures_fall_through_to_the_view(client, user, monkeypatch):
+    monkeypatch.setattr(response_cache, 'backend', BrokenBackend())
+
+    response = client.get(f'/api/dashboard/stats/{user.id}')
+
+    assert response.status_code == 200
+    assert response_cache.stats()['errors'] == 2
+
+
+def test_cache_stats_endpoint(client, user):
+    client.get(f'/api/dashboard/top-emitters/{user.id}')
+
+    data = client.get('/health/cache').get_json()
+
+    assert data['backend'] == 'MemoryBackend'
+    assert data['misses'] == 1
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from utils.carbon_calculator import CarbonCalculator, EMISSION_FACTORS, EmissionBatch
+
+SINGLE = {
+    'transport': CarbonCalculator.calculate_transport_emission,
+    'energy': CarbonCalculator.calculate_energy_emission,
+    'food': CarbonCalculator.calculate_food_emission,
+    'waste': CarbonCalculator.calculate_waste_emission,
+}
+
+
+@pytest.mark.parametrize('category', sorted(SINGLE))
+def test_batch_matches_single_value_calculations(category):
+    types = list(EMISSION_FACTORS[category]) + ['unknown_type']
+    values = [1.5 * (n + 1) for n in range(len(types))]
+
+    batch = CarbonCalculator.calculate_batch(category, types, values)
+
+    for i, (type_name, value) in enumerate(zip(types, values)):
+        expected = SINGLE[category](value, type_name)
+        assert batch[i] == expected
+
+
+def test_one_type_for_every_value():
+    batch = CarbonCalculator.calculate_batch('transport', 'bus', np.arange(1000))
+
+    assert len(batch) == 1000
+    assert batch.factors.tolist() == [0.089] * 1000
+    assert batch.amounts[10] == round(10 * 0.089, 2)
+
+
+def test_custom_categories_use_the_given_factors():
+    batch = CarbonCalculator.calculate_batch('other', None, [2, 4], custom_factors=[1.5, 0.25])
+
+    assert batch.amounts.tolist() == [3.0, 1.0]
+    assert batch[0] == CarbonCalculator.calculate_custom_emission(2.0, 1.5)
+    assert CarbonCalculator.calculate_batch('other', None, [3]).amounts.tolist() == [3.0]
+
+
+def test_calculation_strings_are_built_on_demand(monkeypatch):
+    calls = []
+    original = EmissionBatch.calculation
+    monkeypatch.setattr(EmissionBatch, 'calculation', lambda self, i: calls.append(i) or original(self, i))
+
+    batch = CarbonCalculator.calculate_batch('food', ['beef', 'rice'], [1, 2])
+    assert calls == []
+
+    assert batch.calculations == ['1.0 kg × 27.0 kg CO₂/kg', '2.0 kg × 2.7 kg CO₂/kg']
+    assert calls == [0, 1]
+
+
+def test_mismatched_lengths_are_rejected():
+    with pytest.raises(ValueError):
+        CarbonCalculator.calculate_batch('food', ['beef'], [1, 2])
+
+
+def test_empty_batch():
+    assert len(CarbonCalculator.calculate_batch('energy', [], [])) == 0
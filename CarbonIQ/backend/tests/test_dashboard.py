@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+from models import db, Activity, Asset, Goal
+from utils.periods import month_window, previous_month
+
+
+def test_dashboard_stats_totals(client, user, add_emission):
+    now = datetime.utcnow()
+    this_month_start, _ = month_window(now.year, now.month)
+    last_month_start, _ = month_window(*previous_month(now.year, now.month))
+
+    add_emission(user.id, 10.0, this_month_start + timedelta(hours=1))
+    add_emission(user.id, 5.0, this_month_start + timedelta(hours=2))
+    add_emission(user.id, 20.0, last_month_start + timedelta(days=3))
+    add_emission(user.id, 100.0, last_month_start - timedelta(days=40))
+    db.session.add(Asset(user_id=user.id, name='Truck', type='vehicle'))
+    db.session.add(Goal(user_id=user.id, title='Cut 10%', target_reduction_percentage=10, status='active'))
+    db.session.add(Goal(user_id=user.id, title='Old', target_reduction_percentage=5, status='completed'))
+    db.session.commit()
+
+    response = client.get(f'/api/dashboard/stats/{user.id}')
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data['totalEmission'] == 135.0
+    assert data['thisMonth'] == 15.0
+    assert data['activitiesLogged'] == 1
+    assert data['activeGoals'] == 1
+    assert data['monthly_change'] == -25.0
+    assert [e['amount'] for e in data['recent_activities']] == [5.0, 10.0, 20.0, 100.0]
+
+
+def test_dashboard_stats_statement_count(client, user, add_emission, count_queries):
+    for day in range(40):
+        add_emission(user.id, 1.0, datetime.utcnow() - timedelta(days=day))
+    db.session.commit()
+    user_id = user.id
+
+    with count_queries() as statements:
+        response = client.get(f'/api/dashboard/stats/{user_id}')
+
+    assert response.status_code == 200
+    # Data version lookup, one aggregate query for the card numbers, one for the recent list
+    assert len(statements) == 3
+
+
+def test_dashboard_stats_without_data(client, user):
+    data = client.get(f'/api/dashboard/stats/{user.id}').get_json()
+
+    assert data['totalEmission'] == 0
+    assert data['thisMonth'] == 0
+    assert data['recent_activities'] == []
+
+
+def test_emissions_trend_reads_daily_rollup(client, user, add_emission, count_queries):
+    now = datetime.utcnow().replace(hour=12)
+    add_emission(user.id, 2.0, now - timedelta(days=1))
+    add_emission(user.id, 3.0, now - timedelta(days=1, hours=2))
+    add_emission(user.id, 4.0, now - timedelta(days=3))
+    add_emission(user.id, 50.0, now - timedelta(days=400))
+    db.session.commit()
+    user_id = user.id
+
+    with count_queries() as statements:
+        data = client.get(f'/api/dashboard/emissions-trend/{user_id}?days=7').get_json()
+
+    assert len(statements) == 2
+    assert 'daily_summaries' in statements[1]
+    assert [row['value'] for row in data] == [4.0, 5.0]
+    assert data[1]['date'] == str((now - timedelta(days=1)).date())
+
+    # Windows longer than a year are capped
+    data = client.get(f'/api/dashboard/emissions-trend/{user_id}?days=5000').get_json()
+    assert sum(row['value'] for row in data) == 9.0
+
+
+def test_recent_activities_merge_in_one_query(client, user, add_emission, count_queries):
+    start = datetime(2025, 1, 1)
+    for hour in range(6):
+        add_emission(user.id, float(hour), start + timedelta(hours=hour))
+        db.session.add(Activity(user_id=user.id, title=f'Walk {hour}', amount=float(hour),
+                                date=start + timedelta(hours=hour, minutes=30 if hour % 2 else 0)))
+    db.session.commit()
+    user_id = user.id
+
+    seen, cursor = [], None
+    with count_queries() as statements:
+        data = client.get(f'/api/dashboard/recent-activities/{user_id}?limit=5').get_json()
+    assert len(statements) == 2
+    assert 'UNION ALL' in statements[1]
+
+    while True:
+        seen.extend((row['type'], row['id'], row['timestamp']) for row in data['activities'])
+        cursor = data['pagination']['next_cursor']
+        if not cursor:
+            break
+        data = client.get(f'/api/dashboard/recent-activities/{user_id}?limit=5&cursor={cursor}').get_json()
+
+    # Every row exactly once, newest first, with same-timestamp ties kept stable
+    assert len(seen) == 12
+    assert len(set(seen)) == 12
+    assert [ts for _, _, ts in seen] == sorted((ts for _, _, ts in seen), reverse=True)
+    assert seen[-2:] == [('emission', 1, '2025-01-01T00:00:00'), ('activity', 1, '2025-01-01T00:00:00')]
@@ -0,0 +1,273 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import exports
+import ingest
+from routes import emission_routes
+from ingest import ImportCheckpoint, import_records
+from models import db, Emission, MonthlySummary, User
+from data_versions import get_data_version
+from rollups import check_monthly_summaries
+from utils.carbon_calculator import CarbonCalculator
+
+
+@pytest.fixture
+def add_emissions(add_emission):
+    """add_emissions(user, count, start): daily meter readings cycling through three types"""
+    def add(user, count, start=datetime(2023, 1, 1)):
+        types = ('transport', 'electricity', 'food')
+        for n in range(count):
+            add_emission(user.id, n * 0.5, start + timedelta(days=n), emission_type=types[n % 3],
+                         activity=f'Reading {n}', source='Meter', original_value=n)
+        db.session.commit()
+
+    return add
+
+
+def test_emission_history_is_paged_newest_first(client, user, add_emissions):
+    add_emissions(user, 12)
+    user_id = user.id
+
+    first = client.get(f'/api/emissions/user/{user_id}?limit=5&total=true').get_json()
+    assert [e['amount'] for e in first['emissions']] == [n * 0.5 for n in range(11, 6, -1)]
+    assert first['pagination']['total'] == 12
+
+    seen, cursor = [], None
+    while True:
+        query = f'&cursor={cursor}' if cursor else ''
+        page = client.get(f'/api/emissions/user/{user_id}?limit=5{query}').get_json()
+        seen += [e['id'] for e in page['emissions']]
+        cursor = page['pagination']['next_cursor']
+        if not page['pagination']['has_more']:
+            break
+    assert len(seen) == len(set(seen)) == 12
+
+    assert client.get('/api/emissions/user/999').status_code == 404
+    assert client.get(f'/api/emissions/user/{user_id}?cursor=bogus').status_code == 400
+
+
+def test_csv_export_contains_full_history_oldest_first(client, user, add_emissions):
+    add_emissions(user, 10)
+
+    response = client.get(f'/api/emissions/export/{user.id}')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 10
+    assert rows[0]['date'] == '2023-01-01T00:00:00'
+    assert rows[-1]['activity'] == 'Reading 9'
+    assert float(rows[3]['amount']) == 1.5
+
+
+def test_ndjson_export_filters_by_date_range_and_type(client, user, add_emissions):
+    add_emissions(user, 30)
+
+    response = client.get(
+        f'/api/emissions/export/{user.id}?format=ndjson&start=2023-01-05&end=2023-01-20&type=electricity,food'
+    )
+
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert {row['emission_type'] for row in rows} == {'electricity', 'food'}
+    # End date is inclusive: 2023-01-05 .. 2023-01-20 is 16 days, 11 of them electricity or food
+    assert rows[0]['date'][:10] == '2023-01-05'
+    assert rows[-1]['date'][:10] == '2023-01-20'
+    assert len(rows) == 11
+
+
+def test_export_is_written_in_batches(client, user, add_emissions, monkeypatch):
+    monkeypatch.setattr(exports, 'EXPORT_BATCH_SIZE', 4)
+    add_emissions(user, 10)
+
+    response = client.get(f'/api/emissions/export/{user.id}', buffered=False)
+
+    assert response.is_streamed
+    chunks = list(response.response)
+    # Header, then 4 + 4 + 2 rows
+    assert len(chunks) == 4
+    assert chunks[-1].count(b'\n') == 2
+    response.close()
+
+
+def test_export_rejects_bad_filters(client, user):
+    assert client.get(f'/api/emissions/export/{user.id}?format=xml').status_code == 400
+    assert client.get(f'/api/emissions/export/{user.id}?start=yesterday').status_code == 400
+    assert client.get('/api/emissions/export/999').status_code == 404
+
+
+HISTORY_CSV = (
+    'Date,Category,Type,Quantity,Unit\n'
+    '2022-01-03,travel,Car Petrol,100,km\n'
+    '2022-01-04,electricity,grid electricity,50,kWh\n'
+    '2022-02-01,food,beef,lots,kg\n'
+    '2022-02-02,transport,bus,10,km\n'
+)
+
+
+def test_csv_import_maps_columns_and_rebuilds_rollups(client, user):
+    user_id = user.id
+    version = get_data_version(user_id)
+
+    response = client.post(
+        f'/api/emissions/import?user_id={user_id}',
+        data={'file': (io.BytesIO(HISTORY_CSV.encode()), 'history.csv')},
+        content_type='multipart/form-data',
+    )
+
+    report = response.get_json()
+    assert response.status_code == 207
+    assert (report['processed'], report['inserted'], report['failed']) == (4, 3, 1)
+    assert report['errors'][0]['index'] == 2
+
+    car = Emission.query.filter_by(user_id=user_id, emission_type='transport', original_value=100).one()
+    assert car.amount == CarbonCalculator.calculate_transport_emission(100, 'car_petrol')['amount']
+    assert car.unit == 'km'
+    grid = Emission.query.filter_by(emission_type='electricity').one()
+    assert grid.amount == CarbonCalculator.calculate_energy_emission(50, 'electricity_grid')['amount']
+    assert check_monthly_summaries(user_id) == []
+    assert get_data_version(user_id) > version
+
+
+def test_a_category_reaches_one_rollup_bucket_with_or_without_a_type(client, user):
+    body = (
+        'date,category,type,source,value,emission_factor,amount\n'
+        '2022-03-01,Electricity,grid electricity,Grid,100,,\n'
+        '2022-03-02,electricity,,Meter,10,0.5,\n'
+        '2022-03-03,Power,,Generator,2,,7\n'
+        '2022-03-04,travel,bus,Bus,10,,\n'
+        '2022-03-05,Travel,,Taxi,4,1.5,\n'
+    )
+    user_id = user.id
+
+    response = client.post(f'/api/emissions/import?user_id={user_id}', data=body, content_type='text/csv')
+
+    assert response.status_code == 201
+    summary = MonthlySummary.query.filter_by(user_id=user_id, year=2022, month=3).one()
+    grid = CarbonCalculator.calculate_energy_emission(100, 'electricity_grid')['amount']
+    bus = CarbonCalculator.calculate_transport_emission(10, 'bus')['amount']
+    assert summary.electricity_emissions == pytest.approx(grid + 5.0 + 7.0)
+    assert summary.transport_emissions == pytest.approx(bus + 6.0)
+    assert summary.other_emissions == 0
+
+
+def test_ndjson_import_reads_the_raw_body(client, user):
+    body = '\n'.join(json.dumps({'category': 'transport', 'type': 'bus', 'value': n, 'date': '2022-05-01'})
+                     for n in range(1, 6))
+
+    response = client.post(f'/api/emissions/import?user_id={user.id}', data=body,
+                           content_type='application/x-ndjson')
+
+    assert response.status_code == 201
+    assert response.get_json()['inserted'] == 5
+
+
+def test_failed_http_import_reports_where_to_resume(client, user, monkeypatch):
+    body = '\n'.join(json.dumps({'category': 'transport', 'type': 'bus', 'value': n, 'date': '2022-05-01'})
+                     for n in range(1, 6))
+    user_id = user.id
+    monkeypatch.setattr(ingest, 'IMPORT_CHUNK_SIZE', 2)
+    read_records = emission_routes.iter_file_records
+
+    def dropped_after_three(lines, file_format):
+        for n, record in enumerate(read_records(lines, file_format)):
+            if n == 3:
+                raise ConnectionError('client went away')
+            yield record
+    monkeypatch.setattr(emission_routes, 'iter_file_records', dropped_after_three)
+
+    response = client.post(f'/api/emissions/import?user_id={user_id}', data=body,
+                           content_type='application/x-ndjson')
+
+    report = response.get_json()
+    assert response.status_code == 500
+    assert (report['processed'], report['inserted'], report['skip']) == (2, 2, 2)
+    assert report['error'] == 'client went away'
+
+    monkeypatch.setattr(emission_routes, 'iter_file_records', read_records)
+    response = client.post(f'/api/emissions/import?user_id={user_id}&skip={report["skip"]}', data=body,
+                           content_type='application/x-ndjson')
+
+    assert response.status_code == 201
+    assert response.get_json()['inserted'] == 3
+    assert sorted(e.original_value for e in Emission.query.filter_by(user_id=user_id)) == [1, 2, 3, 4, 5]
+
+
+def test_interrupted_import_resumes_from_its_checkpoint(app, user, tmp_path):
+    user_id = user.id
+    checkpoint = ImportCheckpoint(str(tmp_path / 'history.checkpoint'))
+    records = [{'category': 'transport', 'type': 'bus', 'value': n + 1, 'date': '2022-06-01'} for n in range(10)]
+
+    def failing_after(count):
+        for record in records[:count]:
+            yield record
+        raise OSError('connection lost')
+
+    with pytest.raises(OSError):
+        import_records(failing_after(7), user_id=user_id, chunk_size=3, checkpoint=checkpoint)
+    # Two whole chunks were committed before the failure, with their summaries
+    assert checkpoint.load()['rows'] == 6
+    assert Emission.query.count() == 6
+    assert check_monthly_summaries(user_id) == []
+    assert MonthlySummary.query.filter_by(user_id=user_id).count() == 1
+
+    report = import_records(records, user_id=user_id, chunk_size=3, checkpoint=checkpoint)
+
+    assert report['inserted'] == 10
+    assert Emission.query.count() == 10
+    assert checkpoint.load() is None
+    assert check_monthly_summaries(user_id) == []
+
+
+def test_undecodable_and_malformed_lines_fail_on_their_own(client, user):
+    user_id = user.id
+    body = (
+        HISTORY_CSV.encode()
+        + b'2022-02-03,transport,bus,\xff\xfe,km\n'
+        + b'2022-02-04,transport,bus,"12,km\n'
+    )
+
+    response = client.post(
+        f'/api/emissions/import?user_id={user_id}',
+        data={'file': (io.BytesIO(body), 'history.csv')},
+        content_type='multipart/form-data',
+    )
+
+    report = response.get_json()
+    assert response.status_code == 207
+    assert report['inserted'] == 3
+    assert [error['index'] for error in report['errors']] == [2, 4, 5]
+    assert report['errors'][1]['error'] == 'Invalid text: not UTF-8'
+    assert check_monthly_summaries(user_id) == []
+
+
+def test_an_export_imports_back_unchanged(client, user, add_emission, add_emissions):
+    add_emissions(user, 12)
+    add_emission(user.id, 9.5, datetime(2023, 2, 1), emission_type='machine', activity='Generator',
+                 source='Site', original_value=4, unit='hours', emission_factor=0.0)
+    other = User(name='Other', email='other@example.com', password_hash='x')
+    db.session.add(other)
+    db.session.commit()
+    user_id, other_id = user.id, other.id
+
+    for export_format in ('csv', 'ndjson'):
+        exported = client.get(f'/api/emissions/export/{user_id}?format={export_format}').get_data()
+        response = client.post(
+            f'/api/emissions/import?user_id={other_id}',
+            data={'file': (io.BytesIO(exported), f'history.{export_format}')},
+            content_type='multipart/form-data',
+        )
+        assert response.status_code == 201, response.get_json()
+
+    def history(owner_id):
+        return sorted(
+            (e.date, e.emission_type, e.activity, e.original_value, e.amount)
+            for e in Emission.query.filter_by(user_id=owner_id)
+        )
+    assert history(other_id) == sorted(history(user_id) * 2)
+    assert check_monthly_summaries(other_id) == []
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from models import db, Activity, Asset, Emission, Goal
+
+
+def test_matching_etag_returns_304_before_any_aggregate(client, user, count_queries):
+    user_id = user.id
+    first = client.get(f'/api/dashboard/stats/{user_id}')
+    etag = first.headers['ETag']
+
+    with count_queries() as statements:
+        second = client.get(f'/api/dashboard/stats/{user_id}', headers={'If-None-Match': etag})
+
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+    assert second.get_data() == b''
+    # Only the data version lookup
+    assert len(statements) == 1
+
+
+def test_writes_change_the_etag(client, user):
+    user_id = user.id
+    etag = client.get(f'/api/goals/{user_id}').headers['ETag']
+
+    db.session.add(Goal(user_id=user_id, title='Cut 10%', target_reduction_percentage=10))
+    db.session.commit()
+
+    response = client.get(f'/api/goals/{user_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(response.get_json()['goals']) == 1
+
+
+def test_etag_depends_on_endpoint_and_params(client, user):
+    user_id = user.id
+    trend_7 = client.get(f'/api/dashboard/emissions-trend/{user_id}?days=7').headers['ETag']
+    trend_30 = client.get(f'/api/dashboard/emissions-trend/{user_id}?days=30').headers['ETag']
+    activities = client.get(f'/api/activities/{user_id}').headers['ETag']
+
+    assert len({trend_7, trend_30, activities}) == 3
+    response = client.get(f'/api/dashboard/emissions-trend/{user_id}?days=30',
+                          headers={'If-None-Match': trend_7})
+    assert response.status_code == 200
+
+
+def test_all_four_blueprints_answer_conditionally(client, user):
+    asset = Asset(user_id=user.id, name='Truck', type='vehicle')
+    db.session.add_all([asset, Activity(user_id=user.id, title='Bike', amount=1.0)])
+    db.session.flush()
+    db.session.add(Emission(asset_id=asset.id, user_id=user.id, emission_type='food', source='Lunch',
+                            original_value=1.0, amount=1.0, date=datetime.utcnow()))
+    db.session.commit()
+    user_id = user.id
+
+    for url in (f'/api/dashboard/top-emitters/{user_id}', f'/api/goals/stats/{user_id}',
+                f'/api/activities/stats/{user_id}', f'/api/assets/{user_id}'):
+        first = client.get(url)
+        assert first.status_code == 200, url
+        etag = first.headers['ETag']
+        again = client.get(url, headers={'If-None-Match': etag})
+        assert again.status_code == 304, url
+
+
+def test_unknown_users_and_writes_are_not_tagged(client, user):
+    assert 'ETag' not in client.get('/api/goals/9999').headers
+    response = client.post('/api/goals', json={
+        'user_id': user.id, 'title': 'New', 'target_reduction_percentage': 5
+    })
+    assert response.status_code == 201
+    assert 'ETag' not in response.headers
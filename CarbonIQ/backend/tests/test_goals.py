@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from models import db, Emission, Goal
+
+
+def add_daily_emissions(user, start, days, amount):
+    for day in range(days):
+        db.session.add(Emission(
+            user_id=user.id,
+            emission_type='transport',
+            source='Car',
+            original_value=amount,
+            amount=amount,
+            date=start + timedelta(days=day, hours=12)
+        ))
+
+
+def test_goal_progress_matches_raw_emissions(client, user):
+    goal_start = (datetime.utcnow() - timedelta(days=75)).replace(hour=0, minute=0, second=0, microsecond=0)
+    # 30 baseline days at 10 kg/day, then 75 days at 8 kg/day (a 20% reduction)
+    add_daily_emissions(user, goal_start - timedelta(days=30), 30, 10.0)
+    add_daily_emissions(user, goal_start, 75, 8.0)
+    goal = Goal(
+        user_id=user.id,
+        title='Cut 20%',
+        target_reduction_percentage=20,
+        start_date=goal_start,
+        end_date=goal_start + timedelta(days=150),
+        status='active'
+    )
+    db.session.add(goal)
+    db.session.commit()
+
+    data = client.get(f'/api/goals/detail/{goal.id}').get_json()
+
+    assert data['baseline_daily_avg'] == 10.0
+    assert data['current_daily_avg'] == 8.0
+    assert data['actual_reduction'] == 20.0
+    assert data['current_progress'] == 100.0
+    assert data['on_track'] is True
+
+
+def test_goal_without_baseline(client, user):
+    goal = Goal(user_id=user.id, title='New', target_reduction_percentage=10, status='active')
+    db.session.add(goal)
+    db.session.commit()
+
+    data = client.get(f'/api/goals/detail/{goal.id}').get_json()
+
+    assert data['baseline_daily_avg'] == 0
+    assert data['current_progress'] == 0
+
+
+def test_goal_endpoints_use_constant_queries(client, user, count_queries):
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    add_daily_emissions(user, today - timedelta(days=120), 120, 5.0)
+    for n in range(20):
+        db.session.add(Goal(
+            user_id=user.id,
+            title=f'Goal {n}',
+            target_reduction_percentage=10,
+            start_date=today - timedelta(days=5 * n),
+            status='active'
+        ))
+    db.session.commit()
+    user_id = user.id
+
+    with count_queries() as goal_statements:
+        goals = client.get(f'/api/goals/{user_id}').get_json()['goals']
+    with count_queries() as stats_statements:
+        stats = client.get(f'/api/goals/stats/{user_id}').get_json()
+
+    # User lookup (may hit the identity map), goals, one per-day emission series
+    assert len(goals) == 20
+    assert len(goal_statements) <= 3
+    assert len(stats_statements) <= 3
+    assert stats['active_goals'] == 20
+
+    # Batched results agree with the single-goal path
+    single = client.get(f"/api/goals/detail/{goals[-1]['id']}").get_json()
+    assert single == goals[-1]
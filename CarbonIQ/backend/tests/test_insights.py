@@ -0,0 +1,121 @@
+import pytest
+
+from models import db, AIInsight
+from insights import insight_worker, generate_insight
+from utils.fake_llm import FakeLLMClient
+
+
+@pytest.fixture
+def background(monkeypatch):
+    """Run the insight worker on real threads for one test"""
+    monkeypatch.setattr(insight_worker, 'workers', 2)
+    yield insight_worker
+    insight_worker.wait()
+
+
+def test_fake_llm_is_deterministic():
+    fake = FakeLLMClient()
+    messages = [{'role': 'user', 'content': 'Top emission source: transport (5 kg)'}]
+
+    first = fake.chat.completions.create(messages=messages).choices[0].message.content
+    second = fake.chat.completions.create(messages=messages).choices[0].message.content
+
+    assert first == second
+    assert 'transport' in first
+    assert len(fake.calls) == 2
+
+
+def test_first_request_is_pending_until_the_worker_finishes(client, user, fake_llm, background):
+    fake_llm.latency = 0.2
+
+    response = client.get(f'/api/ai/insight/{user.id}')
+    assert response.status_code == 202
+    assert response.get_json()['status'] == 'pending'
+    assert response.get_json()['source'] == 'fallback'
+
+    background.wait()
+
+    response = client.get(f'/api/ai/insight/{user.id}')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ready'
+    assert response.get_json()['source'] == 'ai'
+    assert len(fake_llm.calls) == 1
+
+
+def test_ready_insight_is_served_without_calling_the_llm(client, user, fake_llm, count_queries):
+    user_id = user.id
+    client.get(f'/api/dashboard/insights/{user_id}')
+
+    with count_queries() as statements:
+        response = client.get(f'/api/dashboard/insights/{user_id}')
+
+    assert response.get_json()['status'] == 'ready'
+    assert len(fake_llm.calls) == 1
+    # Data version lookup + stored insight
+    assert len(statements) == 2
+
+
+def test_writes_regenerate_existing_insights(client, user, fake_llm):
+    client.get(f'/api/dashboard/insights/{user.id}')
+    before = AIInsight.query.filter_by(user_id=user.id, kind='dashboard').one().data_version
+
+    response = client.post('/api/activities', json={
+        'user_id': user.id, 'title': 'Drive to work', 'category': 'transport',
+        'activity_type': 'car_petrol', 'value': 12
+    })
+    assert response.status_code == 201
+
+    row = AIInsight.query.filter_by(user_id=user.id, kind='dashboard').one()
+    assert row.status == 'ready'
+    assert row.data_version > before
+    # Only insights the user has asked for are refreshed
+    assert AIInsight.query.filter_by(user_id=user.id, kind='personalized').count() == 0
+
+
+def test_failed_refresh_keeps_serving_the_previous_insight(client, user, fake_llm, add_emission, monkeypatch):
+    client.get(f'/api/ai/insight/{user.id}')
+    previous = client.get(f'/api/ai/insight/{user.id}').get_json()['insight']
+
+    def boom(**kwargs):
+        raise RuntimeError('upstream down')
+    monkeypatch.setattr(fake_llm.chat.completions, 'create', boom)
+    add_emission(user.id, 30.0)
+    db.session.commit()
+
+    payload = client.get(f'/api/ai/insight/{user.id}').get_json()
+
+    assert payload['status'] == 'refreshing'
+    assert payload['insight'] == previous
+    assert AIInsight.query.filter_by(user_id=user.id, kind='personalized').one().status == 'failed'
+
+
+def test_pending_dashboard_insight_has_no_etag(client, user, fake_llm, background):
+    fake_llm.latency = 0.2
+
+    pending = client.get(f'/api/dashboard/insights/{user.id}')
+    assert pending.status_code == 202
+    assert 'ETag' not in pending.headers
+
+    background.wait()
+    ready = client.get(f'/api/dashboard/insights/{user.id}')
+    assert ready.get_json()['status'] == 'ready'
+    assert 'ETag' in ready.headers
+
+
+def test_concurrent_requests_for_one_insight_are_folded(app, user, fake_llm, background):
+    fake_llm.latency = 0.2
+
+    assert background.submit(user.id, 'dashboard') is True
+    assert background.submit(user.id, 'dashboard') is False
+    assert background.submit(user.id, 'dashboard') is False
+    background.wait()
+
+    # The first run plus one re-run; the re-run finds the insight fresh
+    assert background.stats()['running'] == 0
+    assert len(fake_llm.calls) == 1
+
+
+def test_unknown_user_is_404(client, fake_llm):
+    assert client.get('/api/ai/insight/999').status_code == 404
+    assert client.get('/api/dashboard/insights/999').status_code == 404
+    assert generate_insight(999, 'dashboard') is None
@@ -0,0 +1,194 @@
+import threading
+
+import pytest
+
+from utils import ai_helper
+from utils.ai_helper import AIEcoCoach
+from utils.llm_guard import CircuitBreaker, LLMGuard, CircuitOpenError, LLMBusyError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def guard(monkeypatch, clock):
+    guard = LLMGuard(
+        max_concurrent=2, queue_timeout=0.05, call_timeout=3,
+        breaker=CircuitBreaker(failure_threshold=3, slow_call_seconds=5, cooldown=30, clock=clock)
+    )
+    monkeypatch.setattr(ai_helper, 'llm_guard', guard)
+    return guard
+
+
+@pytest.fixture
+def failing_llm(fake_llm, monkeypatch):
+    def boom(**kwargs):
+        fake_llm.calls.append(kwargs)
+        raise RuntimeError('upstream down')
+    monkeypatch.setattr(fake_llm.chat.completions, 'create', boom)
+    return fake_llm
+
+
+def test_breaker_opens_after_consecutive_failures_and_serves_fallback(guard, failing_llm):
+    for category in ('food', 'transport', 'energy'):
+        AIEcoCoach.get_reduction_tips(category, 10)
+    assert guard.breaker.state == CircuitBreaker.OPEN
+    assert len(failing_llm.calls) == 3
+
+    # Open: no upstream call at all, straight to the curated responses
+    tips = AIEcoCoach.get_reduction_tips('food', 20)
+    assert tips == AIEcoCoach.FALLBACK_RESPONSES['food'][:3]
+    assert len(failing_llm.calls) == 3
+    assert guard.stats()['rejected_open'] == 1
+
+
+def test_breaker_half_opens_after_cooldown(guard, clock):
+    breaker = guard.breaker
+    for _ in range(3):
+        breaker.record(error=True)
+    assert not breaker.allow()
+
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    # Only one trial at a time
+    assert not breaker.allow()
+
+    breaker.record(error=True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(duration=0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.opened == 2
+
+
+def test_slow_calls_count_as_failures(guard):
+    for _ in range(3):
+        guard.breaker.record(duration=6)
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+
+def test_calls_beyond_the_concurrency_cap_are_rejected(guard):
+    entered = threading.Barrier(3)
+    release = threading.Event()
+
+    def hold():
+        with guard.call():
+            entered.wait()
+            release.wait()
+
+    workers = [threading.Thread(target=hold) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    entered.wait()
+
+    assert guard.stats()['in_flight'] == 2
+    with pytest.raises(LLMBusyError):
+        with guard.call():
+            pass
+
+    release.set()
+    for worker in workers:
+        worker.join()
+    stats = guard.stats()
+    assert stats['in_flight'] == 0
+    assert stats['rejected_busy'] == 1
+    # Saturation says nothing about upstream health
+    assert stats['state'] == CircuitBreaker.CLOSED
+
+
+def test_deadline_is_passed_to_the_client(guard, fake_llm, monkeypatch):
+    seen = {}
+    original = fake_llm.create
+
+    def create(**kwargs):
+        seen.update(kwargs)
+        return original(**kwargs)
+    monkeypatch.setattr(fake_llm.chat.completions, 'create', create)
+
+    AIEcoCoach.chat_with_coach('Hi', [], '')
+
+    assert seen['timeout'] == 3
+
+
+def test_open_breaker_rejects_without_taking_a_slot(guard):
+    for _ in range(3):
+        guard.breaker.record(error=True)
+
+    with pytest.raises(CircuitOpenError):
+        with guard.call():
+            pass
+    assert guard.stats()['calls'] == 0
+
+
+def test_llm_stats_endpoint(client):
+    stats = client.get('/health/llm').get_json()
+
+    assert stats['state'] == 'closed'
+    assert {'waiting', 'in_flight', 'rejected_open', 'times_opened'} <= set(stats)
+
+
+def test_streams_are_judged_by_time_to_first_chunk(guard, fake_llm, monkeypatch):
+    fake_llm.reply = 'Walk short trips instead of driving them.'
+    monkeypatch.setattr(guard.breaker, 'slow_call_seconds', 0.05)
+
+    for _ in range(3):
+        reply = AIEcoCoach.stream_chat_with_coach('Hi', [], '')
+        assert next(reply)[0] == 'token'
+        # A stalled reader keeps its slot but doesn't make the call slow
+        threading.Event().wait(0.1)
+        assert guard.stats()['in_flight'] == 1
+        assert list(reply)[-1][0] == 'done'
+        assert guard.stats()['in_flight'] == 0
+
+    stats = guard.stats()
+    assert stats['slow_calls'] == 0
+    assert stats['state'] == CircuitBreaker.CLOSED
+
+
+def test_stream_errors_after_the_first_chunk_count_as_failures(guard):
+    def upstream():
+        yield 'first'
+        raise RuntimeError('connection reset')
+
+    with pytest.raises(RuntimeError):
+        with guard.stream() as stream:
+            for _ in stream.chunks(upstream()):
+                pass
+
+    stats = guard.stats()
+    assert (stats['calls'], stats['failures'], stats['in_flight']) == (1, 1, 0)
+
+
+def test_open_streams_hold_their_slots_until_closed(guard, fake_llm):
+    replies = [AIEcoCoach.stream_chat_with_coach('Hi', [], '') for _ in range(2)]
+    for reply in replies:
+        assert next(reply)[0] == 'token'
+
+    # Both slots are taken while the first two are still yielding
+    assert guard.stats()['in_flight'] == 2
+    with pytest.raises(LLMBusyError):
+        with guard.stream():
+            pass
+
+    replies[0].close()
+    assert fake_llm.streams[0].closed
+    assert guard.stats()['in_flight'] == 1
+    third = AIEcoCoach.stream_chat_with_coach('Hi', [], '')
+    assert next(third)[0] == 'token'
+
+    for reply in (replies[1], third):
+        reply.close()
+    assert guard.stats()['in_flight'] == 0
@@ -0,0 +1,57 @@
+import json
+import logging
+import queue
+
+from utils.logging_setup import InProcessQueueHandler, JSONFormatter, configure_logging
+
+
+class Expensive:
+    """Counts how often it is rendered into a log message"""
+
+    def __init__(self):
+        self.rendered = 0
+
+    def __str__(self):
+        self.rendered += 1
+        return 'payload'
+
+
+def test_debug_messages_are_not_formatted_when_gated():
+    root = logging.getLogger()
+    previous = root.level
+    root.setLevel(logging.INFO)
+    logger = logging.getLogger('routes.activity_routes')
+    payload = Expensive()
+    try:
+        logger.debug("Creating new activity: %s", payload)
+        assert payload.rendered == 0
+
+        logger.info("Creating new activity: %s", payload)
+        assert payload.rendered > 0
+    finally:
+        root.setLevel(previous)
+
+
+def test_queued_records_keep_their_traceback_for_the_writer():
+    log_queue = queue.SimpleQueue()
+    logger = logging.Logger('test.queue')
+    logger.addHandler(InProcessQueueHandler(log_queue))
+
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logger.exception("Failed for user %s", 7)
+
+    record = log_queue.get_nowait()
+    assert record.getMessage() == 'Failed for user 7'
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry['level'] == 'ERROR'
+    assert 'ValueError: boom' in entry['exc_info']
+
+
+def test_configure_logging_installs_one_queue_handler():
+    listener = configure_logging()
+
+    assert configure_logging() is listener
+    handlers = [h for h in logging.getLogger().handlers if isinstance(h, InProcessQueueHandler)]
+    assert len(handlers) == 1
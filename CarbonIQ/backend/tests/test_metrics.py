@@ -0,0 +1,76 @@
+import logging
+
+import pytest
+
+from utils.metrics import request_metrics, RequestStats
+
+
+@pytest.fixture
+def metrics(app):
+    request_metrics.reset()
+    yield request_metrics
+    request_metrics.reset()
+
+
+def sample(text, name, **labels):
+    """Value of one sample line in the Prometheus text output"""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    prefix = f'{name}{{{label_text}}} '
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    raise AssertionError(f'{prefix!r} not in metrics output')
+
+
+def test_metrics_count_requests_and_statements_per_endpoint(client, user, metrics):
+    endpoint = 'activity_bp.get_activities'
+    user_id = user.id
+    client.get(f'/api/activities/{user_id}')
+    client.get(f'/api/activities/{user_id}')
+    client.get('/api/activities/999')
+
+    text = client.get('/metrics').get_data(as_text=True)
+
+    assert '# TYPE carboniq_http_request_duration_seconds histogram' in text
+    assert sample(text, 'carboniq_http_requests_total', endpoint=endpoint, method='GET', status=200) == 2
+    assert sample(text, 'carboniq_http_requests_total', endpoint=endpoint, method='GET', status=404) == 1
+    assert sample(text, 'carboniq_http_request_duration_seconds_count', endpoint=endpoint) == 3
+    assert sample(text, 'carboniq_db_statements_per_request_bucket', endpoint=endpoint, le='+Inf') == 3
+    assert sample(text, 'carboniq_db_statements_per_request_sum', endpoint=endpoint) > 0
+    assert sample(text, 'carboniq_db_duration_seconds_total', endpoint=endpoint) > 0
+
+
+def test_server_timing_header_is_optional(client, user, metrics, monkeypatch):
+    assert 'Server-Timing' not in client.get(f'/api/goals/{user.id}').headers
+
+    monkeypatch.setattr(metrics, 'server_timing', True)
+    header = client.get(f'/api/goals/{user.id}').headers['Server-Timing']
+
+    assert header.startswith('app;dur=')
+    assert 'db;dur=' in header and 'queries' in header
+
+
+def test_slow_requests_are_logged_with_their_slowest_statement(client, user, metrics, monkeypatch, caplog):
+    monkeypatch.setattr(metrics, 'slow_request_ms', 0)
+
+    with caplog.at_level(logging.WARNING, logger='utils.metrics'):
+        client.get(f'/api/assets/{user.id}')
+
+    assert 'Slow request GET asset_bp.get_assets' in caplog.text
+    assert 'SELECT' in caplog.text
+    assert sample(client.get('/metrics').get_data(as_text=True),
+                  'carboniq_slow_requests_total', endpoint='asset_bp.get_assets') >= 1
+
+
+def test_repeated_statements_are_flagged_as_n_plus_one(metrics, caplog):
+    stats = RequestStats()
+    for _ in range(metrics.n_plus_one_threshold):
+        stats.add_statement('SELECT * FROM emissions WHERE goal_id = ?', 0.001)
+    stats.add_statement('SELECT * FROM goals WHERE user_id = ?', 0.002)
+
+    with caplog.at_level(logging.WARNING, logger='utils.metrics'):
+        metrics.record('goal_bp.get_goals', 'GET', 200, stats)
+
+    assert 'Possible N+1 in GET goal_bp.get_goals' in caplog.text
+    assert 'FROM emissions' in caplog.text
+    assert sample(metrics.render(), 'carboniq_n_plus_one_requests_total', endpoint='goal_bp.get_goals') == 1
@@ -0,0 +1,154 @@
+"""
+Query budgets: every endpoint runs against the seed.py sample data with
+the LLM stubbed out, and may not run more SQL statements than declared
+here. A budget only moves when an endpoint's query plan is deliberately
+changed; going over it usually means a per-row (N+1) query crept in.
+"""
+
+import pytest
+
+from models import db, Goal, Asset, Activity
+
+IMPORT_CSV = 'date,category,type,quantity\n2024-01-02,transport,bus,12\n2024-01-03,energy,electricity,40\n'
+
+# endpoint -> (method, path, JSON body or None, statement budget)
+# Paths are formatted with the ids returned by the `seeded` fixture
+BUDGETS = {
+    # Activities
+    'activity_bp.get_activities': ('GET', '/api/activities/{john}', None, 3),
+    'activity_bp.get_activity_stats': ('GET', '/api/activities/stats/{john}', None, 5),
+    'activity_bp.get_categories': ('GET', '/api/activities/categories', None, 0),
+    'activity_bp.create_activity': ('POST', '/api/activities', {
+        'user_id': '{john}', 'title': 'Drive', 'category': 'transport', 'activity_type': 'car_petrol', 'value': 12
+    }, 13),
+    'activity_bp.create_activities_bulk': ('POST', '/api/activities/bulk', [
+        {'user_id': '{john}', 'title': f'Trip {n}', 'category': 'transport', 'activity_type': 'bus', 'value': n + 1}
+        for n in range(20)
+    ], 12),
+    'activity_bp.update_activity': ('PUT', '/api/activities/{activity}', {'title': 'Renamed'}, 8),
+    'activity_bp.delete_activity': ('DELETE', '/api/activities/{activity}', None, 7),
+    # AI coach
+    'ai_bp.get_personalized_insight': ('GET', '/api/ai/insight/{john}', None, 10),
+    'ai_bp.chat_with_coach': ('POST', '/api/ai/chat', {'user_id': '{john}', 'message': 'How do I cut diesel use?'}, 3),
+    'ai_bp.get_reduction_tips': ('GET', '/api/ai/tips?category=transport&user_id={john}', None, 1),
+    'ai_bp.get_daily_sustainability_tip': ('GET', '/api/ai/daily-tip', None, 0),
+    'ai_bp.analyze_trend': ('GET', '/api/ai/analyze-trend/{john}', None, 3),
+    # Assets
+    'asset_bp.get_assets': ('GET', '/api/assets/{john}', None, 4),
+    'asset_bp.get_single_asset': ('GET', '/api/assets/single/{asset}', None, 1),
+    'asset_bp.create_asset': ('POST', '/api/assets', {'user_id': '{john}', 'name': 'Forklift', 'type': 'machine'}, 8),
+    'asset_bp.update_asset': ('PUT', '/api/assets/{asset}', {'name': 'Excavator X400'}, 8),
+    'asset_bp.delete_asset': ('DELETE', '/api/assets/{asset}', None, 7),
+    # Auth
+    'auth.signup': ('POST', '/signup', {'email': 'new@example.com', 'password': 'password123'}, 3),
+    'auth.login': ('POST', '/login', {'email': 'john.doe@example.com', 'password': 'password123'}, 1),
+    'auth.verify_token': ('GET', '/verify', None, 1),
+    'api.signup': ('POST', '/auth/signup', {'email': 'other@example.com', 'password': 'password123'}, 3),
+    'api.login': ('POST', '/auth/login', {'email': 'john.doe@example.com', 'password': 'password123'}, 1),
+    'api.test_db': ('GET', '/test-db', None, 1),
+    # Dashboard
+    'dashboard_bp.get_dashboard_stats': ('GET', '/api/dashboard/stats/{john}', None, 3),
+    'dashboard_bp.get_emissions_trend': ('GET', '/api/dashboard/emissions-trend/{john}', None, 2),
+    'dashboard_bp.get_top_emitters': ('GET', '/api/dashboard/top-emitters/{john}', None, 2),
+    'dashboard_bp.get_recent_activities': ('GET', '/api/dashboard/recent-activities/{john}', None, 2),
+    'dashboard_bp.get_ai_insights': ('GET', '/api/dashboard/insights/{john}', None, 9),
+    # Emissions
+    'emission_bp.get_user_emissions': ('GET', '/api/emissions/user/{john}', None, 2),
+    'emission_bp.export_emissions': ('GET', '/api/emissions/export/{john}', None, 2),
+    'emission_bp.import_emissions': ('POST', '/api/emissions/import?user_id={john}', IMPORT_CSV, 14),
+    # Goals
+    'goal_bp.get_user_goals': ('GET', '/api/goals/{john}', None, 4),
+    'goal_bp.get_goal_detail': ('GET', '/api/goals/detail/{goal}', None, 2),
+    'goal_bp.get_goal_stats': ('GET', '/api/goals/stats/{john}', None, 4),
+    'goal_bp.create_goal': ('POST', '/api/goals', {
+        'user_id': '{john}', 'title': 'Cut diesel', 'target_reduction_percentage': 15
+    }, 9),
+    'goal_bp.update_goal': ('PUT', '/api/goals/{goal}', {'target_reduction_percentage': 25}, 9),
+    'goal_bp.delete_goal': ('DELETE', '/api/goals/{goal}', None, 7),
+    # Health and metrics
+    'home': ('GET', '/', None, 0),
+    'health_check': ('GET', '/health', None, 0),
+    'cache_stats': ('GET', '/health/cache', None, 0),
+    'llm_stats': ('GET', '/health/llm', None, 0),
+    'metrics': ('GET', '/metrics', None, 0),
+}
+
+
+pytestmark = pytest.mark.usefixtures('fake_llm')
+
+
+def fill(value, ids):
+    """Substitute seeded ids into a path or body"""
+    if isinstance(value, str):
+        text = value.format(**ids)
+        return int(text) if value.startswith('{') and text.isdigit() else text
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    return value
+
+
+def call(client, method, path, body, headers=None):
+    if isinstance(body, str):
+        return client.open(path, method=method, data=body, content_type='text/csv', headers=headers)
+    return client.open(path, method=method, json=body, headers=headers)
+
+
+def test_every_endpoint_has_a_budget(app):
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules()} - {'static'}
+    assert endpoints - set(BUDGETS) == set()
+    assert set(BUDGETS) - endpoints == set()
+
+
+@pytest.mark.parametrize('endpoint', sorted(BUDGETS))
+def test_endpoint_stays_within_query_budget(client, seeded, count_queries, endpoint):
+    method, path, body, budget = BUDGETS[endpoint]
+    headers = None
+    if endpoint == 'auth.verify_token':
+        token = client.post('/login', json={'email': 'john.doe@example.com', 'password': 'password123'}).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+    path, body = fill(path, seeded), fill(body, seeded)
+    with count_queries() as statements:
+        response = call(client, method, path, body, headers)
+        # Streamed bodies run their queries while being read
+        response.get_data()
+
+    assert response.status_code < 400, response.get_data(as_text=True)
+    assert len(statements) <= budget, (
+        f'{endpoint} ran {len(statements)} statements (budget {budget}):\n' + '\n'.join(statements)
+    )
+
+
+# Listing endpoints whose statement count must not grow with the rows they return
+PER_ROW_CHECKS = (
+    'goal_bp.get_user_goals',
+    'goal_bp.get_goal_stats',
+    'asset_bp.get_assets',
+    'activity_bp.get_activities',
+    'dashboard_bp.get_top_emitters',
+    'dashboard_bp.get_recent_activities',
+)
+
+
+@pytest.mark.parametrize('endpoint', PER_ROW_CHECKS)
+def test_listing_cost_does_not_grow_with_rows(client, seeded, count_queries, endpoint):
+    method, path, body, _ = BUDGETS[endpoint]
+    path = fill(path, seeded)
+
+    def statements_for_call():
+        with count_queries() as statements:
+            assert call(client, method, path, body).status_code == 200
+        return len(statements)
+
+    before = statements_for_call()
+    john = seeded['john']
+    for n in range(10):
+        db.session.add(Goal(user_id=john, title=f'Goal {n}', target_reduction_percentage=10, status='active'))
+        db.session.add(Asset(user_id=john, name=f'Asset {n}', type='vehicle'))
+        db.session.add(Activity(user_id=john, title=f'Activity {n}', amount=n, badge='transport'))
+    db.session.commit()
+
+    # The writes bump the data version, so this is a fresh (uncached) response
+    assert statements_for_call() == before
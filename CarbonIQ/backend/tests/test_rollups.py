@@ -0,0 +1,132 @@
+from datetime import datetime
+
+from models import db, Emission, MonthlySummary, DailySummary
+from rollups import rebuild_monthly_summaries, rebuild_daily_summaries, check_monthly_summaries
+
+
+def summaries(user_id):
+    rows = MonthlySummary.query.filter_by(user_id=user_id).order_by(
+        MonthlySummary.year, MonthlySummary.month
+    ).all()
+    return {
+        (s.year, s.month): (
+            round(s.total_emissions, 6),
+            round(s.previous_month_emissions, 6),
+            round(s.percent_change, 6),
+            round(s.transport_emissions, 6),
+            round(s.electricity_emissions, 6),
+            round(s.other_emissions, 6),
+        )
+        for s in rows
+    }
+
+
+def make_emission(user, amount, date, emission_type='transport'):
+    return Emission(
+        user_id=user.id,
+        emission_type=emission_type,
+        source='Test',
+        original_value=amount,
+        amount=amount,
+        date=date
+    )
+
+
+def test_writes_apply_deltas_to_monthly_buckets(app, user):
+    first = make_emission(user, 10.0, datetime(2025, 1, 10))
+    second = make_emission(user, 4.0, datetime(2025, 2, 3), 'electricity')
+    third = make_emission(user, 6.0, datetime(2025, 2, 20), 'machine')
+    db.session.add_all([first, second, third])
+    db.session.commit()
+
+    assert summaries(user.id) == {
+        (2025, 1): (10.0, 0.0, 0.0, 10.0, 0.0, 0.0),
+        (2025, 2): (10.0, 10.0, 0.0, 0.0, 4.0, 6.0),
+    }
+
+    # Update the amount and move an emission to another month
+    first.amount = 20.0
+    third.date = datetime(2025, 1, 15)
+    db.session.commit()
+
+    assert summaries(user.id) == {
+        (2025, 1): (26.0, 0.0, 0.0, 20.0, 0.0, 6.0),
+        (2025, 2): (4.0, 26.0, round((26.0 - 4.0) / 26.0 * 100, 6), 0.0, 4.0, 0.0),
+    }
+
+    db.session.delete(second)
+    db.session.commit()
+
+    assert summaries(user.id)[(2025, 2)][0] == 0.0
+
+
+def test_incremental_buckets_match_rebuild(app, user):
+    for day in range(1, 28):
+        db.session.add(make_emission(user, day * 1.5, datetime(2025, 3, day)))
+        db.session.add(make_emission(user, day * 0.5, datetime(2025, 4, day), 'food'))
+    db.session.commit()
+    incremental = summaries(user.id)
+
+    rebuild_monthly_summaries(user.id)
+
+    assert summaries(user.id) == incremental
+
+
+def test_write_cost_does_not_grow_with_month_size(app, user, count_queries):
+    for day in range(1, 28):
+        db.session.add(make_emission(user, 1.0, datetime(2025, 5, day)))
+    db.session.commit()
+    user_id = user.id
+
+    with count_queries() as statements:
+        db.session.add(Emission(
+            user_id=user_id, emission_type='transport', source='Test',
+            original_value=1.0, amount=1.0, date=datetime(2025, 5, 28)
+        ))
+        db.session.commit()
+
+    # INSERT, monthly upsert, next-month update, percent refresh, daily upsert, data version bump
+    assert not any('GROUP BY' in s for s in statements)
+    assert len(statements) <= 6
+
+
+def test_check_reports_drift_until_rebuilt(app, user):
+    db.session.add(make_emission(user, 7.0, datetime(2025, 6, 2)))
+    db.session.add(make_emission(user, 3.0, datetime(2025, 7, 2), 'electricity'))
+    db.session.commit()
+    assert check_monthly_summaries(user.id) == []
+
+    # A bulk delete bypasses the session hooks and leaves the rollups stale
+    Emission.query.filter(Emission.amount == 7.0).delete()
+    db.session.commit()
+    drift = check_monthly_summaries(user.id)
+    assert {(m['month'], m['column']) for m in drift} >= {(6, 'total_emissions'), (7, 'previous_month_emissions')}
+
+    rebuild_monthly_summaries(user.id)
+    assert check_monthly_summaries(user.id) == []
+
+
+def daily(user_id):
+    rows = DailySummary.query.filter_by(user_id=user_id).order_by(DailySummary.day).all()
+    return {
+        str(d.day): (round(d.total_emissions, 6), round(d.transport_emissions, 6), round(d.food_emissions, 6))
+        for d in rows
+    }
+
+
+def test_daily_buckets_follow_writes_and_match_backfill(app, user):
+    morning = make_emission(user, 2.0, datetime(2025, 8, 1, 8))
+    evening = make_emission(user, 3.0, datetime(2025, 8, 1, 20), 'food')
+    db.session.add_all([morning, evening])
+    db.session.commit()
+
+    assert daily(user.id) == {'2025-08-01': (5.0, 2.0, 3.0)}
+
+    evening.date = datetime(2025, 8, 2, 9)
+    db.session.commit()
+    incremental = daily(user.id)
+
+    assert incremental == {'2025-08-01': (2.0, 2.0, 0.0), '2025-08-02': (3.0, 0.0, 3.0)}
+
+    assert rebuild_daily_summaries(user.id) == 2
+    assert daily(user.id) == incremental
@@ -0,0 +1,79 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from models import db, Emission
+from rollups import rebuild_daily_summaries
+from utils.ai_helper import analyze_emission_trend
+from utils.trends import TrendAnalysis, bin_daily, rolling_mean, linear_slope, anomaly_flags
+
+START = date(2025, 6, 1)
+
+
+def test_bin_daily_fills_gaps_and_ignores_outside_rows():
+    rows = [(START, 2.0), (START, 1.0), (START + timedelta(days=3), 4.0), (START - timedelta(days=1), 9.0)]
+
+    values = bin_daily(rows, START, 5)
+
+    assert values.tolist() == [3.0, 0.0, 0.0, 4.0, 0.0]
+
+
+def test_rolling_mean_is_trailing():
+    values = np.array([7.0] * 7 + [14.0] * 7)
+
+    means = rolling_mean(values)
+
+    assert means[0] == 7.0
+    assert means[6] == 7.0
+    assert means[10] == (3 * 7.0 + 4 * 14.0) / 7
+    assert means[-1] == 14.0
+
+
+def test_slope_and_anomalies():
+    assert linear_slope(np.arange(10, dtype=float) * 2) == 2.0
+    assert linear_slope(np.zeros(10)) == 0.0
+
+    values = np.array([1.0] * 20 + [30.0])
+    assert anomaly_flags(values).tolist() == [False] * 20 + [True]
+    assert not anomaly_flags(np.ones(5)).any()
+
+
+def test_week_over_week_uses_calendar_days_not_row_positions():
+    # Many rows last week, one row this week: row slicing would compare the wrong days
+    daily = [(START + timedelta(days=n), 0.0) for n in range(14)]
+    for n in range(7):
+        daily[n] = (daily[n][0], 10.0)
+    daily[13] = (daily[13][0], 35.0)
+
+    trend = TrendAnalysis.from_daily(daily)
+
+    assert trend.previous_week_total == 70.0
+    assert trend.recent_week_total == 35.0
+    assert trend.change_percent == -50.0
+    assert trend.direction == 'decreasing'
+    assert trend.anomaly_days() == [START + timedelta(days=13)]
+    assert 'decreased by 50.0%' in analyze_emission_trend(trend)
+
+
+def test_empty_history():
+    trend = TrendAnalysis.from_daily([(START + timedelta(days=n), 0.0) for n in range(30)])
+
+    assert trend.to_dict()['trend'] == 'stable'
+    assert analyze_emission_trend(trend) == "Keep logging your activities to track your progress!"
+
+
+def test_dashboard_trend_includes_rolling_mean_and_anomalies(client, user):
+    today = datetime.utcnow().replace(hour=9, minute=0, second=0, microsecond=0)
+    for days_ago, amount in [(10, 1.0), (9, 1.0), (8, 1.0), (1, 40.0)]:
+        db.session.add(Emission(
+            user_id=user.id, emission_type='transport', source='Car',
+            original_value=amount, amount=amount, date=today - timedelta(days=days_ago)
+        ))
+    db.session.commit()
+    rebuild_daily_summaries(user.id)
+
+    points = client.get(f'/api/dashboard/emissions-trend/{user.id}?days=30').get_json()
+
+    assert [p['value'] for p in points] == [1.0, 1.0, 1.0, 40.0]
+    assert points[2]['rolling_avg'] == round(3.0 / 7, 2)
+    assert [p['anomaly'] for p in points] == [False, False, False, True]
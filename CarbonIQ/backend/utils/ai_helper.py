@@ -4,20 +4,136 @@ Provides AI-powered sustainability coaching and insights using OpenAI API
 """
 
 import os
+import re
+import logging
+import json
+import hashlib
+import threading
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+from utils.cache import MemoryBackend, SingleFlight
+from utils.llm_guard import LLMGuard
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
-# Try to import OpenAI client
-try:
-    from openai import OpenAI
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# LLM_BACKEND=fake swaps in a deterministic offline client (see utils/fake_llm.py)
+if os.getenv('LLM_BACKEND', 'openai').lower() == 'fake':
+    from utils.fake_llm import FakeLLMClient
+    client = FakeLLMClient(latency=float(os.getenv('FAKE_LLM_LATENCY', 0)))
     openai_available = True
-except ImportError:
-    openai_available = False
-    client = None
-    print("⚠️ OpenAI library not available. AI features will use fallback responses.")
+else:
+    # Try to import OpenAI client
+    try:
+        from openai import OpenAI
+        # Deadlines come from llm_guard; keep the client's own retry budget small
+        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=int(os.getenv('LLM_MAX_RETRIES', 1)))
+        openai_available = True
+    except ImportError:
+        openai_available = False
+        client = None
+        logger.warning("⚠️ OpenAI library not available. AI features will use fallback responses.")
+
+
+MODEL = "gpt-3.5-turbo"
+
+# Concurrency cap, per-call deadline and circuit breaker for every upstream call
+llm_guard = LLMGuard.from_env()
+
+# Tips are generated per emission bucket, not per exact amount, so users
+# whose 30-day total lands in the same bucket share one cached answer
+TIP_BUCKETS = [0, 10, 50, 100, 250, 500, 1000]
+
+
+def emission_bucket(amount):
+    """
+    Get the bucket label for a 30-day emission amount (e.g. '50-100 kg')
+
+    Returns:
+        str
+    """
+    amount = amount or 0
+    if amount <= 0:
+        return 'none'
+    for low, high in zip(TIP_BUCKETS, TIP_BUCKETS[1:]):
+        if amount < high:
+            return f"{low}-{high} kg"
+    return f"{TIP_BUCKETS[-1]}+ kg"
+
+
+class PromptCache:
+    """
+    Completions keyed by a fingerprint of the normalized request, with TTL
+    and LRU eviction; identical requests already in flight are coalesced
+    into one upstream call
+    """
+
+    def __init__(self, ttl=3600, max_entries=512, backend=None):
+        self.ttl = ttl
+        self.backend = backend or MemoryBackend(max_entries)
+        self.flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(messages, max_tokens, temperature, model=MODEL):
+        """Hash the request with whitespace-insensitive message contents"""
+        normalized = {
+            'model': model,
+            'max_tokens': max_tokens,
+            'temperature': temperature,
+            'messages': [
+                [m.get('role', 'user'), re.sub(r'\s+', ' ', m.get('content', '') or '').strip()]
+                for m in messages
+            ],
+        }
+        payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_or_create(self, key, create):
+        """
+        Get the cached completion for `key`, or run `create()` once for all
+        concurrent callers and cache its result
+        """
+        cached = self.backend.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        with self._lock:
+            self.misses += 1
+
+        def run():
+            text = create()
+            self.backend.set(key, text, self.ttl)
+            return text
+
+        return self.flights.do(key, run)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = 0
+            self.flights.coalesced = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.flights.coalesced,
+                'in_flight': self.flights.in_flight(),
+            }
+
+
+prompt_cache = PromptCache(
+    ttl=int(os.getenv('AI_CACHE_TTL', 3600)),
+    max_entries=int(os.getenv('AI_CACHE_SIZE', 512))
+)
 
 
 class AIEcoCoach:
@@ -59,34 +175,56 @@ class AIEcoCoach:
     }
     
     @staticmethod
-    def get_personalized_insight(user_data, emissions_data, activities_data):
+    def _complete(messages, max_tokens, temperature, cache=True):
+        """
+        Run one chat completion and return its text
+
+        Identical requests (same normalized messages and settings) are served
+        from the prompt cache and coalesced while in flight; the rest go
+        through llm_guard. Raises on upstream errors (and LLMUnavailable when
+        the guard refuses the call) so callers can fall back.
+        """
+        def create():
+            with llm_guard.call() as timeout:
+                response = client.chat.completions.create(
+                    model=MODEL,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=timeout
+                )
+            return response.choices[0].message.content.strip()
+
+        if not cache:
+            return create()
+
+        key = PromptCache.fingerprint(messages, max_tokens, temperature)
+        return prompt_cache.get_or_create(key, create)
+    
+    @staticmethod
+    def get_personalized_insight(context):
         """
         Generate personalized sustainability insight based on user data
         
         Args:
-            user_data: User profile information
-            emissions_data: Recent emissions data
-            activities_data: Recent activities data
+            context: AIContext with the user's recent footprint (see ai_context.py)
         
         Returns:
             dict: {
                 'insight': str,
                 'category': str,
-                'action_items': list,
-                'timestamp': str
+                'timestamp': str,
+                'source': str
             }
         """
         if not openai_available or not client:
-            return AIEcoCoach._get_fallback_insight(emissions_data, activities_data)
+            return AIEcoCoach._get_fallback_insight(context)
         
         try:
-            # Prepare context for AI
-            context = AIEcoCoach._prepare_context(user_data, emissions_data, activities_data)
-            
             prompt = f"""You are an expert sustainability coach. Based on the user's carbon footprint data, provide a personalized, actionable insight.
 
 User Data:
-{context}
+{context.summary()}
 
 Provide a response in the following format:
 1. A brief, encouraging observation about their emissions pattern (2-3 sentences)
@@ -95,9 +233,8 @@ Provide a response in the following format:
 
 Keep the tone friendly, encouraging, and specific. Focus on the biggest emission source."""
 
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
+            insight_text = AIEcoCoach._complete(
+                [
                     {"role": "system", "content": "You are a friendly, knowledgeable sustainability coach helping users reduce their carbon footprint."},
                     {"role": "user", "content": prompt}
                 ],
@@ -105,21 +242,16 @@ Keep the tone friendly, encouraging, and specific. Focus on the biggest emission
                 temperature=0.7
             )
             
-            insight_text = response.choices[0].message.content.strip()
-            
-            # Determine category based on emissions data
-            category = AIEcoCoach._determine_top_category(emissions_data)
-            
             return {
                 'insight': insight_text,
-                'category': category,
+                'category': context.top_category,
                 'timestamp': datetime.utcnow().isoformat(),
                 'source': 'ai'
             }
             
         except Exception as e:
-            print(f"⚠️ AI insight generation error: {e}")
-            return AIEcoCoach._get_fallback_insight(emissions_data, activities_data)
+            logger.warning("⚠️ AI insight generation error: %s", e)
+            return AIEcoCoach._get_fallback_insight(context)
     
     @staticmethod
     def chat_with_coach(message, conversation_history, user_context):
@@ -141,11 +273,87 @@ Keep the tone friendly, encouraging, and specific. Focus on the biggest emission
             return AIEcoCoach._get_fallback_chat_response(message)
         
         try:
-            # Build conversation messages
-            messages = [
-                {
-                    "role": "system",
-                    "content": f"""You are EcoCoach, a friendly AI sustainability advisor. Help users reduce their carbon footprint with practical, personalized advice.
+            messages = AIEcoCoach._chat_messages(message, conversation_history, user_context)
+            
+            # Conversations are unique; only the one-shot prompts are cached
+            response_text = AIEcoCoach._complete(messages, max_tokens=300, temperature=0.8, cache=False)
+            
+            return {
+                'response': response_text,
+                'timestamp': datetime.utcnow().isoformat(),
+                'source': 'ai'
+            }
+            
+        except Exception as e:
+            logger.warning("⚠️ AI chat error: %s", e)
+            return AIEcoCoach._get_fallback_chat_response(message)
+    
+    @staticmethod
+    def stream_chat_with_coach(message, conversation_history, user_context):
+        """
+        Chat with AI coach, yielding the reply as it is generated
+        
+        Upstream chunks are only read as fast as the caller consumes events,
+        and closing the generator (e.g. the client disconnected) closes the
+        upstream stream.
+        
+        Yields:
+            tuple: (event, data) pairs:
+                ('token', {'delta': str}) for each piece of the reply, then
+                ('done', {'response': str, 'timestamp': str, 'source': str}).
+                A fallback reply is sent as a single 'done' event; a failure
+                after tokens were sent ends with ('error', {'error': str}).
+        """
+        if not openai_available or not client:
+            yield 'done', AIEcoCoach._get_fallback_chat_response(message)
+            return
+        
+        messages = AIEcoCoach._chat_messages(message, conversation_history, user_context)
+        parts = []
+        stream = None
+        try:
+            # Judged by time to first chunk; the slot is held until the stream ends
+            with llm_guard.stream() as upstream:
+                stream = client.chat.completions.create(
+                    model=MODEL,
+                    messages=messages,
+                    max_tokens=300,
+                    temperature=0.8,
+                    stream=True,
+                    timeout=upstream.timeout
+                )
+                for chunk in upstream.chunks(stream):
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield 'token', {'delta': delta}
+        except Exception as e:
+            logger.warning("⚠️ AI chat stream error: %s", e)
+            if parts:
+                yield 'error', {'error': 'The response was interrupted'}
+            else:
+                yield 'done', AIEcoCoach._get_fallback_chat_response(message)
+            return
+        finally:
+            # Runs on GeneratorExit too, so a disconnect stops the upstream call
+            if stream is not None and hasattr(stream, 'close'):
+                stream.close()
+        
+        yield 'done', {
+            'response': ''.join(parts).strip(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'source': 'ai'
+        }
+    
+    @staticmethod
+    def _chat_messages(message, conversation_history, user_context):
+        """Build the chat completion messages: system prompt, last 5 turns, new message"""
+        messages = [
+            {
+                "role": "system",
+                "content": f"""You are EcoCoach, a friendly AI sustainability advisor. Help users reduce their carbon footprint with practical, personalized advice.
 
 User Context:
 {user_context}
@@ -156,40 +364,22 @@ Guidelines:
 - Reference their actual data when relevant
 - Keep responses concise (2-3 paragraphs max)
 - Use emojis sparingly for friendliness"""
-                }
-            ]
-            
-            # Add conversation history (last 5 messages)
-            for msg in conversation_history[-5:]:
-                messages.append({
-                    "role": msg.get('role', 'user'),
-                    "content": msg.get('content', '')
-                })
-            
-            # Add current message
+            }
+        ]
+        
+        # Add conversation history (last 5 messages)
+        for msg in conversation_history[-5:]:
             messages.append({
-                "role": "user",
-                "content": message
+                "role": msg.get('role', 'user'),
+                "content": msg.get('content', '')
             })
-            
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=300,
-                temperature=0.8
-            )
-            
-            response_text = response.choices[0].message.content.strip()
-            
-            return {
-                'response': response_text,
-                'timestamp': datetime.utcnow().isoformat(),
-                'source': 'ai'
-            }
-            
-        except Exception as e:
-            print(f"⚠️ AI chat error: {e}")
-            return AIEcoCoach._get_fallback_chat_response(message)
+        
+        # Add current message
+        messages.append({
+            "role": "user",
+            "content": message
+        })
+        return messages
     
     @staticmethod
     def get_reduction_tips(category='general', current_emissions=0):
@@ -207,81 +397,86 @@ Guidelines:
             return AIEcoCoach.FALLBACK_RESPONSES.get(category, AIEcoCoach.FALLBACK_RESPONSES['general'])[:3]
         
         try:
+            # The prompt only carries the bucket, so the cached answer fits every user in it
             prompt = f"""Provide 3 specific, actionable tips to reduce carbon emissions in the {category} category.
-Current emissions: {current_emissions} kg CO₂
+Current emissions (last 30 days): {emission_bucket(current_emissions)} CO₂
 
 Format each tip as:
 - [Tip]: [Expected impact]
 
 Keep tips practical and achievable."""
 
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
+            tips_text = AIEcoCoach._complete(
+                [
                     {"role": "system", "content": "You are a sustainability expert providing practical emission reduction tips."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=200,
                 temperature=0.7
             )
-            
-            tips_text = response.choices[0].message.content.strip()
             tips = [tip.strip() for tip in tips_text.split('\n') if tip.strip() and tip.strip().startswith('-')]
             
             return tips[:3] if tips else AIEcoCoach.FALLBACK_RESPONSES.get(category, AIEcoCoach.FALLBACK_RESPONSES['general'])[:3]
             
         except Exception as e:
-            print(f"⚠️ AI tips generation error: {e}")
+            logger.warning("⚠️ AI tips generation error: %s", e)
             return AIEcoCoach.FALLBACK_RESPONSES.get(category, AIEcoCoach.FALLBACK_RESPONSES['general'])[:3]
     
     @staticmethod
-    def _prepare_context(user_data, emissions_data, activities_data):
-        """Prepare context string for AI"""
-        context_parts = []
-        
-        # Emissions summary
-        if emissions_data:
-            total = sum(e.get('amount', 0) for e in emissions_data)
-            context_parts.append(f"Total recent emissions: {total:.2f} kg CO₂")
-            
-            # Group by category
-            by_category = {}
-            for e in emissions_data:
-                cat = e.get('emission_type', 'other')
-                by_category[cat] = by_category.get(cat, 0) + e.get('amount', 0)
-            
-            if by_category:
-                sorted_cats = sorted(by_category.items(), key=lambda x: x[1], reverse=True)
-                context_parts.append(f"Top emission source: {sorted_cats[0][0]} ({sorted_cats[0][1]:.2f} kg CO₂)")
-        
-        # Activities summary
-        if activities_data:
-            context_parts.append(f"Recent activities logged: {len(activities_data)}")
+    def get_dashboard_insight(user_name, recent_emissions, top_sources):
+        """
+        Generate the one or two sentence insight shown on the dashboard
         
-        return "\n".join(context_parts) if context_parts else "No recent data available"
-    
-    @staticmethod
-    def _determine_top_category(emissions_data):
-        """Determine the category with highest emissions"""
-        if not emissions_data:
-            return 'general'
+        Args:
+            user_name: User's display name
+            recent_emissions: Lines describing the latest emissions
+            top_sources: Lines describing the biggest emission sources
         
-        by_category = {}
-        for e in emissions_data:
-            cat = e.get('emission_type', 'other')
-            by_category[cat] = by_category.get(cat, 0) + e.get('amount', 0)
+        Returns:
+            dict: { 'insight': str, 'timestamp': str, 'source': str }
+        """
+        fallback = "Every small action counts! Track your emissions to see how you can make a difference."
+        if not openai_available or not client:
+            return {'insight': fallback, 'timestamp': datetime.utcnow().isoformat(), 'source': 'fallback'}
         
-        if not by_category:
-            return 'general'
+        emissions_text = "\n".join(recent_emissions) or "No recent emissions data"
+        sources_text = "\n".join(top_sources) or "No emission sources identified"
+        prompt = f"""You are an AI sustainability coach. Provide a brief, friendly, and actionable
+insight based on the user's carbon emissions data. Focus on one key observation
+and one specific, practical suggestion for reducing their carbon footprint.
+
+User: {user_name}
+
+Recent emissions:
+{emissions_text}
+
+Top emission sources:
+{sources_text}
+
+Keep the response under 2 sentences. Be encouraging and specific.
+Example: "I see your daily commute is your biggest source of emissions.
+Could you try working from home one day this week to reduce your impact?" """
         
-        return max(by_category.items(), key=lambda x: x[1])[0]
+        try:
+            insight = AIEcoCoach._complete(
+                [
+                    {"role": "system", "content": "You are a helpful AI sustainability coach."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=100,
+                temperature=0.7
+            )
+            return {'insight': insight, 'timestamp': datetime.utcnow().isoformat(), 'source': 'ai'}
+        except Exception as e:
+            logger.warning("⚠️ OpenAI API error: %s", e)
+            return {'insight': fallback, 'timestamp': datetime.utcnow().isoformat(), 'source': 'fallback'}
     
     @staticmethod
-    def _get_fallback_insight(emissions_data, activities_data):
+    def _get_fallback_insight(context=None):
         """Get fallback insight when AI is not available"""
         import random
         
-        category = AIEcoCoach._determine_top_category(emissions_data) if emissions_data else 'general'
+        category = context.top_category if context else 'general'
         responses = AIEcoCoach.FALLBACK_RESPONSES.get(category, AIEcoCoach.FALLBACK_RESPONSES['general'])
         
         return {
@@ -327,18 +522,20 @@ def get_daily_tip():
     return random.choice(all_tips)
 
 
-def analyze_emission_trend(emissions_history):
-    """Analyze emission trend and provide insight"""
-    if not emissions_history or len(emissions_history) < 2:
-        return "Keep logging your activities to track your progress!"
+def analyze_emission_trend(trend):
+    """
+    Analyze emission trend and provide insight
     
-    recent = sum(e.get('amount', 0) for e in emissions_history[:7])
-    older = sum(e.get('amount', 0) for e in emissions_history[7:14])
+    Args:
+        trend: TrendAnalysis over the user's recent daily totals (see utils/trends.py)
+    """
+    if trend.total <= 0:
+        return "Keep logging your activities to track your progress!"
     
-    if older == 0:
+    if trend.previous_week_total <= 0:
         return "Great start! Continue tracking to see your progress over time."
     
-    change = ((recent - older) / older) * 100
+    change = trend.change_percent
     
     if change < -10:
         return f"Excellent! Your emissions decreased by {abs(change):.1f}% this week. Keep up the great work! 🌱"
@@ -0,0 +1,259 @@
+"""
+Response Cache
+Per-user cache for read-heavy JSON endpoints.
+
+Entries are keyed by (user_id, data_version, endpoint, query params), so the
+next emission/activity/asset/goal write for a user (which bumps their
+data_version, see data_versions.py) makes all of that user's entries
+unreachable; stale ones then age out through TTL/LRU eviction.
+
+Backends:
+    MemoryBackend - in-process dict with TTL + LRU (default)
+    RedisBackend  - anything speaking the redis-py get/set/delete protocol;
+                    TTL via SET EX, LRU via the server's maxmemory-policy
+
+Configuration (environment):
+    RESPONSE_CACHE_URL   - redis://... to use Redis, empty for in-process
+    RESPONSE_CACHE_TTL   - seconds an entry lives (default 60)
+    RESPONSE_CACHE_SIZE  - max entries for the in-process backend (default 1024)
+
+SingleFlight coalesces concurrent identical calls (used for LLM requests).
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, request, make_response
+
+from data_versions import request_data_version
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """In-process dict with per-entry expiry and least-recently-used eviction"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Cache entries stored in Redis (or anything implementing its protocol)
+
+    Args:
+        client: Object with get(key), set(key, value, ex=seconds) and delete(key)
+        prefix (str): Namespace for this app's keys
+    """
+
+    def __init__(self, client, prefix='carboniq:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url):
+        """Connect with redis-py (optional dependency)"""
+        import redis
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        return value
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        # Only used by tests/maintenance; version-keyed entries normally just expire
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """Cache front-end with hit/miss counters per endpoint"""
+
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+        self._counts = defaultdict(lambda: {'hits': 0, 'misses': 0, 'errors': 0})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        ttl = int(os.getenv('RESPONSE_CACHE_TTL', 60))
+        url = os.getenv('RESPONSE_CACHE_URL')
+        if url:
+            try:
+                return cls(RedisBackend.from_url(url), ttl)
+            except ImportError:
+                logger.warning("⚠️ redis library not available, using the in-process response cache")
+        return cls(MemoryBackend(int(os.getenv('RESPONSE_CACHE_SIZE', 1024))), ttl)
+
+    def _count(self, endpoint, outcome):
+        with self._lock:
+            self._counts[endpoint][outcome] += 1
+
+    def get(self, endpoint, key):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never break the endpoint
+            logger.warning("⚠️ Response cache read failed: %s", e)
+            self._count(endpoint, 'errors')
+            return None
+        self._count(endpoint, 'hits' if value is not None else 'misses')
+        return value
+
+    def set(self, endpoint, key, value):
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            logger.warning("⚠️ Response cache write failed: %s", e)
+            self._count(endpoint, 'errors')
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self._counts.clear()
+
+    def stats(self):
+        """Hit/miss counters, overall and per endpoint"""
+        with self._lock:
+            endpoints = {name: dict(counts) for name, counts in self._counts.items()}
+        hits = sum(c['hits'] for c in endpoints.values())
+        misses = sum(c['misses'] for c in endpoints.values())
+        return {
+            'backend': type(self.backend).__name__,
+            'ttl': self.ttl,
+            'hits': hits,
+            'misses': misses,
+            'errors': sum(c['errors'] for c in endpoints.values()),
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'endpoints': endpoints,
+        }
+
+
+response_cache = ResponseCache.from_env()
+
+
+def cache_key(user_id, version, endpoint, params):
+    """Build the key for one user's response at one data version"""
+    query = urlencode(sorted(params.items(multi=True) if hasattr(params, 'items') else params))
+    return f"resp:{user_id}:{version}:{endpoint}?{query}"
+
+
+def cached_per_user(endpoint, cache=None):
+    """
+    Cache a view's 200 JSON responses per user until their data changes
+
+    The user comes from the `user_id` view argument, or ?user_id= for views
+    that take it as a query parameter. Requests without a known user are
+    passed straight through.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            active = cache or response_cache
+            user_id = kwargs.get('user_id', request.args.get('user_id', type=int))
+            version = request_data_version(user_id) if user_id is not None else None
+            if version is None:
+                return view(*args, **kwargs)
+
+            key = cache_key(user_id, version, endpoint, request.args)
+            body = active.get(endpoint, key)
+            if body is not None:
+                return current_app.response_class(body, status=200, mimetype='application/json')
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.mimetype == 'application/json':
+                active.set(endpoint, key, response.get_data(as_text=True))
+            return response
+        return wrapper
+    return decorator
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution
+
+    The first caller runs the function; callers arriving while it is in
+    flight wait for and share its result (or exception).
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self):
+        """Number of distinct calls currently running"""
+        with self._lock:
+            return len(self._calls)
@@ -3,6 +3,8 @@ Carbon Calculator Utility
 Calculates CO2 emissions for various activities based on standard emission factors
 """
 
+import numpy as np
+
 # Emission factors (kg CO2 per unit)
 EMISSION_FACTORS = {
     # Transportation (kg CO2 per km)
@@ -61,6 +63,103 @@ EMISSION_FACTORS = {
 }
 
 
+# Factor used for types missing from EMISSION_FACTORS (same as the calculate_* defaults)
+DEFAULT_FACTORS = {
+    'transport': 0.192,
+    'energy': 0.385,
+    'food': 5.0,
+    'waste': 0.5,
+}
+
+# Human-readable calculation per category; anything else is a custom factor
+CALCULATION_TEMPLATES = {
+    'transport': "{value} km × {factor} kg CO₂/km",
+    'energy': "{value} kWh × {factor} kg CO₂/kWh",
+    'food': "{value} kg × {factor} kg CO₂/kg",
+    'waste': "{value} kg × {factor} kg CO₂/kg",
+}
+CUSTOM_TEMPLATE = "{value} × {factor} kg CO₂"
+
+
+class FactorTable:
+    """
+    Emission factors of one category as an array, for vectorized lookups
+
+    The default factor sits in the last slot, so unknown types resolve to it
+    without a branch.
+    """
+
+    def __init__(self, category):
+        factors = EMISSION_FACTORS[category]
+        self.index = {name: i for i, name in enumerate(factors)}
+        self.factors = np.array(list(factors.values()) + [DEFAULT_FACTORS[category]], dtype=np.float64)
+
+    def lookup(self, types):
+        """Factors for a sequence of type names"""
+        default = len(self.factors) - 1
+        # One dict lookup per distinct type, then a single gather
+        names, inverse = np.unique(np.asarray(types, dtype=object).astype(str), return_inverse=True)
+        positions = np.fromiter((self.index.get(name, default) for name in names), dtype=np.int64, count=len(names))
+        return self.factors[positions[inverse]]
+
+
+FACTOR_TABLES = {category: FactorTable(category) for category in DEFAULT_FACTORS}
+
+
+def round_amounts(amounts, digits=2):
+    """
+    Vectorized round() with the same results as Python's
+
+    np.round scales by 10**digits first, which can flip values sitting next
+    to a .5 boundary; those few are re-rounded one by one.
+    """
+    scaled = amounts * 10 ** digits
+    rounded = np.round(scaled) / 10 ** digits
+    near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(amounts[i]), digits)
+    return rounded
+
+
+class EmissionBatch:
+    """
+    Results of CarbonCalculator.calculate_batch
+
+    `amounts` and `factors` are arrays aligned with the input values. The
+    `calculation` strings are only formatted when asked for, since bulk
+    jobs rarely need them for every row.
+    """
+
+    unit = 'kg CO₂'
+
+    def __init__(self, category, values, factors, amounts):
+        self.category = category
+        self.values = values
+        self.factors = factors
+        self.amounts = amounts
+        self._template = CALCULATION_TEMPLATES.get(category, CUSTOM_TEMPLATE)
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def calculation(self, i):
+        """Description of row i, e.g. '12.0 km × 0.192 kg CO₂/km'"""
+        return self._template.format(value=self.values[i].item(), factor=self.factors[i].item())
+
+    @property
+    def calculations(self):
+        return [self.calculation(i) for i in range(len(self))]
+
+    def __getitem__(self, i):
+        """Row i in the same shape as the single-value calculate_* methods"""
+        return {
+            'amount': self.amounts[i].item(),
+            'factor': self.factors[i].item(),
+            'calculation': self.calculation(i),
+            'unit': self.unit
+        }
+
+
 class CarbonCalculator:
     """Calculate carbon emissions for various activities"""
     
@@ -177,6 +276,39 @@ class CarbonCalculator:
             'unit': 'kg CO₂'
         }
     
+    @staticmethod
+    def calculate_batch(category, types, values, custom_factors=1.0):
+        """
+        Calculate emissions for many values of one category at once
+        
+        Args:
+            category (str): 'transport', 'energy', 'food', 'waste'; anything
+                else uses custom_factors, like calculate_custom_emission
+            types: Type name per value, or one name for all of them
+            values: Input values (km, kWh, kg, ...)
+            custom_factors: Factor(s) for custom categories (scalar or per value)
+        
+        Returns:
+            EmissionBatch: amounts (rounded to 2 decimals) and factors as arrays
+        
+        Raises:
+            ValueError: If types/custom_factors don't line up with values
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        
+        table = FACTOR_TABLES.get(category)
+        if table is None:
+            factors = np.broadcast_to(np.asarray(custom_factors, dtype=np.float64), values.shape)
+        elif isinstance(types, str):
+            factors = np.full(values.shape, table.lookup([types])[0])
+        else:
+            factors = table.lookup(types)
+            if factors.shape != values.shape:
+                raise ValueError(f"Got {len(factors)} types for {len(values)} values")
+        
+        amounts = round_amounts(values * factors)
+        return EmissionBatch(category, values, factors, amounts)
+    
     @staticmethod
     def get_available_categories():
         """Get all available emission categories and their types"""
@@ -0,0 +1,76 @@
+"""
+Conditional GETs
+ETag / If-None-Match support for per-user JSON endpoints.
+
+The ETag is derived from the user's data version (see data_versions.py),
+the current UTC day and the request path + query, so it can be checked
+before the view runs: a matching If-None-Match is answered with 304 after
+a single primary-key lookup, without touching the aggregates. The day is
+part of the tag because several responses are relative to "today"
+(month-to-date totals, goal days remaining).
+"""
+
+import hashlib
+from datetime import datetime
+
+from flask import request, make_response
+
+from data_versions import request_data_version
+
+
+def data_etag(user_id, version):
+    """Build the (weak) ETag for this request at the given data version"""
+    resource = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:12]
+    return f"u{user_id}-v{version}-{datetime.utcnow():%Y%m%d}-{resource}"
+
+
+def _request_user_id():
+    view_args = request.view_args or {}
+    if 'user_id' in view_args:
+        return view_args['user_id']
+    return request.args.get('user_id', type=int)
+
+
+def skip_etag():
+    """Send this response without an ETag (its body can change without a data write)"""
+    request.environ.pop('carboniq.etag', None)
+
+
+def enable_conditional_get(blueprint):
+    """
+    Answer GETs on `blueprint` with ETags and 304 Not Modified
+
+    Only routes that identify a user (a user_id view argument or ?user_id=)
+    are covered; everything else passes through untouched.
+    """
+
+    @blueprint.before_request
+    def _check_if_none_match():
+        if request.method != 'GET':
+            return None
+        user_id = _request_user_id()
+        if user_id is None:
+            return None
+        version = request_data_version(user_id)
+        if version is None:
+            return None
+
+        etag = data_etag(user_id, version)
+        request.environ['carboniq.etag'] = etag
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return None
+
+    @blueprint.after_request
+    def _set_etag(response):
+        etag = request.environ.get('carboniq.etag')
+        if etag and response.status_code == 200:
+            response.set_etag(etag, weak=True)
+            # Browsers may keep the body but must revalidate before reusing it
+            response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    return blueprint
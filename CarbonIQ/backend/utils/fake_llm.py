@@ -0,0 +1,90 @@
+"""
+Fake LLM Backend
+Offline stand-in for the OpenAI client, selected with LLM_BACKEND=fake.
+
+Implements the slice of the client API that AIEcoCoach uses
+(client.chat.completions.create, including stream=True) and answers
+deterministically from the prompt, so the AI pipeline can be exercised
+without network or an API key.
+"""
+
+import re
+import time
+import threading
+from types import SimpleNamespace
+
+
+class FakeStream:
+    """
+    Iterator of completion chunks, one per word, like the OpenAI stream
+
+    Records how many chunks were pulled and whether it was closed, so
+    tests can check backpressure and cancellation.
+    """
+
+    def __init__(self, text, latency=0.0):
+        self.pieces = re.findall(r'\S+\s*', text)
+        self.latency = latency
+        self.pulled = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed or self.pulled >= len(self.pieces):
+            raise StopIteration
+        if self.latency:
+            time.sleep(self.latency)
+        piece = self.pieces[self.pulled]
+        self.pulled += 1
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    def close(self):
+        self.closed = True
+
+
+class FakeLLMClient:
+    """
+    Deterministic chat-completions client
+
+    Args:
+        latency (float): Seconds to sleep per call (or per chunk when streaming)
+        reply (str): Fixed reply text; by default one is derived from the prompt
+    """
+
+    def __init__(self, latency=0.0, reply=None):
+        self.latency = latency
+        self.reply = reply
+        self.calls = []
+        self.streams = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def respond(self, messages):
+        """Build the reply for a conversation"""
+        if self.reply is not None:
+            return self.reply
+        prompt = messages[-1].get('content', '') if messages else ''
+        if 'tips' in prompt.lower():
+            category = re.search(r'in the (\w+) category', prompt)
+            category = category.group(1) if category else 'general'
+            return "\n".join(
+                f"- Fake {category} tip {n}: saves about {n * 5} kg CO₂ per month" for n in range(1, 4)
+            )
+        top = re.search(r'Top emission source: (\w+)', prompt)
+        focus = top.group(1) if top else 'your biggest source'
+        return f"[fake] You're doing well. Focus on {focus} next: one small change this week adds up."
+
+    def create(self, model=None, messages=None, max_tokens=None, temperature=None, stream=False, **kwargs):
+        with self._lock:
+            self.calls.append({'model': model, 'messages': messages, 'max_tokens': max_tokens})
+        if stream:
+            chunks = FakeStream(self.respond(messages or []), self.latency)
+            with self._lock:
+                self.streams.append(chunks)
+            return chunks
+        if self.latency:
+            time.sleep(self.latency)
+        text = self.respond(messages or [])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
@@ -0,0 +1,296 @@
+"""
+LLM Guard
+Concurrency limit, deadlines and a circuit breaker for upstream LLM calls.
+
+Every OpenAI call goes through LLMGuard.call(), or LLMGuard.stream() for
+streamed replies:
+
+    - at most LLM_MAX_CONCURRENCY calls run at once; a caller that can't get
+      a slot within LLM_QUEUE_TIMEOUT seconds gets LLMBusyError
+    - each call carries a deadline (LLM_TIMEOUT seconds) passed to the client
+    - LLM_BREAKER_FAILURES consecutive errors or slow calls (longer than
+      LLM_BREAKER_SLOW_CALL seconds) open the circuit: calls then fail
+      immediately with CircuitOpenError, so callers serve their fallback
+      responses without waiting on upstream
+    - after LLM_BREAKER_COOLDOWN seconds one trial call is let through
+      (half-open); success closes the circuit, failure re-opens it
+
+A streamed reply is paced by whoever reads it, so its speed is judged by
+the time to its first chunk; a long reply or a slow reader is never a slow
+call. It still holds its slot until the upstream stream is exhausted or
+closed, so LLM_MAX_CONCURRENCY bounds open streams too.
+
+Both errors derive from LLMUnavailable, which AIEcoCoach treats like any
+other upstream failure.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+
+class LLMUnavailable(Exception):
+    """The call was not attempted because upstream is unhealthy or saturated"""
+
+
+class CircuitOpenError(LLMUnavailable):
+    """Raised while the circuit breaker is open"""
+
+
+class LLMBusyError(LLMUnavailable):
+    """Raised when no concurrency slot frees up before the queue timeout"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with a half-open trial
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit
+        slow_call_seconds (float): Successful calls slower than this count as failures
+        cooldown (float): Seconds to stay open before allowing a trial call
+        clock (callable): Monotonic time source (overridable in tests)
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, slow_call_seconds=10.0, cooldown=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.clock = clock
+        self.opened = 0
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.cooldown:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """
+        Check whether a call may go upstream now
+
+        Returns:
+            bool: False while open, or while a half-open trial is already running
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self.clock() - self._opened_at < self.cooldown:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record(self, duration=None, error=False):
+        """Record the outcome of an allowed call"""
+        failed = error or (duration is not None and duration > self.slow_call_seconds)
+        with self._lock:
+            self._trial_in_flight = False
+            if not failed:
+                self._failures = 0
+                self._state = self.CLOSED
+                return
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._trip()
+
+    def release(self):
+        """Give back an allowed call that never went upstream"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _trip(self):
+        if self._state != self.OPEN:
+            self.opened += 1
+        self._state = self.OPEN
+        self._opened_at = self.clock()
+
+    def reset(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+
+class GuardedStream:
+    """
+    One streamed call admitted by LLMGuard.stream()
+
+    The call is settled with the breaker when its first chunk arrives (or
+    when the block ends without one). Its slot is held until the upstream
+    stream ends: exhausted, failed or closed by the reader.
+    """
+
+    def __init__(self, guard):
+        self.guard = guard
+        self.timeout = guard.call_timeout
+        self._started = time.monotonic()
+        self._settled = False
+        self._holding = True
+
+    def chunks(self, stream):
+        """Yield the upstream chunks, settling the call on the first one"""
+        try:
+            for chunk in stream:
+                self.settle()
+                yield chunk
+        finally:
+            self.release()
+
+    def settle(self, error=False):
+        """Report time to first chunk once; later errors count as failures"""
+        if not self._settled:
+            self._settled = True
+            self.guard._record(time.monotonic() - self._started, error)
+        elif error:
+            self.guard._record(error=True)
+
+    def release(self):
+        if self._holding:
+            self._holding = False
+            self.guard._release()
+
+
+class LLMGuard:
+    """
+    Bounded concurrency + circuit breaker around upstream calls
+
+    Args:
+        max_concurrent (int): Calls allowed upstream at once
+        queue_timeout (float): Seconds a caller may wait for a free slot
+        call_timeout (float): Deadline passed to the client for each call
+        breaker (CircuitBreaker): Breaker shared by every call
+    """
+
+    def __init__(self, max_concurrent=4, queue_timeout=2.0, call_timeout=15.0, breaker=None):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.call_timeout = call_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._counts = {
+            'waiting': 0, 'in_flight': 0, 'calls': 0, 'failures': 0,
+            'slow_calls': 0, 'rejected_open': 0, 'rejected_busy': 0,
+        }
+
+    @classmethod
+    def from_env(cls):
+        breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv('LLM_BREAKER_FAILURES', 5)),
+            slow_call_seconds=float(os.getenv('LLM_BREAKER_SLOW_CALL', 10)),
+            cooldown=float(os.getenv('LLM_BREAKER_COOLDOWN', 30)),
+        )
+        return cls(
+            max_concurrent=int(os.getenv('LLM_MAX_CONCURRENCY', 4)),
+            queue_timeout=float(os.getenv('LLM_QUEUE_TIMEOUT', 2)),
+            call_timeout=float(os.getenv('LLM_TIMEOUT', 15)),
+            breaker=breaker,
+        )
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self._counts[name] += delta
+
+    def _admit(self):
+        """Take a slot for one upstream call, or raise without attempting it"""
+        if not self.breaker.allow():
+            self._count('rejected_open')
+            raise CircuitOpenError('LLM circuit breaker is open')
+
+        self._count('waiting')
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        self._count('waiting', -1)
+        if not acquired:
+            # Saturation is not an upstream failure; just give back the trial
+            self.breaker.release()
+            self._count('rejected_busy')
+            raise LLMBusyError('Too many concurrent LLM calls')
+
+        self._count('in_flight')
+        self._count('calls')
+
+    def _release(self):
+        self._count('in_flight', -1)
+        self._slots.release()
+
+    def _record(self, duration=None, error=False):
+        if error:
+            self._count('failures')
+        elif duration is not None and duration > self.breaker.slow_call_seconds:
+            self._count('slow_calls')
+        self.breaker.record(duration, error=error)
+
+    @contextmanager
+    def call(self):
+        """
+        Hold a slot for one upstream call and report its outcome to the breaker
+
+        Raises:
+            CircuitOpenError: The breaker is open (nothing was attempted)
+            LLMBusyError: No slot freed up within queue_timeout
+        """
+        self._admit()
+        started = time.monotonic()
+        try:
+            yield self.call_timeout
+        except BaseException:
+            self._record(error=True)
+            raise
+        else:
+            self._record(time.monotonic() - started)
+        finally:
+            self._release()
+
+    @contextmanager
+    def stream(self):
+        """
+        Guard one streamed upstream call
+
+        Yields a GuardedStream: pass its `timeout` to the client and read
+        the reply through its chunks(). Errors raised inside the block count
+        as upstream failures; the reader going away (GeneratorExit) does not.
+
+        Raises:
+            CircuitOpenError: The breaker is open (nothing was attempted)
+            LLMBusyError: No slot freed up within queue_timeout
+        """
+        self._admit()
+        upstream = GuardedStream(self)
+        try:
+            yield upstream
+        except GeneratorExit:
+            upstream.settle()
+            raise
+        except BaseException:
+            upstream.settle(error=True)
+            raise
+        else:
+            upstream.settle()
+        finally:
+            upstream.release()
+
+    def stats(self):
+        """Breaker state, queue depth and call counters"""
+        with self._lock:
+            counts = dict(self._counts)
+        return dict(
+            counts,
+            state=self.breaker.state,
+            times_opened=self.breaker.opened,
+            max_concurrent=self.max_concurrent,
+        )
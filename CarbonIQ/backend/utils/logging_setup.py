@@ -0,0 +1,109 @@
+"""
+Logging
+One queue-backed logging setup for the whole backend.
+
+Modules log through `logging.getLogger(__name__)` with %-style arguments,
+so a message below the configured level is dropped before its arguments
+are ever formatted. Records that pass are put on an in-memory queue by a
+QueueHandler and written out by a QueueListener thread, so request
+threads never block on console I/O.
+
+Configuration (environment):
+    LOG_LEVEL   - DEBUG, INFO (default), WARNING, ERROR
+    LOG_FORMAT  - 'text' (default) or 'json' for one JSON object per line
+"""
+
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, for log collectors"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class StdoutHandler(logging.StreamHandler):
+    """Write to the current sys.stdout, even if it was swapped after setup"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class InProcessQueueHandler(QueueHandler):
+    """
+    Queue records with their message merged but otherwise unformatted
+
+    The stock QueueHandler formats the whole record (traceback included)
+    in the logging thread so it can cross process boundaries; the listener
+    here lives in the same process, so that work is left to it.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        # Arguments may be mutated after the call returns, so render them now
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(level=None, log_format=None):
+    """
+    Route every logger through a queue to one stdout writer thread
+
+    Safe to call more than once; only the first call installs handlers.
+
+    Args:
+        level (str): Root level (default LOG_LEVEL, else INFO)
+        log_format (str): 'text' or 'json' (default LOG_FORMAT, else text)
+
+    Returns:
+        QueueListener: The running writer
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    log_format = log_format or os.getenv('LOG_FORMAT', 'text')
+
+    handler = StdoutHandler()
+    handler.setFormatter(JSONFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.addHandler(InProcessQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(_listener.stop)
+    return _listener
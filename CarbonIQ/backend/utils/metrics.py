@@ -0,0 +1,262 @@
+"""
+Request Metrics
+Per-endpoint wall time and SQL instrumentation, exposed for Prometheus.
+
+Every request gets a RequestStats in request.environ. SQLAlchemy cursor
+events add each statement's count and duration to it; when the request
+finishes the totals are folded into per-endpoint counters and histograms,
+served at /metrics in the Prometheus text format.
+
+Requests slower than SLOW_REQUEST_MS are logged with their slowest
+statement, and a request that runs the same statement N_PLUS_ONE_THRESHOLD
+times or more is logged as a likely N+1 (one query per row of an earlier
+result).
+
+Configuration (environment):
+    SERVER_TIMING          - '1' adds a Server-Timing header (app / db time)
+    SLOW_REQUEST_MS        - slow request log threshold (default 500)
+    N_PLUS_ONE_THRESHOLD   - repeats of one statement worth a warning (default 10)
+"""
+
+import os
+import time
+import bisect
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from flask import request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = 'carboniq.request_stats'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    """Time and SQL spent by one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+        self.repeats = Counter()
+
+    def add_statement(self, statement, seconds):
+        self.statements += 1
+        self.db_seconds += seconds
+        self.repeats[statement] += 1
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def most_repeated(self):
+        """(statement, count) of the statement run most often, or (None, 0)"""
+        if not self.repeats:
+            return None, 0
+        return self.repeats.most_common(1)[0]
+
+
+def current_stats():
+    """The RequestStats of the request in progress, if any"""
+    if not has_request_context():
+        return None
+    return request.environ.get(STATS_KEY)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.requests = Counter()  # (method, status) -> count
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_seconds = 0.0
+        self.slowest_statement_seconds = 0.0
+        self.slow_requests = 0
+        self.n_plus_one = 0
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _bound(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+class RequestMetrics:
+    """
+    Per-endpoint request/SQL metrics for one app
+
+    Args:
+        slow_request_ms (float): Requests slower than this are logged
+        n_plus_one_threshold (int): Repeats of one statement that get logged
+        server_timing (bool): Add a Server-Timing header to responses
+    """
+
+    def __init__(self, slow_request_ms=500, n_plus_one_threshold=10, server_timing=False):
+        self.slow_request_ms = slow_request_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.server_timing = server_timing
+        self._endpoints = defaultdict(EndpointMetrics)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.slow_request_ms = float(os.getenv('SLOW_REQUEST_MS', self.slow_request_ms))
+        self.n_plus_one_threshold = int(os.getenv('N_PLUS_ONE_THRESHOLD', self.n_plus_one_threshold))
+        self.server_timing = os.getenv('SERVER_TIMING', '1' if self.server_timing else '0') == '1'
+        app.extensions['request_metrics'] = self
+
+        @app.before_request
+        def _start_request_stats():
+            request.environ[STATS_KEY] = RequestStats()
+
+        @app.after_request
+        def _add_server_timing(response):
+            stats = current_stats()
+            request.environ['carboniq.status'] = response.status_code
+            if stats is not None and self.server_timing:
+                response.headers['Server-Timing'] = (
+                    f'app;dur={stats.elapsed() * 1000:.1f}, '
+                    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} queries"'
+                )
+            return response
+
+        # Teardown runs after a streamed body has been sent, so its queries count too
+        @app.teardown_request
+        def _record_request_stats(error=None):
+            stats = request.environ.pop(STATS_KEY, None)
+            if stats is not None:
+                status = 500 if error is not None else request.environ.get('carboniq.status', 0)
+                self.record(request.endpoint or 'unmatched', request.method, status, stats)
+
+    def record(self, endpoint, method, status, stats):
+        """Fold one finished request into the endpoint's totals and log it if slow"""
+        elapsed = stats.elapsed()
+        statement, repeats = stats.most_repeated()
+        slow = elapsed * 1000 >= self.slow_request_ms
+        n_plus_one = repeats >= self.n_plus_one_threshold
+
+        with self._lock:
+            metrics = self._endpoints[endpoint]
+            metrics.requests[(method, status)] += 1
+            metrics.duration.observe(elapsed)
+            metrics.statements.observe(stats.statements)
+            metrics.db_seconds += stats.db_seconds
+            metrics.slowest_statement_seconds = max(metrics.slowest_statement_seconds, stats.slowest_seconds)
+            metrics.slow_requests += slow
+            metrics.n_plus_one += n_plus_one
+
+        if slow:
+            logger.warning(
+                "🐢 Slow request %s %s: %.0f ms, %d statements, %.0f ms in the database; slowest (%.0f ms): %s",
+                method, endpoint, elapsed * 1000, stats.statements, stats.db_seconds * 1000,
+                stats.slowest_seconds * 1000, stats.slowest_statement,
+            )
+        if n_plus_one:
+            logger.warning(
+                "🔁 Possible N+1 in %s %s: one statement ran %d times: %s",
+                method, endpoint, repeats, statement,
+            )
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+            family('carboniq_http_requests_total', 'counter', 'Requests handled')
+            for endpoint, m in endpoints:
+                for (method, status), count in sorted(m.requests.items()):
+                    lines.append(
+                        f'carboniq_http_requests_total{{endpoint="{_label(endpoint)}",'
+                        f'method="{method}",status="{status}"}} {count}'
+                    )
+
+            for name, attr, help_text in (
+                ('carboniq_http_request_duration_seconds', 'duration', 'Request wall time'),
+                ('carboniq_db_statements_per_request', 'statements', 'SQL statements run by one request'),
+            ):
+                family(name, 'histogram', help_text)
+                for endpoint, m in endpoints:
+                    histogram = getattr(m, attr)
+                    label = f'endpoint="{_label(endpoint)}"'
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{label},le="{_bound(bound)}"}} {total}')
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum!r}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+
+            for name, kind, attr, help_text in (
+                ('carboniq_db_duration_seconds_total', 'counter', 'db_seconds', 'Time spent in SQL statements'),
+                ('carboniq_db_slowest_statement_seconds', 'gauge', 'slowest_statement_seconds',
+                 'Slowest single SQL statement seen'),
+                ('carboniq_slow_requests_total', 'counter', 'slow_requests', 'Requests over SLOW_REQUEST_MS'),
+                ('carboniq_n_plus_one_requests_total', 'counter', 'n_plus_one',
+                 'Requests that repeated one statement N_PLUS_ONE_THRESHOLD times or more'),
+            ):
+                family(name, kind, help_text)
+                for endpoint, m in endpoints:
+                    lines.append(f'{name}{{endpoint="{_label(endpoint)}"}} {getattr(m, attr)!r}')
+
+        return '\n'.join(lines) + '\n'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('carboniq.statement_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['carboniq.statement_started'].pop()
+    stats = current_stats()
+    if stats is not None:
+        stats.add_statement(statement, time.perf_counter() - started)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _fail_statement(context):
+    # after_cursor_execute never fires for a statement that raised
+    started = context.connection.info.get('carboniq.statement_started') if context.connection else None
+    if started:
+        started.pop()
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,220 @@
+"""
+Keyset Pagination
+Cursor-based paging for list endpoints ordered newest first.
+
+Pages are cut with `(date, id) < (cursor_date, cursor_id)` instead of
+OFFSET, so page 500 costs the same as page 1 when (user_id, date) is
+indexed. Rows with a NULL date sort after every dated row on every
+database, and their cursors carry the NULL. Totals are opt-in (?total=true) and cached for a short TTL
+rather than re-counted on every page.
+
+Query parameters:
+    limit   - page size (clamped to the endpoint's maximum)
+    cursor  - opaque token from the previous page's pagination.next_cursor
+    total   - "true" to include a (cached) total count
+
+Response envelope:
+    {
+        <items_key>: [...],
+        "pagination": {"limit": 20, "next_cursor": "...", "has_more": true, "total": null}
+    }
+"""
+
+import os
+import json
+import time
+import base64
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import and_, or_, nulls_last
+
+# Cached totals: key -> (expires_at, count)
+TOTAL_CACHE_TTL = int(os.getenv('PAGINATION_TOTAL_TTL', 60))
+TOTAL_CACHE_SIZE = 1024
+_total_cache = {}
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor this module didn't produce"""
+
+
+def _encode(values):
+    payload = json.dumps(values)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode(token, size):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError('wrong cursor size')
+        return values
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {token}') from e
+
+
+def encode_cursor(date, row_id):
+    """Encode the (date, id) of the last row on a page as an opaque token"""
+    return _encode([date.isoformat() if date else None, row_id])
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor token back into (date, id); date is None for a NULL-dated row
+
+    Raises:
+        InvalidCursor: If the token is malformed
+    """
+    date, row_id = _decode(token, 2)
+    try:
+        return (None if date is None else datetime.fromisoformat(date)), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {token}') from e
+
+
+def encode_feed_cursor(date, kind, row_id):
+    """Encode the (date, kind, id) of the last row of a merged multi-table feed"""
+    return _encode([date.isoformat() if date else None, kind, row_id])
+
+
+def decode_feed_cursor(token):
+    """
+    Decode a feed cursor back into (date, kind, id)
+
+    Raises:
+        InvalidCursor: If the token is malformed
+    """
+    date, kind, row_id = _decode(token, 3)
+    try:
+        return datetime.fromisoformat(date), str(kind), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {token}') from e
+
+
+def clamp_limit(value, default=20, maximum=100):
+    """Keep a requested page size within [1, maximum]"""
+    if value is None:
+        return default
+    return max(1, min(value, maximum))
+
+
+def cached_total(query, key, ttl=TOTAL_CACHE_TTL):
+    """
+    Count the rows of a (filtered, unpaged) query, reusing the result for `ttl` seconds
+
+    Args:
+        query: Query with the list filters applied
+        key: Hashable identifying the endpoint + filters (e.g. ('activities', user_id, category))
+    """
+    now = time.monotonic()
+    hit = _total_cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+
+    total = query.order_by(None).count()
+    if len(_total_cache) >= TOTAL_CACHE_SIZE:
+        _total_cache.pop(next(iter(_total_cache)))
+    _total_cache[key] = (now + ttl, total)
+    return total
+
+
+def clear_total_cache():
+    """Forget every cached total"""
+    _total_cache.clear()
+
+
+class Page:
+    """One page of rows plus the cursor for the next one"""
+
+    def __init__(self, items, limit, next_cursor=None, total=None):
+        self.items = items
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.total = total
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def to_dict(self, items_key, serialize=None):
+        """
+        Build the response envelope, serializing only the rows on this page
+
+        Args:
+            items_key (str): Key the rows are returned under (e.g. 'activities')
+            serialize (callable): Row -> dict (default: row.to_dict())
+        """
+        serialize = serialize or (lambda row: row.to_dict())
+        return {
+            items_key: [serialize(row) for row in self.items],
+            'pagination': {
+                'limit': self.limit,
+                'next_cursor': self.next_cursor,
+                'has_more': self.has_more,
+                'total': self.total,
+            }
+        }
+
+
+def keyset_filter(date_column, id_column, cursor):
+    """Predicate selecting rows strictly after `cursor` in (date DESC NULLS LAST, id DESC) order"""
+    date, row_id = cursor
+    if date is None:
+        return and_(date_column.is_(None), id_column < row_id)
+    return or_(date_column < date, and_(date_column == date, id_column < row_id), date_column.is_(None))
+
+
+def feed_keyset_filter(date_column, id_column, kind, cursor):
+    """
+    Keyset predicate for one branch of a feed ordered by (date, kind, id) DESC.
+
+    `kind` is constant within a branch, so the comparison on it is resolved
+    here and each branch keeps a plain (date, id) range its index can serve.
+    """
+    date, cursor_kind, row_id = cursor
+    if kind < cursor_kind:
+        return date_column <= date
+    if kind > cursor_kind:
+        return date_column < date
+    return keyset_filter(date_column, id_column, (date, row_id))
+
+
+def paginate(query, date_column, id_column, default_limit=20, max_limit=100, total_key=None):
+    """
+    Fetch one newest-first page of `query` using the request's limit/cursor/total args
+
+    Args:
+        query: Query with the list filters applied (no ORDER BY / LIMIT)
+        date_column: Column the list is ordered by (e.g. Activity.date)
+        id_column: Primary key used to break date ties
+        default_limit (int): Page size when ?limit is absent
+        max_limit (int): Largest page size a client may ask for
+        total_key: Cache key for ?total=true (totals are unavailable when None)
+
+    Returns:
+        Page
+
+    Raises:
+        InvalidCursor: If ?cursor is malformed
+    """
+    limit = clamp_limit(request.args.get('limit', type=int), default_limit, max_limit)
+    token = request.args.get('cursor')
+    want_total = request.args.get('total', '').lower() in ('1', 'true', 'yes')
+
+    total = cached_total(query, total_key) if want_total and total_key is not None else None
+
+    if token:
+        query = query.filter(keyset_filter(date_column, id_column, decode_cursor(token)))
+
+    # One extra row tells us whether another page exists without counting
+    rows = query.order_by(nulls_last(date_column.desc()), id_column.desc()).limit(limit + 1).all()
+    items = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, date_column.key), getattr(last, id_column.key))
+
+    return Page(items, limit, next_cursor, total)
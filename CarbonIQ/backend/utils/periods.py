@@ -0,0 +1,42 @@
+"""
+Period Helpers
+Half-open [start, end) datetime windows for month/year filters.
+
+Filtering with `Emission.date >= start, Emission.date < end` lets the
+database use the (user_id, date) indexes, unlike extract('month', date).
+"""
+
+from datetime import datetime
+
+
+def month_window(year, month):
+    """
+    Get the [month_start, next_month) window for a calendar month
+
+    Returns:
+        tuple: (datetime, datetime)
+    """
+    start = datetime(year, month, 1)
+    if month == 12:
+        end = datetime(year + 1, 1, 1)
+    else:
+        end = datetime(year, month + 1, 1)
+    return start, end
+
+
+def previous_month(year, month):
+    """Get (year, month) of the month before the given one"""
+    if month == 1:
+        return year - 1, 12
+    return year, month - 1
+
+
+def year_window(year):
+    """Get the [year_start, next_year) window for a calendar year"""
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
+def in_window(column, window):
+    """Build the index-friendly range predicate for a (start, end) window"""
+    start, end = window
+    return (column >= start) & (column < end)
@@ -0,0 +1,36 @@
+"""
+Server-Sent Events
+Helpers for streaming (event, data) pairs to the browser as text/event-stream.
+"""
+
+import json
+
+from flask import Response
+
+
+def format_sse(event, data):
+    """Encode one event; data is sent as a single line of JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events):
+    """
+    Stream an iterable of (event, data) pairs
+
+    The generator is pulled one event at a time as the server writes to
+    the socket, so nothing is produced faster than the client reads, and
+    closing the response (client disconnect) closes `events`.
+    """
+    def generate():
+        try:
+            for event, data in events:
+                yield format_sse(event, data)
+        finally:
+            if hasattr(events, 'close'):
+                events.close()
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,137 @@
+"""
+Emission Trends
+Vectorized trend statistics over a user's daily emission totals.
+
+Emissions are binned once into a dense per-day array (days without
+emissions are 0), and everything else is computed on that array with
+NumPy: trailing 7-day means, week-over-week change, a least-squares slope
+and z-score anomaly flags. Used by /api/ai/analyze-trend and the dashboard
+emissions trend chart.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+WEEK = 7
+
+# A day is anomalous when it sits this many standard deviations above the mean
+ANOMALY_Z = 2.0
+
+# Week-over-week change (%) beyond which the trend is called increasing/decreasing
+STABLE_BAND = 5.0
+
+
+def bin_daily(rows, start_day, days):
+    """
+    Sum (day, amount) rows into a dense array of `days` daily totals
+
+    Rows outside [start_day, start_day + days) are ignored.
+
+    Returns:
+        np.ndarray: float totals, index 0 = start_day
+    """
+    values = np.zeros(days)
+    rows = list(rows)
+    if not rows:
+        return values
+    offsets = np.fromiter(((day - start_day).days for day, _ in rows), dtype=np.int64, count=len(rows))
+    amounts = np.fromiter((amount or 0.0 for _, amount in rows), dtype=np.float64, count=len(rows))
+    inside = (offsets >= 0) & (offsets < days)
+    np.add.at(values, offsets[inside], amounts[inside])
+    return values
+
+
+def rolling_mean(values, window=WEEK):
+    """Trailing mean over `window` days; the first days average what is available"""
+    if len(values) == 0:
+        return np.zeros(0)
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (sums[ends] - sums[starts]) / (ends - starts)
+
+
+def linear_slope(values):
+    """Least-squares slope in kg CO₂ per day (0 for fewer than two days)"""
+    if len(values) < 2 or not values.any():
+        return 0.0
+    return float(np.polyfit(np.arange(len(values)), values, 1)[0])
+
+
+def anomaly_flags(values, z=ANOMALY_Z):
+    """Mark days more than `z` standard deviations above the mean"""
+    std = values.std() if len(values) else 0.0
+    if std == 0:
+        return np.zeros(len(values), dtype=bool)
+    return values > values.mean() + z * std
+
+
+class TrendAnalysis:
+    """
+    Trend statistics for one run of consecutive days
+
+    Args:
+        values (np.ndarray): Dense daily totals, oldest first
+        start_day (date): Day of values[0]
+    """
+
+    def __init__(self, values, start_day):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.start_day = start_day
+        self.rolling = rolling_mean(self.values)
+        self.anomalies = anomaly_flags(self.values)
+        self.slope = linear_slope(self.values)
+        self.recent_week_total = float(self.values[-WEEK:].sum())
+        self.previous_week_total = float(self.values[-2 * WEEK:-WEEK].sum())
+
+    @classmethod
+    def from_daily(cls, daily):
+        """Build from dense (day, amount) pairs, oldest first (e.g. AIContext.daily)"""
+        if not daily:
+            return cls(np.zeros(0), None)
+        return cls(np.fromiter((amount for _, amount in daily), dtype=np.float64, count=len(daily)), daily[0][0])
+
+    @property
+    def total(self):
+        return float(self.values.sum())
+
+    @property
+    def recent_week_avg(self):
+        return self.recent_week_total / WEEK
+
+    @property
+    def previous_week_avg(self):
+        return self.previous_week_total / WEEK
+
+    @property
+    def change_percent(self):
+        """Week-over-week change, or 0 when there is no previous week to compare"""
+        if self.previous_week_total <= 0:
+            return 0.0
+        return (self.recent_week_total - self.previous_week_total) / self.previous_week_total * 100
+
+    @property
+    def direction(self):
+        change = self.change_percent
+        if change < -STABLE_BAND:
+            return 'decreasing'
+        if change > STABLE_BAND:
+            return 'increasing'
+        return 'stable'
+
+    def day(self, index):
+        return self.start_day + timedelta(days=int(index))
+
+    def anomaly_days(self):
+        return [self.day(i) for i in np.flatnonzero(self.anomalies)]
+
+    def to_dict(self):
+        return {
+            'recent_week_avg': round(self.recent_week_avg, 2),
+            'previous_week_avg': round(self.previous_week_avg, 2),
+            'change_percent': round(self.change_percent, 2),
+            'trend': self.direction,
+            'slope': round(self.slope, 4),
+            'anomalies': [day.isoformat() for day in self.anomaly_days()],
+        }
@@ -109,10 +109,26 @@ export default function AIecoCoach() {
         content: msg.content
       }));
 
-      // Get AI response
-      const response = await aiAPI.chatWithCoach(userId, userMessage, conversationHistory);
+      // Stream the AI response into the chat as it arrives
+      let streamed = '';
+      const response = await aiAPI.streamChatWithCoach(
+        userId,
+        userMessage,
+        conversationHistory,
+        (delta) => {
+          streamed += delta;
+          setMessages([
+            ...newMessages,
+            {
+              role: 'assistant',
+              content: streamed,
+              timestamp: new Date().toISOString()
+            }
+          ]);
+        }
+      );
 
-      // Add AI response to chat
+      // Replace the partial text with the final response
       setMessages([
         ...newMessages,
         {
@@ -36,6 +36,25 @@ const handleResponse = async (response) => {
   throw new Error('Response is not JSON');
 };
 
+// Follow pagination.next_cursor until every page of a list endpoint is loaded
+const fetchAllPages = async (url, itemsKey) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const separator = url.includes('?') ? '&' : '?';
+    const pageUrl = cursor ? `${url}${separator}cursor=${encodeURIComponent(cursor)}` : url;
+    const response = await fetch(pageUrl, {
+      headers: {
+        ...authHeaders(),
+      },
+    });
+    const data = await handleResponse(response);
+    items.push(...data[itemsKey]);
+    cursor = data.pagination?.next_cursor;
+  } while (cursor);
+  return items;
+};
+
 // Fetch dashboard stats
 export const getDashboardStats = async (userId) => {
   try {
@@ -108,7 +127,7 @@ export const getRecentActivities = async (userId, limit = 10) => {
     });
     const data = await handleResponse(response);
     console.log(' Recent activities loaded');
-    return data;
+    return data.activities;
   } catch (error) {
     console.error(' Error fetching recent activities:', error.message);
     throw new Error(`Failed to load recent activities: ${error.message}`);
@@ -119,14 +138,9 @@ export const getRecentActivities = async (userId, limit = 10) => {
 export const getAssets = async (userId) => {
   try {
     console.log(`🔄 Fetching assets for user ${userId}`);
-    const response = await fetch(`${API_BASE_URL}/api/assets/${userId}`, {
-      headers: {
-        ...authHeaders(),
-      },
-    });
-    const data = await handleResponse(response);
+    const assets = await fetchAllPages(`${API_BASE_URL}/api/assets/${userId}`, 'assets');
     console.log(' Assets loaded');
-    return data;
+    return assets;
   } catch (error) {
     console.error(' Error fetching assets:', error.message);
     throw new Error(`Failed to load assets: ${error.message}`);
@@ -425,6 +439,70 @@ export const chatWithCoach = async (userId, message, conversationHistory = []) =
   }
 };
 
+// Chat with AI coach, streaming the reply as server-sent events.
+// onToken(delta) is called for each piece of text; resolves with the final
+// { response, timestamp, source }. Pass an AbortSignal to cancel.
+export const streamChatWithCoach = async (userId, message, conversationHistory = [], onToken = () => {}, signal) => {
+  try {
+    console.log('📡 Streaming message to AI coach');
+    const response = await fetch(`${API_BASE_URL}/api/ai/chat`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Accept: 'text/event-stream',
+        ...authHeaders(),
+      },
+      body: JSON.stringify({
+        user_id: userId,
+        message,
+        conversation_history: conversationHistory
+      }),
+      signal,
+    });
+
+    const contentType = response.headers.get('content-type') || '';
+    if (!response.ok || !contentType.includes('text/event-stream') || !response.body) {
+      return await handleResponse(response);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let event = 'message';
+        let data = '';
+        for (const line of block.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        const payload = data ? JSON.parse(data) : {};
+
+        if (event === 'token') onToken(payload.delta);
+        else if (event === 'done') result = payload;
+        else if (event === 'error') throw new Error(payload.error);
+      }
+    }
+
+    if (!result) throw new Error('Stream ended before the response was complete');
+    console.log('✅ AI response streamed');
+    return result;
+  } catch (error) {
+    console.error('❌ Error streaming AI chat:', error.message);
+    throw new Error(`Failed to chat with AI: ${error.message}`);
+  }
+};
+
 // Get reduction tips
 export const getReductionTips = async (category = 'general', userId = null) => {
   try {
@@ -488,6 +566,7 @@ export const analyzeTrend = async (userId) => {
 export const aiAPI = {
   getPersonalizedInsight,
   chatWithCoach,
+  streamChatWithCoach,
   getReductionTips,
   getDailyTip,
   analyzeTrend
@@ -499,14 +578,9 @@ export const aiAPI = {
 export const getUserGoals = async (userId) => {
   try {
     console.log(`🎯 Fetching goals for user ${userId}`);
-    const response = await fetch(`${API_BASE_URL}/api/goals/${userId}`, {
-      headers: {
-        ...authHeaders(),
-      },
-    });
-    const data = await handleResponse(response);
+    const goals = await fetchAllPages(`${API_BASE_URL}/api/goals/${userId}`, 'goals');
     console.log('✅ Goals loaded');
-    return data;
+    return goals;
   } catch (error) {
     console.error('❌ Error fetching goals:', error.message);
     throw new Error(`Failed to load goals: ${error.message}`);